@@ -6,8 +6,7 @@ from functools import wraps
 
 # Import application modules
 from src.core.config import Config
-from src.controller.system_controller import SystemController
-from src.sqldb.admin_auth import AdminAuthManager
+from src.core.container import get_container
 from src.api.api import api_blueprint  # Import the API blueprint
 
 # Load environment variables
@@ -18,9 +17,8 @@ app = Flask(__name__)
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'default-secret-key-for-development')
 app.config['UPLOAD_FOLDER'] = Config.UPLOAD_FOLDER
 
-# Initialize controllers
-system_controller = SystemController()
-admin_auth = AdminAuthManager()
+# Shared services (vector store, Gemini clients, controllers) are built lazily by the container
+services = get_container()
 
 # Register API blueprint
 app.register_blueprint(api_blueprint)
@@ -72,7 +70,7 @@ def admin_login():
     if request.method == 'POST':
         username = request.form.get('username', '').strip()
         password = request.form.get('password', '')
-        if admin_auth.verify_admin(username, password):
+        if services.admin_auth.verify_admin(username, password):
             session['admin_logged_in'] = True
             session['admin_username'] = username
             return redirect(url_for('admin'))
@@ -94,7 +92,7 @@ def admin_signup():
             flash('Invalid software serial key.', 'danger')
             return render_template('admin_signup.html')
         # Register admin
-        success, msg = admin_auth.register_admin(username, password)
+        success, msg = services.admin_auth.register_admin(username, password)
         if success:
             flash('Admin account created. Please sign in.', 'success')
             return redirect(url_for('admin_login'))
@@ -115,7 +113,7 @@ if __name__ == '__main__':
     os.makedirs(Config.VECTORDB_PATH, exist_ok=True)
     
     # Initialize the system
-    system_controller.initialize()
+    services.system_controller.initialize()
     
     # Run the Flask app
     app.run(debug=Config.DEBUG, host=Config.HOST, port=Config.PORT)
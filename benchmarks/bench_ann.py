@@ -0,0 +1,46 @@
+"""Recall vs latency of the IVF index in the NumPy backend against exact search.
+
+Loads a clustered synthetic corpus once, measures exact search as the
+baseline, then trains the IVF index and sweeps nprobe. Recall@k is measured
+against brute-force ground truth.
+
+    python -m benchmarks.bench_ann --size 200000 --dim 768 --nprobe 1,4,8,16,32,64
+"""
+import time, argparse, tempfile
+from src.core.config import Config
+from src.vectordb.numpy_vector_database import NumpyVectorDatabase
+from benchmarks.bench_vector_backends import make_corpus, load, exact_top_k, run_queries
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--nlist", type=int, default=0, help="IVF buckets, 0 for the default")
+    parser.add_argument("--nprobe", default="1,4,8,16,32,64")
+    args = parser.parse_args()
+
+    vectors = make_corpus(args.size, args.dim)
+    queries = make_corpus(args.queries, args.dim, seed=1)
+    truth = exact_top_k(vectors, queries, args.k)
+    # Load without the index so the exact baseline is measured first
+    Config.ANN_ENABLED = False
+    with tempfile.TemporaryDirectory() as path:
+        database = NumpyVectorDatabase(path)
+        load(database, vectors)
+
+        print(f"{'search':<14} {'recall':>7} {'p50 ms':>8} {'p99 ms':>8}")
+        r = run_queries(database, queries, truth, args.k)
+        print(f"{'exact':<14} {r['recall']:>7.3f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+
+        start = time.perf_counter()
+        database.train_ann(nlist=args.nlist or None)
+        print(f"trained {database.ann.nlist} lists in {time.perf_counter() - start:.1f}s")
+        for nprobe in (int(n) for n in args.nprobe.split(",")):
+            database.nprobe = nprobe
+            r = run_queries(database, queries, truth, args.k)
+            print(f"{f'nprobe={nprobe}':<14} {r['recall']:>7.3f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Wall-clock time of a question suite run one query at a time vs process_queries.
+
+Uses the fake embedder and a fake LLM with a fixed generation latency from
+benchmarks.fakes, and a NumPy vector store in a temporary directory,
+so only the orchestration differs between the two runs. Answer caching is
+off so both runs do the same work.
+
+    python -m benchmarks.bench_batch_query --queries 500 --llm-ms 800 --embed-ms 80
+"""
+import time, argparse, tempfile
+import numpy as np
+from src.model.models import VectorEmbedding
+from src.controller.query_controller import QueryController
+from src.controller.response_controller import ResponseController
+from src.vectordb.numpy_vector_database import NumpyVectorDatabase
+from benchmarks.bench_embedding import make_chunks
+from benchmarks.fakes import FakeEmbeddingService, FakeLLMService
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--embed-ms", type=float, default=80.0)
+    parser.add_argument("--llm-ms", type=float, default=800.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--dim", type=int, default=256)
+    args = parser.parse_args()
+
+    embedder = FakeEmbeddingService(call_latency=args.embed_ms / 1000.0, dimension=args.dim)
+    llm = FakeLLMService(first_token_latency=args.llm_ms / 1000.0, token_latency=0.0)
+    questions = [f"question number {i} about leave policy" for i in range(args.queries)]
+    with tempfile.TemporaryDirectory() as path:
+        database = NumpyVectorDatabase(path)
+        chunks = make_chunks(args.chunks)
+        # Store with the fast path; embedding latency is only simulated for queries
+        vectors = np.random.default_rng(0).normal(size=(len(chunks), args.dim)).astype(np.float32)
+        database.store_many([VectorEmbedding(c.get_id(), v.tolist()) for c, v in zip(chunks, vectors)], chunks)
+        controller = QueryController(ResponseController(llm), None, embedder, database)
+
+        start = time.perf_counter()
+        for question in questions:
+            controller.process_query(question)
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        answered = sum(1 for _ in controller.process_queries(questions, max_concurrency=args.concurrency))
+        batched = time.perf_counter() - start
+
+    assert answered == len(questions)
+    print(f"queries={args.queries} embed={args.embed_ms}ms llm={args.llm_ms}ms concurrency={args.concurrency}")
+    print(f"one at a time: {sequential:8.2f}s")
+    print(f"batched      : {batched:8.2f}s")
+    print(f"speedup      : {sequential / batched:.1f}x")
+
+if __name__ == "__main__":
+    main()
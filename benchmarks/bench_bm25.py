@@ -0,0 +1,69 @@
+"""Build, reload and query latency of the BM25 index on a synthetic corpus.
+
+Chunks are drawn from a Zipf-like vocabulary with occasional policy codes
+("HR-1234"), and queries mix common words with one code, which is the case
+hybrid retrieval is for. Reports p50/p99 search latency and on-disk size.
+
+    python -m benchmarks.bench_bm25 --chunks 1000000
+"""
+import os, time, random, argparse, tempfile
+import numpy as np
+from typing import List
+from src.model.models import TextChunk
+from src.vectordb.bm25_index import BM25Index
+
+def make_vocabulary(size: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(3, 10))) for _ in range(size)]
+
+def make_chunks(count: int, vocabulary: List[str], words: int = 120, seed: int = 0) -> List[TextChunk]:
+    rng = np.random.default_rng(seed)
+    ranks = np.minimum(rng.zipf(1.3, size=(count, words)) - 1, len(vocabulary) - 1)
+    chunks = []
+    for i, row in enumerate(ranks):
+        text = " ".join(vocabulary[r] for r in row)
+        if i % 50 == 0:
+            text += f" See policy HR-{i % 10000:04d}."
+        chunks.append(TextChunk(text, f"doc-{i // 200}", i % 200))
+    return chunks
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=200000)
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=200, help="chunks per add(), i.e. per document")
+    args = parser.parse_args()
+
+    vocabulary = make_vocabulary(args.vocabulary)
+    with tempfile.TemporaryDirectory() as path:
+        index = BM25Index(path)
+        chunks = make_chunks(args.chunks, vocabulary)
+        start = time.perf_counter()
+        for offset in range(0, len(chunks), args.batch):
+            index.add(chunks[offset:offset + args.batch])
+        build = time.perf_counter() - start
+        index.compact()
+        disk = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+        start = time.perf_counter()
+        index = BM25Index(path)
+        reload = time.perf_counter() - start
+
+        rng = random.Random(1)
+        latencies = []
+        for _ in range(args.queries):
+            # Content words: neither stopword-frequent nor vanishingly rare
+            words = [vocabulary[rng.randrange(5, 2000)] for _ in range(3)]
+            query = " ".join(words) + f" HR-{rng.randrange(10000):04d}"
+            start = time.perf_counter()
+            index.search(query, 20)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    print(f"chunks={args.chunks} terms={index.stats()['terms']}")
+    print(f"build {build:.1f}s  reload {reload:.1f}s  disk {disk / 2**20:.1f} MB")
+    print(f"search p50 {np.percentile(latencies, 50):.2f} ms  p99 {np.percentile(latencies, 99):.2f} ms")
+
+if __name__ == "__main__":
+    main()
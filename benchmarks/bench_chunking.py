@@ -0,0 +1,63 @@
+"""Compare the structure-aware chunker with the legacy sliding-window slicer.
+
+Generates synthetic manual-like pages (repeated header/footer, paragraphs of
+sentences) and reports chunks per MB, redundant overlap, how many chunks end
+mid-sentence, and chunking throughput.
+
+    python -m benchmarks.bench_chunking --pages 300
+"""
+import time, random, argparse
+from typing import List, Dict, Any
+from src.core.chunker import Chunker, SlidingWindowChunker, StructuredChunker
+
+WORDS = ("policy employee leave request manager approval benefit payroll schedule holiday "
+         "overtime contract review training security access device travel expense report").split()
+
+def make_pages(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    pages = []
+    for number in range(1, count + 1):
+        paragraphs = []
+        for _ in range(rng.randint(3, 6)):
+            sentences = []
+            for _ in range(rng.randint(2, 6)):
+                words = [rng.choice(WORDS) for _ in range(rng.randint(8, 24))]
+                sentences.append(" ".join(words).capitalize() + ".")
+            paragraphs.append(" ".join(sentences))
+        header = "ACME Corp Employee Handbook - Confidential"
+        footer = f"Page {number} of {count}"
+        pages.append({"page": number, "text": header + "\n\n" + "\n\n".join(paragraphs) + "\n\n" + footer})
+    return pages
+
+def measure(chunker: Chunker, pages: List[Dict[str, Any]], repeats: int) -> Dict[str, float]:
+    source_chars = sum(len(page["text"]) for page in pages)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        chunks = chunker.chunk_pages(pages, "bench-doc")
+    elapsed = (time.perf_counter() - start) / repeats
+    chunk_chars = sum(len(chunk.get_text()) for chunk in chunks)
+    mid_sentence = sum(1 for chunk in chunks if not chunk.get_text().rstrip().endswith((".", "!", "?")))
+    megabytes = source_chars / (1024 * 1024)
+    return {
+        "chunks": len(chunks),
+        "chunks_per_mb": len(chunks) / megabytes,
+        "redundancy": chunk_chars / source_chars,
+        "mid_sentence_pct": 100.0 * mid_sentence / max(1, len(chunks)),
+        "mb_per_s": megabytes / elapsed
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = make_pages(args.pages)
+    print(f"{'chunker':<10} {'chunks':>8} {'chunks/MB':>10} {'text x':>7} {'mid-sent%':>10} {'MB/s':>8}")
+    for name, chunker in (("sliding", SlidingWindowChunker()), ("structured", StructuredChunker())):
+        r = measure(chunker, pages, args.repeats)
+        print(f"{name:<10} {r['chunks']:>8} {r['chunks_per_mb']:>10.1f} {r['redundancy']:>7.2f} "
+              f"{r['mid_sentence_pct']:>10.1f} {r['mb_per_s']:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Offline benchmark for chunk embedding throughput.
+
+Compares the legacy one-call-per-chunk loop with the batched, concurrent path
+of BatchedEmbeddingService, using the fake from benchmarks.fakes to simulate
+network latency.
+
+    python -m benchmarks.bench_embedding --chunks 2000 --latency-ms 80
+"""
+import time, argparse
+from typing import List
+from src.model.models import TextChunk
+from benchmarks.fakes import FakeEmbeddingService
+
+def make_chunks(count: int) -> List[TextChunk]:
+    return [TextChunk(f"synthetic chunk {i} " + "lorem ipsum " * 80, "bench-doc", i) for i in range(count)]
+
+def run(service: FakeEmbeddingService, chunks: List[TextChunk]) -> float:
+    start = time.perf_counter()
+    embeddings = service.generate_chunk_embeddings(chunks)
+    elapsed = time.perf_counter() - start
+    assert [e.get_chunk_id() for e in embeddings] == [c.get_id() for c in chunks], "results out of order"
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=80.0, help="simulated round-trip per call")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.chunks)
+    latency = args.latency_ms / 1000.0
+
+    serial = FakeEmbeddingService(call_latency=latency, batch_size=1, max_concurrency=1)
+    serial_time = run(serial, chunks)
+    batched = FakeEmbeddingService(call_latency=latency, batch_size=args.batch_size, max_concurrency=args.concurrency)
+    batched_time = run(batched, chunks)
+
+    print(f"chunks={args.chunks} latency={args.latency_ms}ms")
+    print(f"serial : {serial_time:8.2f}s  {args.chunks / serial_time:10.1f} chunks/s  calls={serial.calls}")
+    print(f"batched: {batched_time:8.2f}s  {args.chunks / batched_time:10.1f} chunks/s  calls={batched.calls}")
+    print(f"speedup: {serial_time / batched_time:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Query latency of the sharded vector store as the corpus grows.
+
+Loads the same clustered synthetic corpus as bench_vector_backends into
+ShardedVectorDatabase with each shard count (1 is a single store behind the
+same scatter-gather path) and reports recall@k against exact search and
+p50/p99 latency per query. --processes opens every shard in its own worker
+process instead of in this one.
+
+    python -m benchmarks.bench_shards --sizes 100000,400000 --shards 1,2,4 --dim 768
+"""
+import os, time, argparse, tempfile
+from benchmarks.bench_vector_backends import make_corpus, load, exact_top_k, run_queries
+from src.vectordb.sharded_vector_database import ShardedVectorDatabase, ProcessShard, open_shard, shard_path
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="50000,200000")
+    parser.add_argument("--shards", default="1,2,4")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--backend", default="numpy", choices=["numpy", "chroma"])
+    parser.add_argument("--processes", action="store_true", help="one worker process per shard")
+    args = parser.parse_args()
+
+    opener = ProcessShard if args.processes else open_shard
+    print(f"{'size':>9} {'shards':>6} {'recall':>7} {'p50 ms':>8} {'p99 ms':>8} {'load s':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        vectors = make_corpus(size, args.dim)
+        queries = make_corpus(args.queries, args.dim, seed=1)
+        truth = exact_top_k(vectors, queries, args.k)
+        for shards in (int(s) for s in args.shards.split(",")):
+            with tempfile.TemporaryDirectory() as path:
+                database = ShardedVectorDatabase(lambda index: opener(args.backend, shard_path(path, index)), 1)
+                # Partition up front so loading routes straight to the owners
+                database.rebalance(shards)
+                start = time.perf_counter()
+                load(database, vectors)
+                load_time = time.perf_counter() - start
+                r = run_queries(database, queries, truth, args.k)
+                database.close()
+                print(f"{size:>9} {shards:>6} {r['recall']:>7.3f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} {load_time:>8.1f}")
+
+if __name__ == "__main__":
+    main()
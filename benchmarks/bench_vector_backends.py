@@ -0,0 +1,75 @@
+"""Compare recall and query latency of the Chroma and NumPy vector backends.
+
+For each corpus size a clustered synthetic collection is loaded into both
+backends (in temporary directories). Recall@k is measured against exact
+brute-force search, and p50/p99 latency is reported per query.
+
+    python -m benchmarks.bench_vector_backends --sizes 10000,100000,1000000 --dim 768
+"""
+import time, argparse, tempfile
+import numpy as np
+from typing import List, Dict
+from src.model.models import TextChunk, VectorEmbedding
+from benchmarks.bench_vector_store import open_database
+from src.vectordb.numpy_vector_database import NumpyVectorDatabase
+
+def make_corpus(count: int, dim: int, clusters: int = 64, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=count)
+    vectors = centers[labels] + 0.5 * rng.normal(size=(count, dim)).astype(np.float32)
+    # Gemini embeddings are unit length, which also makes Chroma's L2 ranking match cosine ranking
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def load(database, vectors: np.ndarray, batch: int = 5000) -> List[str]:
+    ids = []
+    for start in range(0, len(vectors), batch):
+        chunks = [TextChunk(f"chunk {i}", f"doc-{i // 1000}", i % 1000) for i in range(start, min(start + batch, len(vectors)))]
+        embeddings = [VectorEmbedding(c.get_id(), v.tolist()) for c, v in zip(chunks, vectors[start:start + batch])]
+        database.store_many(embeddings, chunks)
+        ids.extend(c.get_text() for c in chunks)
+    return ids
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> List[set]:
+    scores = queries @ vectors.T
+    return [set(np.argpartition(-row, k - 1)[:k].tolist()) for row in scores]
+
+def run_queries(database, queries: np.ndarray, truth: List[set], k: int) -> Dict[str, float]:
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        results = database.find_similar(VectorEmbedding("query", query.tolist()), limit=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found = {int(r["chunk"].get_text().split()[-1]) for r in results}
+        hits += len(found & expected)
+    return {
+        "recall": hits / (k * len(queries)),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99))
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--backends", default="chroma,numpy")
+    args = parser.parse_args()
+
+    print(f"{'size':>9} {'backend':<8} {'recall':>7} {'p50 ms':>8} {'p99 ms':>8} {'load s':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        vectors = make_corpus(size, args.dim)
+        queries = make_corpus(args.queries, args.dim, seed=1)
+        truth = exact_top_k(vectors, queries, args.k)
+        for backend in args.backends.split(","):
+            with tempfile.TemporaryDirectory() as path:
+                database = NumpyVectorDatabase(path) if backend == "numpy" else open_database(path)
+                start = time.perf_counter()
+                load(database, vectors)
+                load_time = time.perf_counter() - start
+                r = run_queries(database, queries, truth, args.k)
+                print(f"{size:>9} {backend:<8} {r['recall']:>7.3f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} {load_time:>8.1f}")
+
+if __name__ == "__main__":
+    main()
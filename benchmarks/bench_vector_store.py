@@ -0,0 +1,61 @@
+"""Benchmark per-chunk vs batched inserts into ChromaDBVectorDatabase.
+
+Builds a synthetic collection in a temporary directory so the real vector
+store is never touched. The per-chunk path is slow enough that it is timed on
+a sample (--per-chunk-limit) and reported as throughput.
+
+    python -m benchmarks.bench_vector_store --chunks 100000 --dim 768
+"""
+import time, random, argparse, tempfile
+from typing import List, Tuple
+from src.core.config import Config
+from src.model.models import TextChunk, VectorEmbedding
+
+def make_batch(count: int, dim: int, seed: int = 0) -> Tuple[List[VectorEmbedding], List[TextChunk]]:
+    rng = random.Random(seed)
+    chunks, embeddings = [], []
+    for i in range(count):
+        chunk = TextChunk(f"synthetic chunk {i}", f"doc-{i // 500}", i % 500)
+        chunks.append(chunk)
+        embeddings.append(VectorEmbedding(chunk_id=chunk.get_id(), vector=[rng.uniform(-1.0, 1.0) for _ in range(dim)]))
+    return embeddings, chunks
+
+def open_database(path: str):
+    Config.VECTORDB_PATH = path
+    from src.vectordb.vector_database import ChromaDBVectorDatabase
+    return ChromaDBVectorDatabase()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--per-chunk-limit", type=int, default=2000, help="chunks inserted one at a time")
+    parser.add_argument("--batch-size", type=int, default=Config.VECTORDB_BATCH_SIZE)
+    args = parser.parse_args()
+
+    embeddings, chunks = make_batch(args.chunks, args.dim)
+    sample = min(args.per_chunk_limit, args.chunks)
+
+    with tempfile.TemporaryDirectory() as single_dir:
+        database = open_database(single_dir)
+        start = time.perf_counter()
+        for embedding, chunk in zip(embeddings[:sample], chunks[:sample]):
+            database.store(embedding, chunk)
+        single_time = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as batch_dir:
+        database = open_database(batch_dir)
+        start = time.perf_counter()
+        database.store_many(embeddings, chunks, batch_size=args.batch_size)
+        batch_time = time.perf_counter() - start
+        stored = database.collection.count()
+
+    single_rate = sample / single_time
+    batch_rate = stored / batch_time
+    print(f"dim={args.dim} batch_size={args.batch_size}")
+    print(f"per-chunk: {sample:8d} chunks in {single_time:8.2f}s  {single_rate:10.1f} chunks/s")
+    print(f"batched  : {stored:8d} chunks in {batch_time:8.2f}s  {batch_rate:10.1f} chunks/s")
+    print(f"speedup  : {batch_rate / single_rate:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Seeded synthetic corpus of policy-style PDFs for the offline benchmarks.
+
+The PDFs are written directly (one Helvetica text stream per page) so the
+suite needs no PDF authoring library; PyPDF2 reads them back like any other
+text PDF, so ingestion exercises the real extraction and chunking path.
+"""
+import os, random
+from typing import List, Tuple
+
+TOPICS = {
+    "Annual Leave": ["leave", "vacation", "accrual", "carryover", "approval", "calendar"],
+    "Remote Work": ["remote", "equipment", "stipend", "security", "schedule", "availability"],
+    "Travel and Expenses": ["travel", "expense", "receipt", "reimbursement", "per diem", "booking"],
+    "Information Security": ["password", "device", "encryption", "incident", "access", "phishing"],
+    "Parental Leave": ["parental", "birth", "adoption", "benefits", "return", "eligibility"],
+    "Performance Reviews": ["review", "goals", "feedback", "rating", "calibration", "promotion"],
+    "Procurement": ["vendor", "purchase order", "contract", "budget", "quote", "approval"],
+    "Health and Safety": ["incident", "first aid", "evacuation", "hazard", "training", "report"],
+}
+SUBJECTS = ["Employees", "Managers", "Contractors", "New hires", "Team leads", "The HR team", "Finance"]
+VERBS = ["must submit", "may request", "are required to review", "should document", "can approve", "must confirm"]
+QUALIFIERS = ["within ten business days", "before the end of the quarter", "through the internal portal",
+              "with written manager approval", "according to the regional schedule", "unless an exception applies"]
+
+PAGE_WIDTH, PAGE_HEIGHT, MARGIN, FONT_SIZE, LEADING = 612, 792, 72, 10, 13
+LINE_CHARS = 95
+LINES_PER_PAGE = (PAGE_HEIGHT - 2 * MARGIN) // LEADING
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def _wrap(paragraph: str, width: int = LINE_CHARS) -> List[str]:
+    lines, current = [], ""
+    for word in paragraph.split():
+        if current and len(current) + 1 + len(word) > width:
+            lines.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    return lines + [current] if current else lines
+
+def write_pdf(path: str, pages: List[List[str]]) -> None:
+    """Write lines of plain text as a minimal PDF, one list of lines per page"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for lines in pages:
+        text = " T* ".join(f"({_escape(line)}) Tj" for line in lines)
+        stream = f"BT /F1 {FONT_SIZE} Tf {LEADING} TL {MARGIN} {PAGE_HEIGHT - MARGIN} Td {text} ET".encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_number = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % (PAGE_WIDTH, PAGE_HEIGHT, content_number)
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{k} 0 R" for k in kids).encode(), len(kids))
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(output)
+
+class CorpusGenerator:
+    """Deterministic policy handbooks: numbered sections of templated sentences per topic"""
+    def __init__(self, seed: int = 0):
+        self.seed = seed
+
+    def _sentence(self, rng: random.Random, terms: List[str]) -> str:
+        first, second = rng.sample(terms, 2)
+        return (f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} the {first} {rng.choice(['form', 'request', 'record', 'policy'])} "
+                f"{rng.choice(QUALIFIERS)}, and any {second} change is logged with reference {rng.randint(100, 9999)}.")
+
+    def document(self, index: int, pages: int) -> List[List[str]]:
+        """Lines per page of document `index`"""
+        rng = random.Random(f"{self.seed}-{index}")
+        topics = rng.sample(sorted(TOPICS), 3)
+        result, lines, section = [], [f"Policy Handbook {index}: {', '.join(topics)}", ""], 0
+        while len(result) < pages:
+            topic = topics[section % len(topics)]
+            section += 1
+            paragraph = " ".join(self._sentence(rng, TOPICS[topic]) for _ in range(rng.randint(4, 8)))
+            lines += [f"{section}. {topic}", *_wrap(paragraph), ""]
+            while len(lines) >= LINES_PER_PAGE and len(result) < pages:
+                result.append(lines[:LINES_PER_PAGE])
+                lines = lines[LINES_PER_PAGE:]
+        return result
+
+    def write(self, directory: str, documents: int, pages: int) -> List[Tuple[str, int]]:
+        """Write `documents` PDFs of `pages` pages each; returns (path, page count) pairs"""
+        os.makedirs(directory, exist_ok=True)
+        written = []
+        for index in range(documents):
+            path = os.path.join(directory, f"handbook_{index:04d}.pdf")
+            write_pdf(path, self.document(index, pages))
+            written.append((path, pages))
+        return written
+
+    def questions(self, count: int) -> List[str]:
+        rng = random.Random(f"{self.seed}-questions")
+        templates = ["How do I get {a} approved?", "What is the policy on {a} and {b}?",
+                     "Who handles {a} for {s}?", "When is the {a} deadline?"]
+        result = []
+        for _ in range(count):
+            terms = TOPICS[rng.choice(sorted(TOPICS))]
+            a, b = rng.sample(terms, 2)
+            result.append(rng.choice(templates).format(a=a, b=b, s=rng.choice(SUBJECTS).lower()))
+        return result
@@ -0,0 +1,111 @@
+"""Deterministic local stand-ins for the Gemini embedding and generation services.
+
+Vectors and answers are derived from a hash of the input, and so is each
+call's latency jitter, so a run is reproducible regardless of thread
+scheduling. Latencies are real sleeps (time.sleep / asyncio.sleep), which is
+what the concurrency paths under test have to hide.
+"""
+import time, asyncio, hashlib
+from functools import lru_cache
+import numpy as np
+from typing import List, Iterator, AsyncIterator, Optional
+from src.model.models import Query, TextChunk, Response, VectorEmbedding
+from src.llm.embedding_service import BatchedEmbeddingService
+from src.llm.llm_service import LLMService, NO_INFO_MESSAGE
+
+def stable_unit(text: str, salt: str = "") -> float:
+    """Uniform [0, 1) value fixed by text"""
+    digest = hashlib.sha256(f"{salt}\x00{text}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little") / 2 ** 64
+
+def jittered(base: float, jitter: float, key: str) -> float:
+    """base scaled by a factor in [1 - jitter, 1 + jitter] chosen by key"""
+    return max(0.0, base * (1.0 + jitter * (2.0 * stable_unit(key, "jitter") - 1.0)))
+
+@lru_cache(maxsize=4096)
+def word_vector(word: str, dimension: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(word.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dimension).astype(np.float32)
+
+class FakeEmbeddingService(BatchedEmbeddingService):
+    """Unit vectors seeded by the text, returned after call_latency + item_latency per text.
+
+    Texts sharing words get correlated vectors (each word contributes a fixed
+    random direction), so retrieval over a fake corpus still prefers chunks
+    that overlap with the question.
+    """
+    def __init__(self, call_latency: float = 0.08, item_latency: float = 0.0005, jitter: float = 0.0,
+                 dimension: int = 768, **kwargs):
+        super().__init__(**kwargs)
+        self.call_latency = call_latency
+        self.item_latency = item_latency
+        self.jitter = jitter
+        self.dimension = dimension
+        self.calls = 0
+        # Same surface as GeminiEmbeddingService (get_cache_stats reads it); the fake never caches
+        self.cache = None
+
+    def vector(self, text: str) -> List[float]:
+        words = text.lower().split()[:64] or [text]
+        vector = np.sum([word_vector(word, self.dimension) for word in words], axis=0)
+        return (vector / (np.linalg.norm(vector) or 1.0)).tolist()
+
+    def embed_batch(self, texts: List[str], task_type: str) -> List[List[float]]:
+        self.calls += 1
+        time.sleep(jittered(self.call_latency + self.item_latency * len(texts), self.jitter, texts[0] if texts else ""))
+        return [self.vector(text) for text in texts]
+
+    def generate_embedding(self, text: str):
+        return self.generate_query_embeddings([text])[0]
+
+    async def generate_embedding_async(self, text: str):
+        await asyncio.sleep(jittered(self.call_latency + self.item_latency, self.jitter, text))
+        self.calls += 1
+        return VectorEmbedding(chunk_id="query", vector=self.vector(text))
+
+class FakeLLMService(LLMService):
+    """Answers stitched from the first words of each chunk, produced at a fixed token rate.
+
+    Latency is first_token_latency plus token_latency per output token; the
+    streaming variants sleep between tokens the same way.
+    """
+    def __init__(self, first_token_latency: float = 0.4, token_latency: float = 0.01,
+                 output_tokens: int = 60, jitter: float = 0.0):
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.output_tokens = output_tokens
+        self.jitter = jitter
+
+    def _tokens(self, query: Query, relevant_chunks: List[TextChunk]) -> List[str]:
+        words = [word for chunk in relevant_chunks for word in chunk.get_text().split()[:20]]
+        words = words or query.get_text().split()
+        return [words[i % len(words)] + " " for i in range(self.output_tokens)]
+
+    def _first_token_delay(self, query: Query) -> float:
+        return jittered(self.first_token_latency, self.jitter, query.get_text())
+
+    def generate_response(self, query: Query, relevant_chunks: List[TextChunk]) -> Response:
+        tokens = self._tokens(query, relevant_chunks)
+        time.sleep(self._first_token_delay(query) + self.token_latency * len(tokens))
+        return Response(query.get_id(), "".join(tokens), relevant_chunks, 0.8)
+
+    def stream_response(self, query: Query, relevant_chunks: List[TextChunk], prompt: Optional[str] = None) -> Iterator[str]:
+        time.sleep(self._first_token_delay(query))
+        for token in self._tokens(query, relevant_chunks):
+            time.sleep(self.token_latency)
+            yield token
+
+    async def generate_response_async(self, query: Query, relevant_chunks: List[TextChunk]) -> Response:
+        tokens = self._tokens(query, relevant_chunks)
+        await asyncio.sleep(self._first_token_delay(query) + self.token_latency * len(tokens))
+        return Response(query.get_id(), "".join(tokens), relevant_chunks, 0.8)
+
+    async def stream_response_async(self, query: Query, relevant_chunks: List[TextChunk],
+                                    prompt: Optional[str] = None) -> AsyncIterator[str]:
+        await asyncio.sleep(self._first_token_delay(query))
+        for token in self._tokens(query, relevant_chunks):
+            await asyncio.sleep(self.token_latency)
+            yield token
+
+    def generate_no_info_response(self, query: Query) -> Response:
+        return Response(query.get_id(), NO_INFO_MESSAGE, [], 0.0)
@@ -0,0 +1,111 @@
+"""Offline end-to-end benchmark suite with machine-readable results.
+
+Runs ingestion, query, session and concurrent chat scenarios against the real
+controllers and stores, with deterministic local fakes in place of the
+Gemini embedding and generation APIs, and writes one JSON document per run.
+Pass --baseline with an earlier run's JSON to print the change per metric.
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --scenarios query,chat --baseline main.json --output branch.json
+"""
+import os, sys, json, time, argparse, platform, tempfile, subprocess
+from contextlib import redirect_stdout
+from typing import Any, Dict, Optional
+from benchmarks import scenarios
+from benchmarks.fakes import FakeEmbeddingService, FakeLLMService
+
+SCENARIOS = ("ingestion", "query", "sessions", "chat")
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Print each numeric metric next to its baseline value and the relative change"""
+    for scenario, results in current["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if not previous:
+            continue
+        print(f"\n{scenario}")
+        for name, value in results.items():
+            old = previous.get(name)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)):
+                continue
+            change = f"{(value - old) / old * 100.0:+7.1f}%" if old else "    n/a"
+            print(f"  {name:<36} {old:>12.3f} -> {value:>12.3f}  {change}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of " + ", ".join(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--docs", type=int, default=40)
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--sessions-per-user", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=10, help="messages per stored session")
+    parser.add_argument("--session-samples", type=int, default=500)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--turns", type=int, default=5, help="questions per chat client")
+    parser.add_argument("--embed-ms", type=float, default=80.0, help="fake embedding round-trip per call")
+    parser.add_argument("--first-token-ms", type=float, default=400.0, help="fake generation time to first token")
+    parser.add_argument("--token-ms", type=float, default=10.0, help="fake generation time per output token")
+    parser.add_argument("--jitter", type=float, default=0.2, help="latency spread as a fraction of the base latency")
+    parser.add_argument("--dim", type=int, default=256, help="fake embedding dimension")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare against")
+    args = parser.parse_args()
+
+    selected = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(selected) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    embedder = FakeEmbeddingService(call_latency=args.embed_ms / 1000.0, jitter=args.jitter, dimension=args.dim)
+    llm = FakeLLMService(first_token_latency=args.first_token_ms / 1000.0, token_latency=args.token_ms / 1000.0,
+                         jitter=args.jitter)
+    results = {}
+    # The controllers log to stdout; keep it for the JSON report
+    with tempfile.TemporaryDirectory(prefix="qa-bench-") as root, redirect_stdout(sys.stderr):
+        workspace = scenarios.Workspace(root, embedder, llm)
+        # Query and chat need an indexed corpus even when ingestion is not being measured
+        if "ingestion" in selected or {"query", "chat"} & set(selected):
+            started = time.perf_counter()
+            results["ingestion"] = scenarios.ingestion(workspace, args.docs, args.pages, args.seed)
+            print(f"ingestion done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+        if "query" in selected:
+            results["query"] = scenarios.query(workspace, args.queries, args.seed)
+        if "sessions" in selected:
+            results["sessions"] = scenarios.sessions(
+                workspace, args.users, args.sessions_per_user, args.messages, args.session_samples
+            )
+        if "chat" in selected:
+            results["chat"] = scenarios.chat(workspace, args.clients, args.turns, args.seed)
+        if "ingestion" not in selected:
+            results.pop("ingestion", None)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args)
+        },
+        "scenarios": results
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+if __name__ == "__main__":
+    main()
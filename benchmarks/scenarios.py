@@ -0,0 +1,210 @@
+"""End-to-end scenarios for benchmarks.run, each returning a flat dict of metrics.
+
+Every scenario drives the real controllers and stores against temporary
+directories, with the fakes standing in for the Gemini services, so results
+change only when the code (or the fake latencies) change.
+"""
+import os, time, uuid, shutil
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List
+from src.core.config import Config
+from src.core.metrics import metrics
+from src.core.container import ServiceContainer
+from src.core.document_processor import PDFDocumentProcessor
+from src.vectordb.bm25_index import BM25Index
+from src.vectordb.numpy_vector_database import NumpyVectorDatabase
+from src.sqldb.session_store import SQLiteSessionStore
+from src.controller.document_controller import DocumentController
+from src.controller.query_controller import QueryController
+from src.controller.response_controller import ResponseController
+from benchmarks.corpus import CorpusGenerator
+from benchmarks.fakes import FakeEmbeddingService, FakeLLMService
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+def percentiles(samples: List[float], prefix: str) -> Dict[str, float]:
+    """p50/p90/p99/max/mean in milliseconds (nearest rank)"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    def rank(p: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100.0 * len(ordered))) - 1))] * 1000.0
+    return {
+        f"{prefix}_p50_ms": rank(50), f"{prefix}_p90_ms": rank(90), f"{prefix}_p99_ms": rank(99),
+        f"{prefix}_max_ms": ordered[-1] * 1000.0, f"{prefix}_mean_ms": sum(ordered) / len(ordered) * 1000.0
+    }
+
+def peak_rss_mb() -> float:
+    """Process high-water RSS so far; run.py measures ingestion first, so it reflects ingestion"""
+    if resource is None:
+        return 0.0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+def stage_means(prefix: str = "stage") -> Dict[str, float]:
+    """Mean milliseconds per metrics span recorded since the last metrics.reset()"""
+    return {f"{prefix}_{stage}_mean_ms": stats["mean_seconds"] * 1000.0 for stage, stats in metrics.summary().items()}
+
+@contextmanager
+def configured(**overrides: Any) -> Iterator[None]:
+    """Temporarily set Config attributes, restoring the previous values afterwards"""
+    previous = {name: getattr(Config, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(Config, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(Config, name, value)
+
+class Workspace:
+    """Temporary data directory holding one corpus, vector store, lexical index and session database"""
+    def __init__(self, root: str, embedder: FakeEmbeddingService, llm: FakeLLMService):
+        self.root = root
+        self.embedder = embedder
+        self.llm = llm
+        self.corpus_dir = os.path.join(root, "corpus")
+        self.uploads = os.path.join(root, "uploads")
+        os.makedirs(self.uploads, exist_ok=True)
+        self.settings = dict(
+            VECTORDB_PATH=os.path.join(root, "vectordb"),
+            UPLOAD_FOLDER=self.uploads,
+            SESSION_BACKEND="sqlite",
+            SESSIONS_DIR=os.path.join(root, "sessions"),
+            SESSION_DB_PATH=os.path.join(root, "sessions.db"),
+            ANSWER_CACHE_ENABLED=False,
+            VERBOSE_LOGGING=False
+        )
+        with configured(**self.settings):
+            self.vector_database = NumpyVectorDatabase(os.path.join(root, "vectordb", "numpy_index"))
+            self.lexical_index = BM25Index(os.path.join(root, "vectordb", "bm25_index")) if Config.HYBRID_SEARCH else None
+
+    def query_controller(self) -> QueryController:
+        return QueryController(ResponseController(self.llm), None, self.embedder, self.vector_database, self.lexical_index)
+
+    def container(self) -> ServiceContainer:
+        """Container whose services are the fakes and this workspace's stores"""
+        container = ServiceContainer()
+        container._instances.update(
+            vector_database=self.vector_database, embedding_service=self.embedder, llm_service=self.llm
+        )
+        if self.lexical_index is not None:
+            container._instances["lexical_index"] = self.lexical_index
+        return container
+
+def ingestion(workspace: Workspace, documents: int, pages: int, seed: int) -> Dict[str, float]:
+    """Generate the corpus and upload it one file at a time through DocumentController"""
+    corpus = CorpusGenerator(seed).write(workspace.corpus_dir, documents, pages)
+    with configured(**workspace.settings):
+        controller = DocumentController(None, workspace.embedder, workspace.vector_database, workspace.lexical_index)
+        calls_before, latencies, failures, totals = workspace.embedder.calls, [], 0, {}
+
+        def progress(event: str, amount: int) -> None:
+            totals[event] = totals.get(event, 0) + amount
+
+        start = time.perf_counter()
+        for path, _ in corpus:
+            filename = f"{uuid.uuid4()}_{os.path.basename(path)}"
+            upload = os.path.join(workspace.uploads, filename)
+            shutil.copyfile(path, upload)
+            began = time.perf_counter()
+            if not controller.upload_document(upload, filename, os.path.basename(path), progress):
+                failures += 1
+            latencies.append(time.perf_counter() - began)
+        elapsed = time.perf_counter() - start
+        PDFDocumentProcessor.shutdown_pool()
+    chunks = totals.get("chunks_total", 0)
+    return dict(
+        documents=documents, pages=documents * pages, chunks=chunks, failures=failures,
+        seconds=elapsed, docs_per_second=documents / elapsed, pages_per_second=documents * pages / elapsed,
+        chunks_per_second=chunks / elapsed, embed_calls=workspace.embedder.calls - calls_before, peak_rss_mb=peak_rss_mb(),
+        **percentiles(latencies, "document")
+    )
+
+def query(workspace: Workspace, queries: int, seed: int) -> Dict[str, float]:
+    """Sequential end-to-end questions through QueryController, scoped to two documents, then through process_queries"""
+    questions = CorpusGenerator(seed).questions(queries)
+    with configured(**workspace.settings):
+        controller = workspace.query_controller()
+        metrics.reset()
+        latencies = []
+        for question in questions:
+            began = time.perf_counter()
+            controller.process_query(question)
+            latencies.append(time.perf_counter() - began)
+        stages = stage_means()
+        scope, scoped = sorted(workspace.vector_database.document_ids())[:2], []
+        for question in questions:
+            began = time.perf_counter()
+            controller.process_query(question, document_ids=scope)
+            scoped.append(time.perf_counter() - began)
+        start = time.perf_counter()
+        answered = sum(1 for _ in controller.process_queries(questions))
+        batched = time.perf_counter() - start
+    return dict(
+        queries=queries, sequential_qps=queries / sum(latencies), batched_qps=answered / batched,
+        **percentiles(latencies, "latency"), **percentiles(scoped, "scoped"), **stages
+    )
+
+def sessions(workspace: Workspace, users: int, sessions_per_user: int, messages: int, samples: int) -> Dict[str, float]:
+    """Listing and loading sessions from a SQLite store holding users * sessions_per_user sessions"""
+    store = SQLiteSessionStore(os.path.join(workspace.root, "session_scale.db"))
+    origin = datetime(2024, 1, 1)
+    start = time.perf_counter()
+    for u in range(users):
+        for s in range(sessions_per_user):
+            created = (origin + timedelta(minutes=u * sessions_per_user + s)).isoformat()
+            store.save({
+                "id": f"sess-{u}-{s}", "name": f"Chat {s}", "user_id": f"user-{u}", "created_at": created,
+                "messages": [
+                    {"role": "user" if m % 2 else "bot", "content": f"message {m} " * 20, "time": created, "sources": []}
+                    for m in range(messages)
+                ]
+            })
+    populate = time.perf_counter() - start
+    list_latencies, load_latencies = [], []
+    for i in range(samples):
+        user = f"user-{i * 7919 % users}"
+        began = time.perf_counter()
+        listed = store.list_sessions(user)
+        list_latencies.append(time.perf_counter() - began)
+        began = time.perf_counter()
+        store.load(listed[i % len(listed)]["id"])
+        load_latencies.append(time.perf_counter() - began)
+    store.pool.close()
+    return dict(
+        sessions=users * sessions_per_user, messages=users * sessions_per_user * messages, populate_seconds=populate,
+        **percentiles(list_latencies, "list"), **percentiles(load_latencies, "load")
+    )
+
+def chat(workspace: Workspace, clients: int, turns: int, seed: int) -> Dict[str, float]:
+    """Concurrent clients each holding a multi-turn conversation through SystemController"""
+    from src.controller.system_controller import SystemController
+    questions = CorpusGenerator(seed + 1).questions(clients * turns)
+    with configured(**workspace.settings):
+        system = SystemController(workspace.container())
+        metrics.reset()
+
+        def converse(client: int) -> List[float]:
+            session_id = system.session_controller.create_session(f"client-{client}")["id"]
+            latencies = []
+            for turn in range(turns):
+                began = time.perf_counter()
+                system.process_query(questions[client * turns + turn], session_id)
+                latencies.append(time.perf_counter() - began)
+            return latencies
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            latencies = [value for client in executor.map(converse, range(clients)) for value in client]
+        elapsed = time.perf_counter() - start
+        stages = stage_means()
+        system.shutdown()
+    return dict(
+        clients=clients, turns=clients * turns, seconds=elapsed, turns_per_second=clients * turns / elapsed,
+        **percentiles(latencies, "turn"), **stages
+    )
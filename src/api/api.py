@@ -1,13 +1,16 @@
-import os, uuid
+import os, json, uuid
 from functools import wraps
 from src.core.config import Config
-from src.sqldb.admin_auth import AdminAuthManager
-from src.controller.system_controller import SystemController
-from flask import Blueprint, request, jsonify, session, current_app
+from src.core.container import get_container
+from flask import Blueprint, Response, request, jsonify, session, current_app, stream_with_context
 
 api_blueprint = Blueprint('api', __name__)
-system_controller = SystemController()
-admin_auth = AdminAuthManager()
+
+def get_system_controller():
+    return get_container().system_controller
+
+def get_admin_auth():
+    return get_container().admin_auth
 
 def is_admin_logged_in():
     return session.get('admin_logged_in') is True
@@ -24,6 +27,20 @@ def admin_login_required(f):
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
 
+FILTER_FIELDS = ('document_ids', 'categories')
+
+def parse_filters(data):
+    """The optional "filters" object of a query request as (filters, error message)"""
+    filters = data.get('filters')
+    if filters is None:
+        return None, None
+    if not isinstance(filters, dict) or set(filters) - set(FILTER_FIELDS):
+        return None, f"filters must be an object with any of: {', '.join(FILTER_FIELDS)}"
+    for field, values in filters.items():
+        if not isinstance(values, list) or not all(isinstance(value, str) and value for value in values):
+            return None, f'filters.{field} must be a list of strings'
+    return filters, None
+
 @api_blueprint.route('/api/query', methods=['POST'])
 def query():
     data = request.json
@@ -31,31 +48,77 @@ def query():
     session_id = data.get('session_id')
     if not query_text:
         return jsonify({'error': 'Query is required'}), 400
-    response = system_controller.process_query(query_text, session_id)
+    filters, error = parse_filters(data)
+    if error:
+        return jsonify({'error': error}), 400
+    response = get_system_controller().process_query(query_text, session_id, filters)
     return jsonify(response)
 
+@api_blueprint.route('/api/query/stream', methods=['POST'])
+def query_stream():
+    data = request.json
+    query_text = data.get('query', '')
+    session_id = data.get('session_id')
+    if not query_text:
+        return jsonify({'error': 'Query is required'}), 400
+    filters, error = parse_filters(data)
+    if error:
+        return jsonify({'error': error}), 400
+
+    def generate():
+        for event, payload in get_system_controller().stream_query(query_text, session_id, filters):
+            yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@api_blueprint.route('/api/query/batch', methods=['POST'])
+@admin_login_required
+def query_batch():
+    data = request.json or {}
+    queries = data.get('queries')
+    if not isinstance(queries, list) or not queries or not all(isinstance(q, str) and q for q in queries):
+        return jsonify({'error': 'queries must be a non-empty list of strings'}), 400
+    if len(queries) > Config.BATCH_QUERY_MAX:
+        return jsonify({'error': f'At most {Config.BATCH_QUERY_MAX} queries per batch'}), 400
+    filters, error = parse_filters(data)
+    if error:
+        return jsonify({'error': error}), 400
+
+    def generate():
+        # One JSON object per line, in completion order; "index" maps back to the request
+        for result in get_system_controller().process_queries(queries, filters):
+            yield json.dumps(result) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @api_blueprint.route('/api/sessions', methods=['GET'])
 def get_sessions():
     user_id = session.get('user_id', 'anonymous')
-    sessions = system_controller.get_user_sessions(user_id)
+    sessions = get_system_controller().get_user_sessions(user_id)
     return jsonify({'sessions': sessions})
 
 @api_blueprint.route('/api/sessions', methods=['POST'])
 def create_session():
     user_id = session.get('user_id', 'anonymous')
-    session_data = system_controller.create_session(user_id)
+    session_data = get_system_controller().create_session(user_id)
     return jsonify(session_data)
 
 @api_blueprint.route('/api/sessions/<session_id>', methods=['GET'])
 def get_session(session_id):
-    session_data = system_controller.get_session(session_id)
+    session_data = get_system_controller().get_session(session_id)
     if not session_data:
         return jsonify({'error': 'Session not found'}), 404
     return jsonify(session_data)
 
 @api_blueprint.route('/api/sessions/<session_id>', methods=['DELETE'])
 def delete_session(session_id):
-    success = system_controller.delete_session(session_id)
+    success = get_system_controller().delete_session(session_id)
     if success:
         return jsonify({'success': True, 'message': 'Session deleted'})
     return jsonify({'error': 'Failed to delete session'}), 500
@@ -68,28 +131,44 @@ def upload_document():
     files = request.files.getlist('document')
     if not files or all(f.filename == '' for f in files):
         return jsonify({'error': 'No selected file'}), 400
-    results = []
+    replaces = request.form.get('replaces', '').strip() or None
+    if replaces:
+        if len(files) != 1:
+            return jsonify({'error': 'Only a single file can replace a document'}), 400
+        if not any(doc['id'] == replaces for doc in get_system_controller().get_documents()):
+            return jsonify({'error': 'Document to replace not found'}), 404
+    results, accepted = [], []
     for file in files:
         if file and allowed_file(file.filename):
             original_filename = file.filename
             unique_filename = str(uuid.uuid4()) + '_' + original_filename
             filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
             file.save(filepath)
-            success = system_controller.process_document(filepath, unique_filename, original_filename)
-            results.append({'filename': original_filename, 'success': success, 'id': unique_filename})
+            accepted.append((filepath, unique_filename, original_filename))
+            results.append({'filename': original_filename, 'success': True, 'id': unique_filename})
         else:
             results.append({'filename': file.filename, 'success': False, 'error': 'File type not allowed'})
-    successful_uploads = [r for r in results if r['success']]
-    if len(successful_uploads) == len(files):
-        return jsonify({'success': True, 'message': f'{len(successful_uploads)} document(s) uploaded and processed successfully.', 'results': results})
-    if len(successful_uploads) > 0:
-        return jsonify({'success': False, 'message': f'{len(successful_uploads)} of {len(files)} documents uploaded. Some failed.', 'results': results}), 207
-    return jsonify({'success': False, 'message': 'No documents were successfully uploaded.', 'results': results}), 400
+    if not accepted:
+        return jsonify({'success': False, 'message': 'No documents were accepted for processing.', 'results': results}), 400
+    category = request.form.get('category', '').strip() or None
+    job = get_system_controller().submit_documents(accepted, category, replaces)
+    message = f'{len(accepted)} document(s) queued for processing.'
+    if len(accepted) < len(files):
+        message = f'{len(accepted)} of {len(files)} documents queued for processing. Some were rejected.'
+    return jsonify({'success': True, 'message': message, 'job_id': job['id'], 'job': job, 'results': results}), 202
+
+@api_blueprint.route('/api/jobs/<job_id>', methods=['GET'])
+@admin_login_required
+def get_job(job_id):
+    job = get_system_controller().get_ingestion_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
 
 @api_blueprint.route('/api/documents', methods=['GET'])
 @admin_login_required
 def get_documents():
-    documents = system_controller.get_documents()
+    documents = get_system_controller().get_documents()
     return jsonify({'documents': documents})
 
 @api_blueprint.route('/api/document/<document_id>', methods=['DELETE'])
@@ -97,7 +176,7 @@ def get_documents():
 def delete_document_route(document_id):
     if not document_id:
         return jsonify({'error': 'Document ID is required'}), 400
-    success = system_controller.delete_document(document_id)
+    success = get_system_controller().delete_document(document_id)
     if success:
         return jsonify({'success': True, 'message': f'Document {document_id} deleted successfully.'})
     return jsonify({'error': f'Failed to delete document {document_id}. It might not exist or an error occurred.'}), 500
@@ -111,7 +190,7 @@ def mass_delete_documents():
         return jsonify({'error': 'No document IDs provided.'}), 400
     deleted, failed = [], []
     for doc_id in ids:
-        if system_controller.delete_document(doc_id):
+        if get_system_controller().delete_document(doc_id):
             deleted.append(doc_id)
         else:
             failed.append(doc_id)
@@ -128,10 +207,21 @@ def mass_delete_documents():
         'deleted_ids': deleted
     })
 
+@api_blueprint.route('/api/cache/stats', methods=['GET'])
+@admin_login_required
+def get_cache_stats():
+    return jsonify(get_system_controller().get_cache_stats())
+
+@api_blueprint.route('/metrics', methods=['GET'])
+def get_metrics():
+    if not Config.METRICS_ENABLED:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(get_system_controller().render_metrics(), mimetype='text/plain; version=0.0.4')
+
 @api_blueprint.route('/api/admins', methods=['GET'])
 @admin_login_required
 def get_admins():
-    admins = admin_auth.get_all_admins()
+    admins = get_admin_auth().get_all_admins()
     return jsonify({'admins': admins})
 
 @api_blueprint.route('/api/admin/<username>', methods=['DELETE'])
@@ -144,11 +234,11 @@ def delete_admin(username):
     current_admin = session.get('admin_username')
     if username == current_admin:
         session.clear()
-        deleted, msg = admin_auth.delete_admin(username)
+        deleted, msg = get_admin_auth().delete_admin(username)
         if deleted:
             return jsonify({'success': True, 'message': 'You have deleted your own account and have been signed out.'})
         return jsonify({'error': msg}), 500
-    deleted, msg = admin_auth.delete_admin(username)
+    deleted, msg = get_admin_auth().delete_admin(username)
     if deleted:
         return jsonify({'success': True, 'message': f'Admin {username} deleted.'})
     return jsonify({'error': msg}), 500
@@ -164,7 +254,7 @@ def mass_delete_admins():
     current_admin = session.get('admin_username')
     deleted, failed, self_deleted = [], [], False
     for username in usernames:
-        ok, msg = admin_auth.delete_admin(username)
+        ok, msg = get_admin_auth().delete_admin(username)
         if ok:
             deleted.append(username)
             if username == current_admin:
@@ -188,7 +278,7 @@ def mass_delete_sessions():
         return jsonify({'error': 'No session IDs provided.'}), 400
     deleted, failed = [], []
     for session_id in ids:
-        if system_controller.delete_session(session_id):
+        if get_system_controller().delete_session(session_id):
             deleted.append(session_id)
         else:
             failed.append(session_id)
@@ -211,11 +301,9 @@ def rename_session(session_id):
     new_name = data.get('name', '').strip()
     if not new_name:
         return jsonify({'error': 'Session name cannot be empty.'}), 400
-    session_data = system_controller.get_session(session_id)
-    if not session_data:
+    ok = get_system_controller().session_controller.rename_session(session_id, new_name)
+    if not ok and not get_system_controller().get_session(session_id):
         return jsonify({'error': 'Session not found.'}), 404
-    session_data['name'] = new_name
-    ok = system_controller.session_controller.save_session(session_data)
     if ok:
         return jsonify({'success': True, 'message': 'Session renamed.'})
     return jsonify({'error': 'Failed to save session.'}), 500
@@ -0,0 +1,116 @@
+"""ASGI entry point.
+
+The query routes run natively on the event loop, so a question waiting on
+Gemini holds a coroutine instead of a thread. Every other route (sessions,
+uploads, admin pages) is served by the Flask app mounted underneath, which
+keeps its cookie sessions and templates unchanged.
+
+    uvicorn src.api.asgi:app --host 0.0.0.0 --port 5000 --workers 1
+"""
+import json
+from itsdangerous import BadSignature
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.middleware.wsgi import WSGIMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from src.core.config import Config
+from src.core.container import get_container
+from src.api.api import parse_filters
+
+STREAM_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no'
+}
+
+# app.py clears an admin session after five idle minutes and rewrites the
+# cookie on every request, so a cookie signed earlier than this is stale
+ADMIN_IDLE_SECONDS = 5 * 60
+
+def get_system_controller():
+    return get_container().system_controller
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_system_controller().initialize()
+    yield
+    get_system_controller().shutdown()
+
+app = FastAPI(title="Enterprise Q&A Chatbot", lifespan=lifespan, docs_url=None, redoc_url=None, openapi_url=None)
+
+def is_admin_logged_in(request: Request) -> bool:
+    """Read the admin flag from the Flask session cookie, so native routes honour the same login"""
+    cookie = request.cookies.get(flask_app.config['SESSION_COOKIE_NAME'])
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    if not cookie or serializer is None:
+        return False
+    try:
+        data = serializer.loads(cookie, max_age=ADMIN_IDLE_SECONDS)
+    except BadSignature:
+        return False
+    return isinstance(data, dict) and data.get('admin_logged_in') is True
+
+async def read_json(request: Request) -> dict:
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+@app.post('/api/query')
+async def query(request: Request):
+    data = await read_json(request)
+    query_text = data.get('query', '')
+    session_id = data.get('session_id')
+    if not query_text:
+        return JSONResponse({'error': 'Query is required'}, status_code=400)
+    filters, error = parse_filters(data)
+    if error:
+        return JSONResponse({'error': error}, status_code=400)
+    return await get_system_controller().process_query_async(query_text, session_id, filters)
+
+@app.post('/api/query/stream')
+async def query_stream(request: Request):
+    data = await read_json(request)
+    query_text = data.get('query', '')
+    session_id = data.get('session_id')
+    if not query_text:
+        return JSONResponse({'error': 'Query is required'}, status_code=400)
+    filters, error = parse_filters(data)
+    if error:
+        return JSONResponse({'error': error}, status_code=400)
+
+    async def generate():
+        async for event, payload in get_system_controller().stream_query_async(query_text, session_id, filters):
+            yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    return StreamingResponse(generate(), media_type='text/event-stream', headers=STREAM_HEADERS)
+
+@app.post('/api/query/batch')
+async def query_batch(request: Request):
+    if not is_admin_logged_in(request):
+        return JSONResponse({'error': 'Admin login required'}, status_code=401)
+    data = await read_json(request)
+    queries = data.get('queries')
+    if not isinstance(queries, list) or not queries or not all(isinstance(q, str) and q for q in queries):
+        return JSONResponse({'error': 'queries must be a non-empty list of strings'}, status_code=400)
+    if len(queries) > Config.BATCH_QUERY_MAX:
+        return JSONResponse({'error': f'At most {Config.BATCH_QUERY_MAX} queries per batch'}, status_code=400)
+    filters, error = parse_filters(data)
+    if error:
+        return JSONResponse({'error': error}, status_code=400)
+
+    async def generate():
+        async for result in get_system_controller().process_queries_async(queries, filters):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(generate(), media_type='application/x-ndjson', headers=STREAM_HEADERS)
+
+# Imported late: app.py builds the Flask app and registers api_blueprint, whose
+# query routes are shadowed by the async ones above
+from app import app as flask_app
+
+app.mount('/', WSGIMiddleware(flask_app))
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host=Config.HOST, port=Config.PORT)
@@ -1,18 +1,30 @@
-import os, json, datetime
+import os, json, mmap, hashlib, datetime, threading
+import numpy as np
+from collections import OrderedDict
 from src.core.config import Config
-from typing import List, Dict, Any, Optional
-from src.llm.embedding_service import GeminiEmbeddingService
+from src.core.pipeline import batched, prefetch
+from typing import List, Dict, Any, Optional, Callable, Union
+from src.llm.embedding_service import EmbeddingService, GeminiEmbeddingService
 from src.core.document_processor import PDFDocumentProcessor
-from src.vectordb.vector_database import ChromaDBVectorDatabase
-from src.model.models import Document, TextChunk, VectorEmbedding
+from src.vectordb.vector_database import VectorDatabase, ChromaDBVectorDatabase
+from src.model.models import Document, TextChunk, ChunkBatch
 
 class DocumentController:
     """Controller for document operations"""
-    def __init__(self):
+    def __init__(self, answer_cache=None, embedding_service: Optional[EmbeddingService] = None,
+                 vector_database: Optional[VectorDatabase] = None, lexical_index=None):
+        self.answer_cache = answer_cache
+        self.lexical_index = lexical_index
         self.document_processor = PDFDocumentProcessor()
-        self.embedding_service = GeminiEmbeddingService()
-        self.vector_database = ChromaDBVectorDatabase()
+        self.embedding_service = embedding_service or GeminiEmbeddingService()
+        self.vector_database = vector_database or ChromaDBVectorDatabase()
         self.documents = {}
+        self.metadata_lock = threading.Lock()
+        # Hashes of files being ingested right now, so a duplicate in the same job is caught too
+        self.pending_hashes = set()
+        # Documents with chunks in the stores that queries must not see: uploads still streaming in,
+        # and replaced revisions until their data is gone
+        self.hidden_documents = set()
         self.metadata_file = os.path.join(Config.VECTORDB_PATH, "document_metadata.json")
         os.makedirs(os.path.dirname(self.metadata_file), exist_ok=True)
         self.load_document_metadata()
@@ -36,50 +48,245 @@ class DocumentController:
 
     def save_document_metadata(self) -> None:
         try:
-            doc_data = {}
-            for doc_id, doc in self.documents.items():
-                doc_data[doc_id] = {
-                    'filename': doc.filename,
-                    'metadata': doc.metadata,
-                    'created_at': doc.created_at
-                }
-            with open(self.metadata_file, 'w') as f:
-                json.dump(doc_data, f, indent=2)
+            with self.metadata_lock:
+                doc_data = {}
+                for doc_id, doc in list(self.documents.items()):
+                    doc_data[doc_id] = {
+                        'filename': doc.filename,
+                        'metadata': doc.metadata,
+                        'created_at': doc.created_at
+                    }
+                with open(self.metadata_file, 'w') as f:
+                    json.dump(doc_data, f, indent=2)
         except Exception as e:
             print(f"Error saving document metadata: {e}")
 
-    def upload_document(self, file_path: str, filename: str, original_filename: Optional[str] = None) -> bool:
+    def find_document(self, content_hash: Optional[str] = None, original_filename: Optional[str] = None) -> Optional[Document]:
+        """Newest document with the given file hash or original filename"""
+        matches = [
+            doc for doc in list(self.documents.values())
+            if (content_hash is None or doc.metadata.get("content_hash") == content_hash)
+            and (original_filename is None or doc.metadata.get("original_filename") == original_filename)
+        ]
+        return max(matches, key=lambda doc: doc.created_at) if matches else None
+
+    def upload_document(self, file_path: str, filename: str, original_filename: Optional[str] = None,
+                        progress: Optional[Callable[[str, int], None]] = None, category: Optional[str] = None,
+                        replaces: Optional[str] = None) -> bool:
+        """Ingest a file, skipping exact duplicates. With replaces, the file is a new revision of that document.
+
+        Without replaces the file is always a new document, even if another
+        document has the same filename. A revision reuses the stored vectors
+        of every chunk whose text is unchanged. It stays hidden from queries
+        until all its chunks are stored, and is then swapped with the old
+        revision in one step, so queries see either the old revision or the
+        new one in full, never a mix. The file is memory-mapped rather than
+        read into memory. A revision uploaded without a category keeps the
+        category of the one it replaces.
+        """
+        content_hash = content = document = previous = None
         try:
-            with open(file_path, 'rb') as file:
-                content = file.read()
+            content = self.map_file(file_path)
+            content_hash = hashlib.sha256(content).hexdigest()
+            original_filename = original_filename or filename
+            with self.metadata_lock:
+                duplicate = content_hash in self.pending_hashes or self.find_document(content_hash=content_hash)
+                if not duplicate:
+                    self.pending_hashes.add(content_hash)
+            if duplicate:
+                print(f"Skipping {original_filename}: identical to an existing document")
+                self.unmap(content)
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                return True
+            if replaces:
+                with self.metadata_lock:
+                    previous = self.documents.get(replaces)
+                if not previous:
+                    raise ValueError(f"Document {replaces} not found; nothing to replace")
             doc_metadata = {
                 "source": file_path,
                 "created_at": datetime.datetime.now().isoformat(),
-                "original_filename": original_filename or filename
+                "original_filename": original_filename,
+                "content_hash": content_hash
             }
+            if previous:
+                doc_metadata["replaces"] = previous.get_id()
+            category = category or (previous.metadata.get("category") if previous else None)
+            if category:
+                doc_metadata["category"] = category
             document = Document(
                 filename=filename,
                 content=content,
                 metadata=doc_metadata
             )
-            self.documents[document.get_id()] = document
+            with self.metadata_lock:
+                self.hidden_documents.add(document.get_id())
+            try:
+                document.metadata["chunks"] = self.process_document(document, progress, previous)
+                if previous and not document.metadata["chunks"]:
+                    # Unreadable files extract to nothing; that must not replace a good revision
+                    raise ValueError(f"{original_filename} has no extractable text; keeping the previous revision")
+            except Exception:
+                self.unmap(content)
+                self.remove_document_data(document)
+                raise
+            self.unmap(content)
+            document.content = None
+            with self.metadata_lock:
+                self.documents[document.get_id()] = document
+                self.hidden_documents.discard(document.get_id())
+                if previous:
+                    self.documents.pop(previous.get_id(), None)
+                    self.hidden_documents.add(previous.get_id())
             self.save_document_metadata()
-            self.process_document(document)
+            if previous:
+                self.remove_document_data(previous)
+            if self.answer_cache:
+                if previous:
+                    self.answer_cache.invalidate_document(previous.get_id())
+                self.answer_cache.invalidate_unsourced()
             return True
         except Exception as e:
             print(f"Error uploading document: {e}")
             return False
+        finally:
+            self.unmap(content)
+            with self.metadata_lock:
+                self.pending_hashes.discard(content_hash)
+                for hidden in (document, previous):
+                    if hidden is not None:
+                        self.hidden_documents.discard(hidden.get_id())
+
+    @staticmethod
+    def map_file(file_path: str) -> Union[mmap.mmap, bytes]:
+        """Read-only memory map of a file, so the OS pages a large PDF in instead of it being copied"""
+        with open(file_path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                # Empty files cannot be mapped
+                return b""
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @staticmethod
+    def unmap(content) -> None:
+        # Idempotent; the map has to be closed before the file can be removed on Windows
+        if isinstance(content, mmap.mmap):
+            content.close()
+
+    def process_document(self, document: Document, progress: Optional[Callable[[str, int], None]] = None,
+                         previous: Optional[Document] = None) -> int:
+        """Stream pages into chunks and chunks into embedded, stored batches; returns the chunk count.
+
+        Extraction and chunking run on a helper thread, at most
+        INGEST_MEMORY_LIMIT_MB of chunk batches ahead of embedding and
+        storage, so a very large PDF never has all its text, chunks or
+        vectors in memory at once.
+        """
+        known = self.vector_database.get_document_embeddings(previous.get_id()) if previous else {}
+        recent: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        pages = self.document_processor.iter_pages(document, progress)
+        chunks = self.document_processor.iter_chunks(pages, document.get_id())
+        dimension = getattr(self.embedding_service, "dimension", Config.EMBEDDING_DIMENSION)
+        total = embedded = 0
+        for batch in prefetch(batched(chunks, Config.INGEST_BATCH_CHUNKS), lambda batch: self.estimate_batch_bytes(batch, dimension),
+                              Config.INGEST_MEMORY_LIMIT_MB * 1024 * 1024, name="ingest-extract"):
+            if progress:
+                progress("chunks_total", len(batch))
+            embedded += self.generate_and_store_embeddings(batch, progress, known, recent)
+            total += len(batch)
+        self.vector_database.flush()
+        if embedded < total:
+            print(f"Embedded {embedded} of {total} chunks, reused {total - embedded}")
+        return total
 
-    def process_document(self, document: Document) -> List[TextChunk]:
-        text = self.document_processor.extract_text(document)
-        chunks = self.document_processor.chunk_text(text, document.get_id())
-        self.generate_and_store_embeddings(chunks)
-        return chunks
+    @staticmethod
+    def estimate_batch_bytes(chunks: List[TextChunk], dimension: int) -> int:
+        """Rough memory held by a chunk batch until it is stored: text and objects, plus its vectors,
+        which arrive from the API as lists of boxed floats (about 32 bytes each) before being packed"""
+        return sum(len(chunk.get_text()) + 256 for chunk in chunks) + len(chunks) * dimension * 36
 
-    def generate_and_store_embeddings(self, chunks: List[TextChunk]) -> None:
-        embeddings = self.embedding_service.generate_chunk_embeddings(chunks)
-        for i, embedding in enumerate(embeddings):
-            self.vector_database.store(embedding, chunks[i])
+    def generate_and_store_embeddings(self, chunks: List[TextChunk], progress: Optional[Callable[[str, int], None]] = None,
+                                      known: Optional[Dict[str, np.ndarray]] = None,
+                                      recent: Optional["OrderedDict[str, np.ndarray]"] = None) -> int:
+        """Embed and store chunks, embedding each distinct text once; returns how many were embedded.
+
+        Vectors are reused from known (a previous revision of the document)
+        and from recent, a bounded LRU of the vectors this document embedded
+        in earlier batches, which is updated in place.
+        """
+        known = known or {}
+        recent = OrderedDict() if recent is None else recent
+        hashes = [chunk.content_hash() for chunk in chunks]
+        vectors, pending = {}, {}
+        for chunk, content_hash in zip(chunks, hashes):
+            if content_hash in vectors or content_hash in pending:
+                continue
+            vector = known.get(content_hash)
+            if vector is None and content_hash in recent:
+                recent.move_to_end(content_hash)
+                vector = recent[content_hash]
+            # All-zero vectors are what a failed embedding batch leaves behind; embed those chunks again
+            if vector is not None and np.any(vector):
+                vectors[content_hash] = vector
+            else:
+                pending[content_hash] = chunk
+        reused = len(chunks) - len(pending)
+        if reused and progress:
+            progress("chunks_embedded", reused)
+        if pending:
+            embedded = self.embedding_service.generate_chunk_embeddings(list(pending.values()), progress)
+            for content_hash, embedding in zip(pending, embedded):
+                vectors[content_hash] = recent[content_hash] = embedding.get_vector()
+            while len(recent) > Config.INGEST_REUSE_ENTRIES:
+                recent.popitem(last=False)
+        if not chunks:
+            return 0
+        batch = ChunkBatch.from_chunks(chunks, np.stack([vectors[content_hash] for content_hash in hashes]))
+        batch_size = Config.VECTORDB_BATCH_SIZE
+        for start in range(0, len(batch), batch_size):
+            part = batch[start:start + batch_size]
+            self.vector_database.store_batch(part)
+            if progress:
+                progress("chunks_stored", len(part))
+        if self.lexical_index is not None:
+            self.lexical_index.add(chunks)
+        return len(pending)
+
+    def remove_document_data(self, document: Document) -> None:
+        """Drop a document's file, vectors and lexical postings, leaving its metadata entry alone"""
+        file_to_delete = os.path.join(Config.UPLOAD_FOLDER, document.filename)
+        if os.path.exists(file_to_delete):
+            os.remove(file_to_delete)
+        try:
+            self.vector_database.delete_document_data(document.get_id())
+        except Exception as e_vec:
+            print(f"Error deleting document {document.get_id()} from vector database: {e_vec}")
+        if self.lexical_index is not None:
+            self.lexical_index.remove_document(document.get_id())
+
+    def resolve_filters(self, filters: Optional[Dict[str, List[str]]]) -> Optional[List[str]]:
+        """Ids of the documents a query is scoped to by {"document_ids": [...], "categories": [...]}; None for all.
+
+        A document is in scope when it is listed or filed under one of the
+        categories. Ids no longer in the registry (deleted, or replaced by a
+        revision) match nothing, so such a filter can scope a query to no
+        documents at all.
+        """
+        if not filters:
+            return None
+        wanted = set(filters.get("document_ids") or ())
+        categories = set(filters.get("categories") or ())
+        if not wanted and not categories:
+            return None
+        return [
+            document_id for document_id, document in list(self.documents.items())
+            if document_id in wanted or document.metadata.get("category") in categories
+        ]
+
+    def hidden_document_ids(self) -> List[str]:
+        """Documents queries must leave out, however they are scoped (see hidden_documents)"""
+        with self.metadata_lock:
+            return list(self.hidden_documents)
 
     def get_documents(self) -> List[Dict[str, Any]]:
         def strip_id_prefix(filename):
@@ -101,17 +308,11 @@ class DocumentController:
             print(f"Document with ID {document_id} not found in metadata.")
             return False
         try:
-            doc = self.documents[document_id]
-            filename = doc.filename
-            file_to_delete = os.path.join(Config.UPLOAD_FOLDER, filename)
-            if os.path.exists(file_to_delete):
-                os.remove(file_to_delete)
-            try:
-                self.vector_database.delete_document_data(document_id)
-            except Exception as e_vec:
-                print(f"Error deleting document {document_id} from vector database: {e_vec}")
+            self.remove_document_data(self.documents[document_id])
             del self.documents[document_id]
             self.save_document_metadata()
+            if self.answer_cache:
+                self.answer_cache.invalidate_document(document_id)
             return True
         except Exception as e:
             print(f"Error during deletion process for document {document_id}: {e}")
@@ -0,0 +1,111 @@
+import time, uuid, threading
+from datetime import datetime
+from src.core.config import Config
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Any, Tuple
+
+PROGRESS_FIELDS = ("pages_total", "pages_extracted", "chunks_total", "chunks_embedded", "chunks_stored")
+
+class IngestionJobController:
+    """Runs document ingestion in a background worker pool and tracks per-file progress"""
+    def __init__(self, document_controller, max_workers: int = None):
+        self.document_controller = document_controller
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or Config.INGESTION_WORKERS,
+            thread_name_prefix="ingestion"
+        )
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+
+    def submit(self, files: List[Tuple[str, str, str]], category: Optional[str] = None,
+               replaces: Optional[str] = None) -> Dict[str, Any]:
+        """Queue (file_path, filename, original_filename) tuples, all filed under category, and return the new job.
+
+        replaces names the document a single uploaded file is a new revision of.
+        """
+        if replaces and len(files) != 1:
+            raise ValueError("Only a single file can replace a document")
+        self.prune_jobs()
+        job_id = f"job-{uuid.uuid4()}"
+        job = {
+            "id": job_id,
+            "status": "queued",
+            "created_at": datetime.now().isoformat(),
+            "finished_at": None,
+            "files": []
+        }
+        for file_path, filename, original_filename in files:
+            entry = {
+                "id": filename,
+                "filename": original_filename or filename,
+                "status": "queued",
+                "error": None
+            }
+            entry.update({field: 0 for field in PROGRESS_FIELDS})
+            job["files"].append(entry)
+        with self.lock:
+            self.jobs[job_id] = job
+        for index, (file_path, filename, original_filename) in enumerate(files):
+            self.executor.submit(self._run_file, job_id, index, file_path, filename, original_filename, category,
+                                 replaces)
+        return self.get_job(job_id)
+
+    def _run_file(self, job_id: str, index: int, file_path: str, filename: str, original_filename: str,
+                  category: Optional[str] = None, replaces: Optional[str] = None) -> None:
+        self._update_file(job_id, index, status="running")
+
+        def progress(stage: str, count: int) -> None:
+            with self.lock:
+                entry = self.jobs[job_id]["files"][index]
+                entry[stage] = entry.get(stage, 0) + count
+
+        try:
+            success = self.document_controller.upload_document(
+                file_path, filename, original_filename, progress=progress, category=category, replaces=replaces
+            )
+            if success:
+                self._update_file(job_id, index, status="completed")
+            else:
+                self._update_file(job_id, index, status="failed", error="Processing failed")
+        except Exception as e:
+            print(f"Error processing {filename} in job {job_id}: {e}")
+            self._update_file(job_id, index, status="failed", error=str(e))
+
+    def _update_file(self, job_id: str, index: int, **fields) -> None:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job:
+                return
+            job["files"][index].update(fields)
+            statuses = [f["status"] for f in job["files"]]
+            if any(s in ("queued", "running") for s in statuses):
+                job["status"] = "queued" if all(s == "queued" for s in statuses) else "running"
+                return
+            if all(s == "completed" for s in statuses):
+                job["status"] = "completed"
+            elif any(s == "completed" for s in statuses):
+                job["status"] = "partial"
+            else:
+                job["status"] = "failed"
+            job["finished_at"] = datetime.now().isoformat()
+            job["_finished_ts"] = time.time()
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job:
+                return None
+            snapshot = {k: v for k, v in job.items() if not k.startswith("_")}
+            snapshot["files"] = [dict(f) for f in job["files"]]
+        return snapshot
+
+    def prune_jobs(self) -> None:
+        """Forget finished jobs older than INGESTION_JOB_TTL seconds"""
+        cutoff = time.time() - Config.INGESTION_JOB_TTL
+        with self.lock:
+            expired = [job_id for job_id, job in self.jobs.items() if job.get("_finished_ts", cutoff + 1) < cutoff]
+            for job_id in expired:
+                del self.jobs[job_id]
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.executor.shutdown(wait=wait)
@@ -1,35 +1,345 @@
+import time, asyncio
 from src.core.config import Config
-from typing import List, Dict, Any
+from src.core.metrics import metrics
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Iterator, AsyncIterator, Tuple, Optional, Collection, Callable
 from src.model.models import Query, TextChunk, Response
-from src.llm.embedding_service import GeminiEmbeddingService
-from src.vectordb.vector_database import ChromaDBVectorDatabase
+from src.llm.llm_service import GENERATION_ERROR_MESSAGE
+from src.llm.embedding_service import EmbeddingService, GeminiEmbeddingService
+from src.vectordb.vector_database import VectorDatabase, ChromaDBVectorDatabase
 
 class QueryController:
     """Controller for query operations"""
-    def __init__(self, response_controller):
-        self.embedding_service = GeminiEmbeddingService()
-        self.vector_database = ChromaDBVectorDatabase()
+    def __init__(self, response_controller, answer_cache=None, embedding_service: Optional[EmbeddingService] = None,
+                 vector_database: Optional[VectorDatabase] = None, lexical_index=None, reranker=None,
+                 hidden_documents: Optional[Callable[[], Collection[str]]] = None):
+        self.embedding_service = embedding_service or GeminiEmbeddingService()
+        self.vector_database = vector_database or ChromaDBVectorDatabase()
         self.response_controller = response_controller
+        self.answer_cache = answer_cache
+        self.lexical_index = lexical_index
+        self.reranker = reranker
+        # Ids of documents whose stored chunks must not be retrieved yet (DocumentController.hidden_document_ids)
+        self.hidden_documents = hidden_documents
 
-    def process_query(self, query_text: str, query_id: str = None) -> Dict[str, Any]:
+    def process_query(self, query_text: str, query_id: str = None,
+                      document_ids: Optional[Collection[str]] = None) -> Dict[str, Any]:
+        """Answer one question; document_ids, when given, limits retrieval to those documents"""
+        start, scope = time.perf_counter(), self._scope(document_ids)
+        cached = self._cached(query_text, scope)
+        if cached:
+            return cached
         query = Query(query_text)
-        query_embedding = self.embedding_service.generate_embedding(query_text)
-        query.set_embedding(query_embedding)
-        relevant_chunks = self.find_relevant_chunks(query_embedding)
+        with metrics.span("embed_query"):
+            query.set_embedding(self.embedding_service.generate_embedding(query_text))
+        cached = self._cached_similar(query, scope)
+        if cached:
+            return cached
+        relevant_chunks = self.find_relevant_chunks(query.get_embedding(), query_text, document_ids)
         if relevant_chunks:
-            response = self.response_controller.generate_response(query, relevant_chunks)
+            with metrics.span("generate"):
+                response = self.response_controller.generate_response(query, relevant_chunks)
         else:
             response = self.response_controller.generate_no_info_response(query)
-        return response.to_dict()
+        return self._finish(query, response, time.perf_counter() - start, scope)
 
-    def find_relevant_chunks(self, query_embedding) -> List[TextChunk]:
-        results = self.vector_database.find_similar(
-            query_embedding,
-            limit=Config.MAX_RELEVANT_CHUNKS
-        )
+    def stream_query(self, query_text: str, document_ids: Optional[Collection[str]] = None) -> Iterator[Tuple[str, Any]]:
+        """Yield ("sources", [...]) first, then ("token", text) pieces, then ("done", response dict)"""
+        start, scope = time.perf_counter(), self._scope(document_ids)
+        query = Query(query_text)
+        cached = self._cached(query_text, scope)
+        if not cached:
+            with metrics.span("embed_query"):
+                query.set_embedding(self.embedding_service.generate_embedding(query_text))
+            cached = self._cached_similar(query, scope)
+        if cached:
+            yield from self._replay(cached)
+            return
+        relevant_chunks = self.find_relevant_chunks(query.get_embedding(), query_text, document_ids)
+        if not relevant_chunks:
+            yield from self._replay(self._finish(query, self.response_controller.generate_no_info_response(query),
+                                                 time.perf_counter() - start, scope))
+            return
+        # Built once here so the sources and usage reported are those of the prompt actually sent
+        prompt, used_chunks, usage = self.response_controller.build_prompt(query, relevant_chunks)
+        yield "sources", [chunk.to_dict() for chunk in used_chunks]
+        parts = []
+        generation_start = time.perf_counter()
+        for text in self.response_controller.stream_response(query, used_chunks, prompt):
+            if not parts:
+                metrics.observe("first_token", time.perf_counter() - generation_start)
+            parts.append(text)
+            yield "token", text
+        # Includes time the client took to read each token
+        metrics.observe("generate_stream", time.perf_counter() - generation_start)
+        response = Response(query.get_id(), "".join(parts), used_chunks, 0.8, usage)
+        yield "done", self._finish(query, response, time.perf_counter() - start, scope)
+
+    async def process_query_async(self, query_text: str, query_id: str = None,
+                                  document_ids: Optional[Collection[str]] = None) -> Dict[str, Any]:
+        """process_query for the ASGI app: network waits are awaited, not blocking a thread"""
+        start, scope = time.perf_counter(), self._scope(document_ids)
+        cached = self._cached(query_text, scope)
+        if cached:
+            return cached
+        query = Query(query_text)
+        with metrics.span("embed_query"):
+            query.set_embedding(await self.embedding_service.generate_embedding_async(query_text))
+        cached = self._cached_similar(query, scope)
+        if cached:
+            return cached
+        relevant_chunks = await asyncio.to_thread(self.find_relevant_chunks, query.get_embedding(), query_text, document_ids)
+        if relevant_chunks:
+            with metrics.span("generate"):
+                response = await self.response_controller.generate_response_async(query, relevant_chunks)
+        else:
+            response = self.response_controller.generate_no_info_response(query)
+        return self._finish(query, response, time.perf_counter() - start, scope)
+
+    async def stream_query_async(self, query_text: str,
+                                 document_ids: Optional[Collection[str]] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """Async counterpart of stream_query with the same event sequence"""
+        start, scope = time.perf_counter(), self._scope(document_ids)
+        query = Query(query_text)
+        cached = self._cached(query_text, scope)
+        if not cached:
+            with metrics.span("embed_query"):
+                query.set_embedding(await self.embedding_service.generate_embedding_async(query_text))
+            cached = self._cached_similar(query, scope)
+        if cached:
+            for event in self._replay(cached):
+                yield event
+            return
+        relevant_chunks = await asyncio.to_thread(self.find_relevant_chunks, query.get_embedding(), query_text, document_ids)
+        if not relevant_chunks:
+            for event in self._replay(self._finish(query, self.response_controller.generate_no_info_response(query),
+                                                   time.perf_counter() - start, scope)):
+                yield event
+            return
+        prompt, used_chunks, usage = self.response_controller.build_prompt(query, relevant_chunks)
+        yield "sources", [chunk.to_dict() for chunk in used_chunks]
+        parts = []
+        generation_start = time.perf_counter()
+        async for text in self.response_controller.stream_response_async(query, used_chunks, prompt):
+            if not parts:
+                metrics.observe("first_token", time.perf_counter() - generation_start)
+            parts.append(text)
+            yield "token", text
+        metrics.observe("generate_stream", time.perf_counter() - generation_start)
+        response = Response(query.get_id(), "".join(parts), used_chunks, 0.8, usage)
+        yield "done", self._finish(query, response, time.perf_counter() - start, scope)
+
+    def process_queries(self, query_texts: List[str], max_concurrency: int = None,
+                        document_ids: Optional[Collection[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Answer many queries, yielding each result as soon as its answer is ready.
+
+        All cache misses are embedded together and retrieved with one vector
+        search; only generation runs per query, at most max_concurrency at a time.
+        Every result carries the index of its query in query_texts.
+        """
+        start, scope = time.perf_counter(), self._scope(document_ids)
+        hits, pending = self._batch_cached(query_texts, scope)
+        yield from hits
+        if not pending:
+            return
+        with metrics.span("embed_query_batch"):
+            embeddings = self.embedding_service.generate_query_embeddings([query_text for _, query_text in pending])
+        hits, misses = self._batch_cached_similar(pending, embeddings, scope)
+        yield from hits
+        if not misses:
+            return
+        hidden = self._hidden()
+        with metrics.span("retrieve_batch"):
+            results = self.vector_database.find_similar_many(
+                [query.get_embedding() for _, query in misses], self._candidate_limit(), document_ids, hidden
+            )
+        retrieval_time = time.perf_counter() - start
+
+        def answer(index: int, query: Query, similar: List[Dict[str, Any]]) -> Dict[str, Any]:
+            answer_start = time.perf_counter()
+            relevant_chunks = self._relevant(similar, query.get_text(), document_ids, hidden)
+            if relevant_chunks:
+                with metrics.span("generate"):
+                    response = self.response_controller.generate_response(query, relevant_chunks)
+            else:
+                response = self.response_controller.generate_no_info_response(query)
+            latency = retrieval_time + time.perf_counter() - answer_start
+            return dict(self._finish(query, response, latency, scope), index=index, query=query.get_text())
+
+        workers = max(1, min(max_concurrency or Config.BATCH_QUERY_CONCURRENCY, len(misses)))
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = {
+                executor.submit(answer, index, query, similar): (index, query)
+                for (index, query), similar in zip(misses, results)
+            }
+            for future in as_completed(futures):
+                try:
+                    yield future.result()
+                except Exception as e:
+                    yield self._batch_error(*futures[future], e)
+        finally:
+            # A closed generator (client gone) must not keep generating the rest of the batch
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def process_queries_async(self, query_texts: List[str], max_concurrency: int = None,
+                                    document_ids: Optional[Collection[str]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Async counterpart of process_queries; generation is bounded by a semaphore, not a thread pool"""
+        start, scope = time.perf_counter(), self._scope(document_ids)
+        hits, pending = self._batch_cached(query_texts, scope)
+        for hit in hits:
+            yield hit
+        if not pending:
+            return
+        with metrics.span("embed_query_batch"):
+            embeddings = await self.embedding_service.generate_query_embeddings_async([query_text for _, query_text in pending])
+        hits, misses = self._batch_cached_similar(pending, embeddings, scope)
+        for hit in hits:
+            yield hit
+        if not misses:
+            return
+        hidden = self._hidden()
+        with metrics.span("retrieve_batch"):
+            results = await asyncio.to_thread(
+                self.vector_database.find_similar_many,
+                [query.get_embedding() for _, query in misses], self._candidate_limit(), document_ids, hidden
+            )
+        retrieval_time = time.perf_counter() - start
+        semaphore = asyncio.Semaphore(max(1, max_concurrency or Config.BATCH_QUERY_CONCURRENCY))
+
+        async def answer(index: int, query: Query, similar: List[Dict[str, Any]]) -> Dict[str, Any]:
+            try:
+                async with semaphore:
+                    answer_start = time.perf_counter()
+                    relevant_chunks = self._relevant(similar, query.get_text(), document_ids, hidden)
+                    if relevant_chunks:
+                        with metrics.span("generate"):
+                            response = await self.response_controller.generate_response_async(query, relevant_chunks)
+                    else:
+                        response = self.response_controller.generate_no_info_response(query)
+                latency = retrieval_time + time.perf_counter() - answer_start
+                return dict(self._finish(query, response, latency, scope), index=index, query=query.get_text())
+            except Exception as e:
+                return self._batch_error(index, query, e)
+
+        tasks = [asyncio.create_task(answer(index, query, similar)) for (index, query), similar in zip(misses, results)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _cached(self, query_text: str, scope: str) -> Optional[Dict[str, Any]]:
+        return self.answer_cache.get_exact(query_text, scope) if self.answer_cache else None
+
+    def _cached_similar(self, query: Query, scope: str) -> Optional[Dict[str, Any]]:
+        """Answer to a near-identical earlier question; a miss is counted once the embedding has been checked"""
+        if not self.answer_cache:
+            return None
+        cached = self.answer_cache.get_similar(query.get_embedding().get_vector(), scope)
+        if not cached:
+            self.answer_cache.record_miss()
+        return cached
+
+    def _finish(self, query: Query, response: Response, latency: float, scope: str) -> Dict[str, Any]:
+        """Response dict, cached unless generation failed"""
+        response_dict = response.to_dict()
+        content = response.get_content()
+        if self.answer_cache and content and not content.endswith(GENERATION_ERROR_MESSAGE):
+            self.answer_cache.put(query.get_text(), query.get_embedding().get_vector(), response_dict, latency, scope)
+        return response_dict
+
+    @staticmethod
+    def _replay(response: Dict[str, Any]) -> List[Tuple[str, Any]]:
+        """Stream events for an answer that is already complete"""
+        return [("sources", response.get("sources", [])), ("token", response.get("content", "")), ("done", response)]
+
+    def _batch_cached(self, query_texts: List[str], scope: str) -> Tuple[List[Dict[str, Any]], List[Tuple[int, str]]]:
+        """Exact cache hits as batch results, and the (index, text) of every other query"""
+        hits, pending = [], []
+        for index, query_text in enumerate(query_texts):
+            cached = self._cached(query_text, scope)
+            if cached:
+                hits.append(dict(cached, index=index, query=query_text))
+            else:
+                pending.append((index, query_text))
+        return hits, pending
+
+    def _batch_cached_similar(self, pending: List[Tuple[int, str]], embeddings,
+                              scope: str) -> Tuple[List[Dict[str, Any]], List[Tuple[int, Query]]]:
+        """Similarity cache hits as batch results, and the embedded (index, Query) of every miss"""
+        hits, misses = [], []
+        for (index, query_text), embedding in zip(pending, embeddings):
+            query = Query(query_text)
+            query.set_embedding(embedding)
+            cached = self._cached_similar(query, scope)
+            if cached:
+                hits.append(dict(cached, index=index, query=query_text))
+            else:
+                misses.append((index, query))
+        return hits, misses
+
+    @staticmethod
+    def _batch_error(index: int, query: Query, error: Exception) -> Dict[str, Any]:
+        print(f"Error answering batch query {index}: {error}")
+        return {"index": index, "query": query.get_text(), "error": str(error)}
+
+    def find_relevant_chunks(self, query_embedding, query_text: str = None,
+                             document_ids: Optional[Collection[str]] = None) -> List[TextChunk]:
+        hidden = self._hidden()
+        with metrics.span("retrieve"):
+            results = self.vector_database.find_similar(
+                query_embedding,
+                limit=self._candidate_limit(),
+                document_ids=document_ids,
+                exclude_document_ids=hidden
+            )
+        return self._relevant(results, query_text, document_ids, hidden)
+
+    def _hidden(self) -> Optional[List[str]]:
+        # Not part of the cache scope: an answer without them is the answer over every visible document
+        hidden = self.hidden_documents() if self.hidden_documents else None
+        return list(hidden) if hidden else None
+
+    def _scope(self, document_ids: Optional[Collection[str]]) -> str:
+        return self.answer_cache.scope_key(document_ids) if self.answer_cache else ""
+
+    def _pool_size(self) -> int:
+        """Chunks kept after fusion: the reranker's candidate pool, or the final context size"""
+        return max(Config.MAX_RELEVANT_CHUNKS, Config.RERANK_CANDIDATES) if self.reranker else Config.MAX_RELEVANT_CHUNKS
+
+    def _candidate_limit(self) -> int:
+        # Fusion and reranking need a deeper vector list than the final answer context
+        if self.lexical_index is not None:
+            return max(self._pool_size(), Config.HYBRID_CANDIDATES)
+        return self._pool_size()
+
+    def _relevant(self, results: List[Dict[str, Any]], query_text: str = None, document_ids: Optional[Collection[str]] = None,
+                  hidden: Optional[Collection[str]] = None) -> List[TextChunk]:
         chunks = []
         for result in results:
             similarity_score = result["score"]
             if similarity_score > 0.1:
                 chunks.append(result["chunk"])
-        return chunks
+        if self.lexical_index is not None and query_text:
+            with metrics.span("lexical_search"):
+                lexical_hits = self.lexical_index.search(query_text, Config.HYBRID_CANDIDATES, document_ids, hidden)
+            chunks = self.fuse(chunks, lexical_hits, self._pool_size())
+        if self.reranker is not None and query_text:
+            return self.reranker.rerank(query_text, chunks)
+        return chunks[:Config.MAX_RELEVANT_CHUNKS]
+
+    def fuse(self, vector_chunks: List[TextChunk], lexical_hits: List[Tuple[str, float]], keep: int = None) -> List[TextChunk]:
+        """Reciprocal-rank fusion of vector and BM25 rankings, keeping the best keep (MAX_RELEVANT_CHUNKS)"""
+        scores: Dict[str, float] = {}
+        chunks = {chunk.get_id(): chunk for chunk in vector_chunks}
+        for rank, chunk in enumerate(vector_chunks):
+            scores[chunk.get_id()] = scores.get(chunk.get_id(), 0.0) + 1.0 / (Config.RRF_K + rank + 1)
+        for rank, (chunk_id, _) in enumerate(lexical_hits):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (Config.RRF_K + rank + 1)
+        ranked = sorted(scores, key=scores.get, reverse=True)[:keep or Config.MAX_RELEVANT_CHUNKS]
+        missing = [chunk_id for chunk_id in ranked if chunk_id not in chunks]
+        if missing:
+            chunks.update(self.vector_database.get_chunks(missing))
+        return [chunks[chunk_id] for chunk_id in ranked if chunk_id in chunks]
@@ -1,14 +1,27 @@
-from typing import List
-from src.llm.llm_service import GeminiLLMService
+from typing import List, Dict, Iterator, AsyncIterator, Optional, Tuple
+from src.llm.llm_service import LLMService, GeminiLLMService
 from src.model.models import Query, TextChunk, Response
 
 class ResponseController:
     """Controller for response operations"""
-    def __init__(self):
-        self.llm_service = GeminiLLMService()
+    def __init__(self, llm_service: Optional[LLMService] = None):
+        self.llm_service = llm_service or GeminiLLMService()
 
     def generate_response(self, query: Query, relevant_chunks: List[TextChunk]) -> Response:
         return self.llm_service.generate_response(query, relevant_chunks)
 
+    def build_prompt(self, query: Query, relevant_chunks: List[TextChunk]) -> Tuple[Optional[str], List[TextChunk], Dict[str, int]]:
+        return self.llm_service.build_prompt(query, relevant_chunks)
+
+    def stream_response(self, query: Query, relevant_chunks: List[TextChunk], prompt: Optional[str] = None) -> Iterator[str]:
+        return self.llm_service.stream_response(query, relevant_chunks, prompt)
+
+    async def generate_response_async(self, query: Query, relevant_chunks: List[TextChunk]) -> Response:
+        return await self.llm_service.generate_response_async(query, relevant_chunks)
+
+    def stream_response_async(self, query: Query, relevant_chunks: List[TextChunk],
+                              prompt: Optional[str] = None) -> AsyncIterator[str]:
+        return self.llm_service.stream_response_async(query, relevant_chunks, prompt)
+
     def generate_no_info_response(self, query: Query) -> Response:
         return self.llm_service.generate_no_info_response(query)
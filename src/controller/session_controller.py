@@ -1,15 +1,27 @@
-import json, os, uuid
+import os, uuid
 from datetime import datetime
+from src.core.config import Config
 from typing import Dict, List, Optional, Any
+from src.sqldb.session_store import SessionStore, JSONSessionStore, SQLiteSessionStore, migrate_json_sessions
 
 class SessionController:
     """Controller for managing chat sessions"""
-    def __init__(self, sessions_dir: str = "static/json"):
-        self.sessions_dir = sessions_dir
-        os.makedirs(self.sessions_dir, exist_ok=True)
+    def __init__(self, sessions_dir: str = None, store: Optional[SessionStore] = None):
+        self.sessions_dir = sessions_dir or Config.SESSIONS_DIR
+        self.store = store or self.create_store()
 
-    def get_session_file_path(self, session_id: str) -> str:
-        return os.path.join(self.sessions_dir, f"{session_id}.json")
+    def create_store(self) -> SessionStore:
+        if Config.SESSION_BACKEND == "json":
+            return JSONSessionStore(self.sessions_dir)
+        store = SQLiteSessionStore(Config.SESSION_DB_PATH)
+        # One-shot import of sessions written by the JSON backend
+        if not store.get_meta("json_migrated"):
+            if os.path.isdir(self.sessions_dir):
+                count = migrate_json_sessions(self.sessions_dir, store)
+                if count:
+                    print(f"Migrated {count} JSON session(s) into {Config.SESSION_DB_PATH}")
+            store.set_meta("json_migrated", datetime.now().isoformat())
+        return store
 
     def create_session(self, user_id: str = "anonymous") -> Dict[str, Any]:
         session_id = f"sess-{str(uuid.uuid4())}"
@@ -31,75 +43,31 @@ class SessionController:
         return session_data
 
     def load_session(self, session_id: str) -> Optional[Dict[str, Any]]:
-        file_path = self.get_session_file_path(session_id)
-        if not os.path.exists(file_path):
-            return None
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                if isinstance(data, list) and len(data) == 1 and isinstance(data[0], dict):
-                    data = data[0]
-                if not isinstance(data, dict):
-                    return None
-                return data
-        except (json.JSONDecodeError, IOError) as e:
-            print(f"Error loading session {session_id}: {e}")
-            return None
+        return self.store.load(session_id)
 
     def save_session(self, session_data: Dict[str, Any]) -> bool:
-        session_id = session_data.get("id")
-        if not session_id:
-            return False
-        file_path = self.get_session_file_path(session_id)
-        try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(session_data, f, indent=2, ensure_ascii=False)
-            return True
-        except IOError as e:
-            print(f"Error saving session {session_id}: {e}")
-            return False
+        return self.store.save(session_data)
+
+    def rename_session(self, session_id: str, name: str) -> bool:
+        return self.store.rename(session_id, name)
 
     def add_message_to_session(self, session_id: str, role: str, content: str, sources: List[Dict] = None) -> bool:
-        session_data = self.load_session(session_id)
-        if not session_data:
-            return False
         message = {
             "role": role,
             "content": content,
             "time": datetime.now().isoformat(),
             "sources": sources or []
         }
-        session_data["messages"].append(message)
-        if role == "user" and len([m for m in session_data["messages"] if m["role"] == "user"]) == 1:
+        counts = self.store.append_message(session_id, message)
+        if not counts:
+            return False
+        if role == "user" and counts["user_message_count"] == 1:
             words = content.split()[:4]
-            session_data["name"] = " ".join(words) if words else "New Chat"
-        return self.save_session(session_data)
+            self.store.rename(session_id, " ".join(words) if words else "New Chat")
+        return True
 
     def get_user_sessions(self, user_id: str = "anonymous") -> List[Dict[str, Any]]:
-        sessions = []
-        if not os.path.exists(self.sessions_dir):
-            return sessions
-        for filename in os.listdir(self.sessions_dir):
-            if filename.endswith('.json') and filename.startswith('sess-'):
-                session_id = filename[:-5]
-                session_data = self.load_session(session_id)
-                if session_data and session_data.get("user_id") == user_id:
-                    sessions.append({
-                        "id": session_data["id"],
-                        "name": session_data["name"],
-                        "created_at": session_data["created_at"],
-                        "message_count": len(session_data.get("messages", []))
-                    })
-        sessions.sort(key=lambda x: x["created_at"], reverse=True)
-        return sessions
+        return self.store.list_sessions(user_id)
 
     def delete_session(self, session_id: str) -> bool:
-        file_path = self.get_session_file_path(session_id)
-        try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                return True
-            return False
-        except OSError as e:
-            print(f"Error deleting session {session_id}: {e}")
-            return False
+        return self.store.delete(session_id)
@@ -1,42 +1,156 @@
-import os
-from typing import Dict, Any
+import os, asyncio
+from typing import List, Dict, Any, Iterator, AsyncIterator, Tuple, Optional
 from src.core.config import Config
+from src.core.metrics import metrics
+from src.core.container import ServiceContainer, get_container
+from src.core.document_processor import PDFDocumentProcessor
 from src.controller.document_controller import DocumentController
 from src.controller.response_controller import ResponseController
 from src.controller.query_controller import QueryController
 from src.controller.session_controller import SessionController
+from src.controller.ingestion_controller import IngestionJobController
 
 class SystemController:
     """Main system controller that coordinates all operations"""
-    def __init__(self):
-        self.response_controller = ResponseController()
-        self.document_controller = DocumentController()
-        self.query_controller = QueryController(self.response_controller)
+    def __init__(self, container: Optional[ServiceContainer] = None):
+        container = container or get_container()
+        self.answer_cache = container.answer_cache
+        self.response_controller = ResponseController(container.llm_service)
+        self.document_controller = DocumentController(
+            self.answer_cache, container.embedding_service, container.vector_database, container.lexical_index
+        )
+        self.query_controller = QueryController(
+            self.response_controller, self.answer_cache, container.embedding_service, container.vector_database,
+            container.lexical_index, container.reranker, self.document_controller.hidden_document_ids
+        )
         self.session_controller = SessionController()
+        self.ingestion_controller = IngestionJobController(self.document_controller)
 
     def initialize(self) -> None:
         print("System initialized")
 
     def shutdown(self) -> None:
+        self.ingestion_controller.shutdown()
+        PDFDocumentProcessor.shutdown_pool()
+        close = getattr(self.document_controller.vector_database, "close", None)
+        if close:
+            close()
         print("System shutdown")
 
-    def process_query(self, query_text: str, session_id: str = None) -> Dict[str, Any]:
+    def process_query(self, query_text: str, session_id: str = None,
+                      filters: Optional[Dict[str, List[str]]] = None) -> Dict[str, Any]:
+        """Answer a question in a chat session; filters scope it to documents (see DocumentController.resolve_filters)"""
+        document_ids = self.document_controller.resolve_filters(filters)
+        with metrics.span("query_total"):
+            with metrics.span("session_save"):
+                session_id = self._open_turn(session_id, query_text)
+            response = self.query_controller.process_query(query_text, session_id, document_ids)
+            with metrics.span("session_save"):
+                self._save_reply(session_id, response)
+        response["session_id"] = session_id
+        return response
+
+    def stream_query(self, query_text: str, session_id: str = None,
+                     filters: Optional[Dict[str, List[str]]] = None) -> Iterator[Tuple[str, Any]]:
+        """Stream query events and persist the completed bot message once the stream ends"""
+        document_ids = self.document_controller.resolve_filters(filters)
+        # Ends when the stream does, so it includes the time the client takes to read it
+        with metrics.span("query_total"):
+            with metrics.span("session_save"):
+                session_id = self._open_turn(session_id, query_text)
+            reply = {"parts": [], "sources": [], "response": None}
+            try:
+                yield "session", {"session_id": session_id}
+                for event, data in self.query_controller.stream_query(query_text, document_ids):
+                    self._track(reply, event, data, session_id)
+                    yield event, data
+            finally:
+                # Runs on normal completion and when the client disconnects mid-stream
+                self._save_reply(session_id, self._streamed_reply(reply))
+
+    async def process_query_async(self, query_text: str, session_id: str = None,
+                                  filters: Optional[Dict[str, List[str]]] = None) -> Dict[str, Any]:
+        document_ids = self.document_controller.resolve_filters(filters)
+        with metrics.span("query_total"):
+            with metrics.span("session_save"):
+                session_id = await asyncio.to_thread(self._open_turn, session_id, query_text)
+            response = await self.query_controller.process_query_async(query_text, session_id, document_ids)
+            with metrics.span("session_save"):
+                await asyncio.to_thread(self._save_reply, session_id, response)
+        response["session_id"] = session_id
+        return response
+
+    async def stream_query_async(self, query_text: str, session_id: str = None,
+                                 filters: Optional[Dict[str, List[str]]] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """Async counterpart of stream_query, persisting the bot message once the stream ends"""
+        document_ids = self.document_controller.resolve_filters(filters)
+        with metrics.span("query_total"):
+            with metrics.span("session_save"):
+                session_id = await asyncio.to_thread(self._open_turn, session_id, query_text)
+            reply = {"parts": [], "sources": [], "response": None}
+            interrupted = False
+            try:
+                yield "session", {"session_id": session_id}
+                async for event, data in self.query_controller.stream_query_async(query_text, document_ids):
+                    self._track(reply, event, data, session_id)
+                    yield event, data
+            except (GeneratorExit, asyncio.CancelledError):
+                interrupted = True
+                raise
+            finally:
+                if interrupted:
+                    # A closed or cancelled stream cannot await in its cleanup
+                    self._save_reply(session_id, self._streamed_reply(reply))
+                else:
+                    await asyncio.to_thread(self._save_reply, session_id, self._streamed_reply(reply))
+
+    def _open_turn(self, session_id: Optional[str], query_text: str) -> str:
+        """Record the user's message, creating the session first if there is none; returns the session id"""
         if not session_id:
-            session_data = self.session_controller.create_session()
-            session_id = session_data["id"]
+            session_id = self.session_controller.create_session()["id"]
         self.session_controller.add_message_to_session(session_id, "user", query_text)
-        response = self.query_controller.process_query(query_text, session_id)
-        self.session_controller.add_message_to_session(
-            session_id,
-            "bot",
-            response.get("content", ""),
-            response.get("sources", [])
+        return session_id
+
+    @staticmethod
+    def _track(reply: Dict[str, Any], event: str, data: Any, session_id: str) -> None:
+        if event == "sources":
+            reply["sources"] = data
+        elif event == "token":
+            reply["parts"].append(data)
+        elif event == "done":
+            reply["response"] = data
+            data["session_id"] = session_id
+
+    @staticmethod
+    def _streamed_reply(reply: Dict[str, Any]) -> Dict[str, Any]:
+        """The final response, or what had arrived when the stream stopped early"""
+        return reply["response"] or {"content": "".join(reply["parts"]), "sources": reply["sources"]}
+
+    def _save_reply(self, session_id: str, response: Dict[str, Any]) -> None:
+        content = response.get("content", "")
+        if content:
+            self.session_controller.add_message_to_session(session_id, "bot", content, response.get("sources", []))
+
+    def process_queries_async(self, query_texts: List[str],
+                              filters: Optional[Dict[str, List[str]]] = None) -> AsyncIterator[Dict[str, Any]]:
+        return self.query_controller.process_queries_async(
+            query_texts, document_ids=self.document_controller.resolve_filters(filters)
         )
-        response["session_id"] = session_id
-        return response
 
-    def process_document(self, file_path: str, filename: str, original_filename: str = None) -> bool:
-        return self.document_controller.upload_document(file_path, filename, original_filename)
+    def process_queries(self, query_texts: List[str], filters: Optional[Dict[str, List[str]]] = None) -> Iterator[Dict[str, Any]]:
+        """Answer a batch of queries without recording them in any chat session"""
+        return self.query_controller.process_queries(query_texts, document_ids=self.document_controller.resolve_filters(filters))
+
+    def process_document(self, file_path: str, filename: str, original_filename: str = None, category: str = None,
+                         replaces: str = None) -> bool:
+        return self.document_controller.upload_document(file_path, filename, original_filename, category=category,
+                                                        replaces=replaces)
+
+    def submit_documents(self, files: list, category: str = None, replaces: str = None) -> Dict[str, Any]:
+        return self.ingestion_controller.submit(files, category, replaces)
+
+    def get_ingestion_job(self, job_id: str) -> Dict[str, Any]:
+        return self.ingestion_controller.get_job(job_id)
 
     def get_documents(self) -> list:
         return self.document_controller.get_documents()
@@ -48,6 +162,22 @@ class SystemController:
             print(f"Error deleting document {document_id}: {e}")
             return False
 
+    def render_metrics(self) -> str:
+        """Stage histograms plus cache counters in Prometheus text format"""
+        gauges = {}
+        for name, stats in self.get_cache_stats().items():
+            for key, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    gauges[f"qa_{name}_{key}"] = value
+        return metrics.render(gauges)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        embedding_cache = self.query_controller.embedding_service.cache
+        return {
+            "answer_cache": dict(self.answer_cache.stats(), enabled=True) if self.answer_cache else {"enabled": False},
+            "embedding_cache": dict(embedding_cache.stats(), enabled=True) if embedding_cache else {"enabled": False}
+        }
+
     def get_session(self, session_id: str) -> Dict[str, Any]:
         return self.session_controller.load_session(session_id)
 
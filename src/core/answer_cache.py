@@ -0,0 +1,188 @@
+import re, copy, json, time, hashlib, threading
+import numpy as np
+from collections import OrderedDict
+from src.core.config import Config
+from typing import Dict, List, Optional, Any, Collection
+
+class AnswerCache:
+    """Two-tier response cache: exact normalized query text, then query-embedding similarity.
+
+    Entries are evicted LRU once either the entry count or the approximate memory
+    budget is exceeded, and expire after ttl seconds. Each entry remembers the
+    documents its sources came from so document changes can invalidate it.
+    Answers to questions scoped to some documents are only reused for the
+    same scope (see scope_key).
+    """
+    def __init__(self, max_entries: int = None, max_bytes: int = None, ttl: float = None,
+                 similarity_threshold: float = None):
+        self.max_entries = max_entries or Config.ANSWER_CACHE_MAX_ENTRIES
+        self.max_bytes = max_bytes or Config.ANSWER_CACHE_MAX_MB * 1024 * 1024
+        self.ttl = Config.ANSWER_CACHE_TTL if ttl is None else ttl
+        self.similarity_threshold = Config.ANSWER_CACHE_SIMILARITY if similarity_threshold is None else similarity_threshold
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.RLock()
+        # Stacked unit vectors for the similarity tier, rebuilt lazily after changes
+        self._matrix = None
+        self._matrix_keys: List[str] = []
+        self._matrix_scopes = None
+        self.counters = {
+            "hits_exact": 0,
+            "hits_semantic": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+            "saved_seconds": 0.0
+        }
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        text = re.sub(r"\s+", " ", text.strip().lower())
+        return text.strip(" ?!.")
+
+    @staticmethod
+    def scope_key(document_ids: Optional[Collection[str]]) -> str:
+        """Stable key for the set of documents a query was restricted to; empty when unrestricted"""
+        if document_ids is None:
+            return ""
+        return hashlib.sha1("\n".join(sorted(document_ids)).encode("utf-8")).hexdigest()
+
+    def _key(self, query_text: str, scope: str) -> str:
+        key = self.normalize(query_text)
+        return f"{key}\x00{scope}" if key and scope else key
+
+    def get_exact(self, query_text: str, scope: str = "") -> Optional[Dict[str, Any]]:
+        key = self._key(query_text, scope)
+        with self.lock:
+            entry = self._live_entry(key)
+            if entry is None:
+                return None
+            return self._hit(key, entry, "exact")
+
+    def get_similar(self, vector, scope: str = "") -> Optional[Dict[str, Any]]:
+        unit = self._unit(vector)
+        if unit is None:
+            return None
+        with self.lock:
+            matrix = self._similarity_matrix()
+            if matrix is None:
+                return None
+            scores = matrix @ unit
+            scores[self._matrix_scopes != scope] = -np.inf
+            keys = self._matrix_keys
+            # Expiry is only noticed on lookup, so an expired best match falls through to the next one
+            candidates = np.flatnonzero(scores >= self.similarity_threshold)
+            for index in candidates[np.argsort(-scores[candidates])]:
+                key = keys[index]
+                entry = self._live_entry(key)
+                if entry is not None:
+                    return self._hit(key, entry, "semantic")
+            return None
+
+    def record_miss(self) -> None:
+        with self.lock:
+            self.counters["misses"] += 1
+
+    def put(self, query_text: str, vector, response: Dict[str, Any], latency: float, scope: str = "") -> None:
+        key = self._key(query_text, scope)
+        unit = self._unit(vector)
+        if not key or unit is None:
+            return
+        document_ids = {source.get("document_id") for source in response.get("sources", []) if source.get("document_id")}
+        entry = {
+            "response": copy.deepcopy(response),
+            "vector": unit,
+            "scope": scope,
+            "document_ids": document_ids,
+            "created": time.monotonic(),
+            "latency": latency,
+            "size": len(json.dumps(response, default=str)) + unit.nbytes + len(key)
+        }
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = entry
+            self.total_bytes += entry["size"]
+            self._matrix = None
+            while self.entries and (len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes):
+                oldest = next(iter(self.entries))
+                self._remove(oldest)
+                self.counters["evictions"] += 1
+
+    def invalidate_document(self, document_id: str) -> int:
+        """Drop every cached answer that cited the given document"""
+        with self.lock:
+            stale = [key for key, entry in self.entries.items() if document_id in entry["document_ids"]]
+            return self._invalidate(stale)
+
+    def invalidate_unsourced(self) -> int:
+        """Drop cached "no information" answers, which a newly uploaded document may now answer"""
+        with self.lock:
+            stale = [key for key, entry in self.entries.items() if not entry["document_ids"]]
+            return self._invalidate(stale)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+            self._matrix = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            stats = dict(self.counters)
+            hits = stats["hits_exact"] + stats["hits_semantic"]
+            lookups = hits + stats["misses"]
+            stats["hits"] = hits
+            stats["hit_rate"] = hits / lookups if lookups else 0.0
+            stats["avg_saved_ms"] = (stats["saved_seconds"] / hits) * 1000 if hits else 0.0
+            stats["entries"] = len(self.entries)
+            stats["bytes"] = self.total_bytes
+            return stats
+
+    def _hit(self, key: str, entry: Dict[str, Any], tier: str) -> Dict[str, Any]:
+        self.entries.move_to_end(key)
+        self.counters[f"hits_{tier}"] += 1
+        self.counters["saved_seconds"] += entry["latency"]
+        response = copy.deepcopy(entry["response"])
+        response["cache"] = tier
+        return response
+
+    def _live_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if self.ttl and time.monotonic() - entry["created"] > self.ttl:
+            self._remove(key)
+            self.counters["expirations"] += 1
+            return None
+        return entry
+
+    def _invalidate(self, keys: List[str]) -> int:
+        for key in keys:
+            self._remove(key)
+        self.counters["invalidations"] += len(keys)
+        return len(keys)
+
+    def _remove(self, key: str) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry["size"]
+            self._matrix = None
+
+    def _similarity_matrix(self):
+        if self._matrix is None and self.entries:
+            self._matrix_keys = list(self.entries.keys())
+            self._matrix = np.vstack([self.entries[key]["vector"] for key in self._matrix_keys])
+            self._matrix_scopes = np.array([self.entries[key]["scope"] for key in self._matrix_keys])
+        return self._matrix
+
+    @staticmethod
+    def _unit(vector):
+        if vector is None:
+            return None
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        if norm == 0:
+            return None
+        return array / norm
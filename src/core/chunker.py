@@ -0,0 +1,179 @@
+import re
+from itertools import chain, islice
+from collections import Counter, deque
+from src.core.config import Config
+from src.model.models import TextChunk
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Set, Tuple
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_END = re.compile(r"(?<=[.!?])[\"')\]]*\s+(?=[\"'(\[]?[A-Z0-9])")
+DIGITS = re.compile(r"\d+")
+
+def estimate_tokens(text: str) -> int:
+    """Approximate model tokens as words plus punctuation marks"""
+    return len(TOKEN_PATTERN.findall(text))
+
+class Chunker:
+    """Interface for splitting extracted pages into chunks"""
+    def chunk_pages(self, pages: List[Dict[str, Any]], document_id: str) -> List[TextChunk]:
+        raise NotImplementedError("Subclass must implement abstract method")
+
+    def iter_chunks(self, pages: Iterable[Dict[str, Any]], document_id: str) -> Iterator[TextChunk]:
+        """Chunks as pages arrive; implementations that need every page up front fall back to chunk_pages"""
+        yield from self.chunk_pages(list(pages), document_id)
+
+class SlidingWindowChunker(Chunker):
+    """Fixed-size character windows with CHUNK_OVERLAP characters of overlap"""
+    def __init__(self, chunk_size: int = None, chunk_overlap: int = None):
+        self.chunk_size = chunk_size or Config.CHUNK_SIZE
+        self.chunk_overlap = Config.CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+
+    def chunk_pages(self, pages: List[Dict[str, Any]], document_id: str) -> List[TextChunk]:
+        return list(self.iter_chunks(pages, document_id))
+
+    def iter_chunks(self, pages: Iterable[Dict[str, Any]], document_id: str) -> Iterator[TextChunk]:
+        """Windows over the pages joined by newlines, keeping only the unfinished window's text"""
+        step = self.chunk_size - self.chunk_overlap
+        buffer, buffer_start, window_start, end, position = "", 0, 0, 0, 0
+        page_starts = deque()  # (offset, page number) of pages that may still hold a window start
+
+        def window() -> TextChunk:
+            while len(page_starts) > 1 and page_starts[1][0] <= window_start:
+                page_starts.popleft()
+            text = buffer[window_start - buffer_start:window_start - buffer_start + self.chunk_size]
+            return TextChunk(text, document_id, position, page=page_starts[0][1])
+
+        for page in pages:
+            page_starts.append((end, page.get("page")))
+            buffer += page["text"] + "\n"
+            end += len(page["text"]) + 1
+            while window_start + self.chunk_size <= end:
+                yield window()
+                position += 1
+                window_start += step
+            buffer, buffer_start = buffer[window_start - buffer_start:], window_start
+        while window_start < end:
+            yield window()
+            position += 1
+            window_start += step
+
+class StructuredChunker(Chunker):
+    """Packs whole paragraphs and sentences into chunks under a token budget.
+
+    Header and footer lines repeated across pages are removed before chunking,
+    and only the trailing sentences of a chunk are repeated in the next one.
+    """
+    def __init__(self, token_budget: int = None, overlap_sentences: int = None,
+                 boilerplate_min_pages: int = None, boilerplate_ratio: float = None):
+        self.token_budget = token_budget or Config.CHUNK_TOKEN_BUDGET
+        self.overlap_sentences = Config.CHUNK_OVERLAP_SENTENCES if overlap_sentences is None else overlap_sentences
+        self.boilerplate_min_pages = boilerplate_min_pages or Config.BOILERPLATE_MIN_PAGES
+        self.boilerplate_ratio = boilerplate_ratio or Config.BOILERPLATE_PAGE_RATIO
+        self.boilerplate_sample_pages = Config.BOILERPLATE_SAMPLE_PAGES
+
+    @staticmethod
+    def _line_key(line: str) -> str:
+        # Page numbers and dates differ per page, so compare lines with digits masked
+        return DIGITS.sub("#", line.strip().lower())
+
+    def find_boilerplate(self, pages: List[Dict[str, Any]], edge_lines: int = 3) -> Set[str]:
+        """Line keys appearing at the top or bottom of at least boilerplate_ratio of the pages"""
+        if len(pages) < self.boilerplate_min_pages:
+            return set()
+        counts = Counter()
+        for page in pages:
+            lines = [line for line in page["text"].splitlines() if line.strip()]
+            counts.update({self._line_key(line) for line in lines[:edge_lines] + lines[-edge_lines:]})
+        threshold = max(2, int(len(pages) * self.boilerplate_ratio))
+        return {key for key, count in counts.items() if count >= threshold and key}
+
+    def strip_boilerplate(self, text: str, boilerplate: Set[str]) -> str:
+        if not boilerplate:
+            return text
+        return "\n".join(line for line in text.splitlines() if self._line_key(line) not in boilerplate)
+
+    @staticmethod
+    def split_sentences(paragraph: str) -> List[str]:
+        text = re.sub(r"-\n(?=[a-z])", "", paragraph)
+        text = re.sub(r"\s*\n\s*", " ", text).strip()
+        if not text:
+            return []
+        return [sentence for sentence in SENTENCE_END.split(text) if sentence]
+
+    def split_oversized(self, sentence: str, tokens: int) -> List[Tuple[str, int]]:
+        """Break a sentence longer than the budget on word boundaries"""
+        words = sentence.split()
+        pieces, current, current_tokens = [], [], 0
+        for word in words:
+            word_tokens = estimate_tokens(word)
+            if current and current_tokens + word_tokens > self.token_budget:
+                pieces.append((" ".join(current), current_tokens))
+                current, current_tokens = [], 0
+            current.append(word)
+            current_tokens += word_tokens
+        if current:
+            pieces.append((" ".join(current), current_tokens))
+        return pieces
+
+    def units(self, pages: Iterable[Dict[str, Any]], boilerplate: Optional[Set[str]] = None):
+        """Yield (sentence, tokens, page, starts_paragraph) across all pages"""
+        if boilerplate is None:
+            boilerplate = self.find_boilerplate(pages)
+        for page in pages:
+            text = self.strip_boilerplate(page["text"], boilerplate)
+            for paragraph in PARAGRAPH_BREAK.split(text):
+                first = True
+                for sentence in self.split_sentences(paragraph):
+                    tokens = estimate_tokens(sentence)
+                    pieces = [(sentence, tokens)] if tokens <= self.token_budget else self.split_oversized(sentence, tokens)
+                    for piece, piece_tokens in pieces:
+                        yield piece, piece_tokens, page.get("page"), first
+                        first = False
+
+    def chunk_pages(self, pages: List[Dict[str, Any]], document_id: str) -> List[TextChunk]:
+        return list(self.pack(self.units(pages), document_id))
+
+    def iter_chunks(self, pages: Iterable[Dict[str, Any]], document_id: str) -> Iterator[TextChunk]:
+        """Streaming chunk_pages; headers and footers are learned from the first BOILERPLATE_SAMPLE_PAGES pages"""
+        pages = iter(pages)
+        sample = list(islice(pages, self.boilerplate_sample_pages))
+        yield from self.pack(self.units(chain(sample, pages), self.find_boilerplate(sample)), document_id)
+
+    def pack(self, units: Iterable[Tuple[str, int, Optional[int], bool]], document_id: str) -> Iterator[TextChunk]:
+        """Group units into chunks under the token budget, yielding each chunk as soon as it closes"""
+        chunks: List[TextChunk] = []  # closed by the last flush, not yet handed out
+        position = 0
+        current: List[Tuple[str, int, Optional[int], bool]] = []
+        current_tokens = 0
+        carried = 0  # leading sentences repeated from the previous chunk
+
+        def flush():
+            nonlocal current, current_tokens, carried, position
+            if len(current) <= carried:
+                # Only overlap left; drop it rather than let the next chunk exceed the budget
+                current, current_tokens, carried = [], 0, 0
+                return
+            text = " ".join(unit[0] for unit in current)
+            page = current[carried][2]
+            chunks.append(TextChunk(text, document_id, position, page=page))
+            position += 1
+            tail = current[-self.overlap_sentences:] if self.overlap_sentences else []
+            tail_tokens = sum(unit[1] for unit in tail)
+            if tail_tokens > self.token_budget // 4:
+                tail, tail_tokens = [], 0
+            current, current_tokens, carried = list(tail), tail_tokens, len(tail)
+
+        for unit in units:
+            sentence, tokens, page, starts_paragraph = unit
+            over_budget = current_tokens + tokens > self.token_budget
+            # Prefer to close a reasonably full chunk at a paragraph boundary
+            paragraph_break = starts_paragraph and current_tokens >= self.token_budget * 0.75
+            if over_budget or paragraph_break:
+                flush()
+                yield from chunks
+                chunks.clear()
+            current.append(unit)
+            current_tokens += tokens
+        flush()
+        yield from chunks
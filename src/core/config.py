@@ -9,6 +9,8 @@ class Config:
     HOST = os.getenv('HOST', '0.0.0.0')
     PORT = int(os.getenv('PORT', 5000))
     FLASK_SECRET_KEY = os.getenv('FLASK_SECRET_KEY', '')
+    VERBOSE_LOGGING = os.getenv('VERBOSE_LOGGING', 'False').lower() == 'true'  # per-query prints from retrieval and generation
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'  # stage timings served at /metrics
 
     UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'static/assets/uploads')
     ALLOWED_EXTENSIONS = {'pdf'}
@@ -16,9 +18,46 @@ class Config:
 
     VECTORDB_PATH = os.getenv('VECTORDB_PATH', os.path.join(os.getcwd(), 'src', 'vectordb'))
     CHROMA_PERSIST_DIRECTORY = os.getenv('CHROMA_PERSIST_DIRECTORY', '/src/vectordb/')
+    VECTORDB_BATCH_SIZE = int(os.getenv('VECTORDB_BATCH_SIZE', 1000))
+    VECTORDB_BACKEND = os.getenv('VECTORDB_BACKEND', 'chroma').lower()  # 'chroma' or 'numpy'
+    VECTORDB_SHARDS = int(os.getenv('VECTORDB_SHARDS', 1))  # stores documents are partitioned across; changing it rebalances on start
+    VECTORDB_SHARD_PROCESSES = os.getenv('VECTORDB_SHARD_PROCESSES', 'False').lower() == 'true'  # open each shard in its own worker process
+    NUMPY_INDEX_PATH = os.getenv('NUMPY_INDEX_PATH', os.path.join(VECTORDB_PATH, 'numpy_index'))
+    NUMPY_COMPACT_RATIO = float(os.getenv('NUMPY_COMPACT_RATIO', 0.25))  # share of tombstoned rows that triggers compaction
+    ANN_ENABLED = os.getenv('ANN_ENABLED', 'True').lower() == 'true'
+    ANN_MIN_VECTORS = int(os.getenv('ANN_MIN_VECTORS', 50000))  # below this the numpy backend searches exactly
+    ANN_NLIST = int(os.getenv('ANN_NLIST', 0))  # IVF buckets, 0 picks 4 * sqrt(vectors)
+    ANN_NPROBE = int(os.getenv('ANN_NPROBE', 32))  # buckets scanned per query; higher is slower and more accurate
+    ANN_RETRAIN_GROWTH = float(os.getenv('ANN_RETRAIN_GROWTH', 2.0))  # retrain once the corpus grows by this factor
+    CHROMA_SEARCH_EF = int(os.getenv('CHROMA_SEARCH_EF', 100))  # HNSW candidate list size for new Chroma collections
 
-    CHUNK_SIZE = int(os.getenv('CHUNK_SIZE', 1000))
-    CHUNK_OVERLAP = int(os.getenv('CHUNK_OVERLAP', 200))
+    HYBRID_SEARCH = os.getenv('HYBRID_SEARCH', 'True').lower() == 'true'  # fuse BM25 hits with vector hits
+    HYBRID_CANDIDATES = int(os.getenv('HYBRID_CANDIDATES', 20))  # hits taken from each retriever before fusion
+    RRF_K = int(os.getenv('RRF_K', 60))  # reciprocal-rank fusion damping constant
+    BM25_INDEX_PATH = os.getenv('BM25_INDEX_PATH', os.path.join(VECTORDB_PATH, 'bm25_index'))
+    BM25_K1 = float(os.getenv('BM25_K1', 1.2))
+    BM25_B = float(os.getenv('BM25_B', 0.75))
+    BM25_MAX_DF_RATIO = float(os.getenv('BM25_MAX_DF_RATIO', 0.3))  # query terms in more chunks than this share are skipped
+    BM25_COMPACT_RATIO = float(os.getenv('BM25_COMPACT_RATIO', 0.25))  # share of deleted chunks that triggers compaction
+    BM25_MAX_SEGMENTS = int(os.getenv('BM25_MAX_SEGMENTS', 256))  # segment files kept before they are merged
+
+    INGESTION_WORKERS = int(os.getenv('INGESTION_WORKERS', 2))
+    INGESTION_JOB_TTL = int(os.getenv('INGESTION_JOB_TTL', 3600))  # seconds a finished job stays queryable
+
+    PDF_EXTRACT_WORKERS = int(os.getenv('PDF_EXTRACT_WORKERS', os.cpu_count() or 1))
+    PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', 32))  # smaller PDFs are extracted inline
+    INGEST_BATCH_CHUNKS = int(os.getenv('INGEST_BATCH_CHUNKS', 256))  # chunks embedded and stored together while a document streams in
+    INGEST_MEMORY_LIMIT_MB = int(os.getenv('INGEST_MEMORY_LIMIT_MB', 128))  # per document: chunk batches extracted ahead of embedding and storage
+    INGEST_REUSE_ENTRIES = int(os.getenv('INGEST_REUSE_ENTRIES', 4096))  # recent vectors kept per document to reuse for repeated chunk text
+
+    CHUNKER = os.getenv('CHUNKER', 'structured').lower()  # 'structured' or 'sliding'
+    CHUNK_SIZE = int(os.getenv('CHUNK_SIZE', 1000))  # sliding chunker, characters
+    CHUNK_OVERLAP = int(os.getenv('CHUNK_OVERLAP', 200))  # sliding chunker, characters
+    CHUNK_TOKEN_BUDGET = int(os.getenv('CHUNK_TOKEN_BUDGET', 256))
+    CHUNK_OVERLAP_SENTENCES = int(os.getenv('CHUNK_OVERLAP_SENTENCES', 1))
+    BOILERPLATE_MIN_PAGES = int(os.getenv('BOILERPLATE_MIN_PAGES', 3))
+    BOILERPLATE_PAGE_RATIO = float(os.getenv('BOILERPLATE_PAGE_RATIO', 0.6))  # share of pages a header/footer line must repeat on
+    BOILERPLATE_SAMPLE_PAGES = int(os.getenv('BOILERPLATE_SAMPLE_PAGES', 64))  # leading pages headers/footers are learned from when streaming
 
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
     GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash-preview-05-20')
@@ -26,8 +65,37 @@ class Config:
     TOP_K = int(os.getenv('TOP_K', 5))
 
     EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'models/embedding-001')
+    EMBEDDING_DIMENSION = int(os.getenv('EMBEDDING_DIMENSION', 768))
+    EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', 100))
+    EMBEDDING_MAX_CONCURRENCY = int(os.getenv('EMBEDDING_MAX_CONCURRENCY', 4))
+    EMBEDDING_MAX_RETRIES = int(os.getenv('EMBEDDING_MAX_RETRIES', 3))
+    EMBEDDING_RETRY_BACKOFF = float(os.getenv('EMBEDDING_RETRY_BACKOFF', 0.5))  # seconds, doubled per retry
+    EMBEDDING_CACHE_ENABLED = os.getenv('EMBEDDING_CACHE_ENABLED', 'True').lower() == 'true'
+    EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', 10000))
+    EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', os.path.join(VECTORDB_PATH, 'embedding_cache.db'))  # empty for memory only
 
     MAX_RELEVANT_CHUNKS = int(os.getenv('MAX_RELEVANT_CHUNKS', 5))
+    CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', 2000))  # retrieved text allowed into one prompt
+    CONTEXT_DUPLICATE_THRESHOLD = float(os.getenv('CONTEXT_DUPLICATE_THRESHOLD', 0.8))  # word-shingle overlap that marks a repeat
+    RERANK_ENABLED = os.getenv('RERANK_ENABLED', 'False').lower() == 'true'
+    RERANK_MODEL = os.getenv('RERANK_MODEL', '')  # sentence-transformers cross-encoder; empty uses the feature scorer
+    RERANK_CANDIDATES = int(os.getenv('RERANK_CANDIDATES', 20))  # chunks retrieved for the reranker to choose from
+    RERANK_TOP_K = int(os.getenv('RERANK_TOP_K', 4))  # chunks passed on to the LLM after reranking
+    RERANK_BUDGET_MS = float(os.getenv('RERANK_BUDGET_MS', 150))  # model reranking slower than this falls back to the feature scorer
+    BATCH_QUERY_MAX = int(os.getenv('BATCH_QUERY_MAX', 500))  # questions accepted per /api/query/batch call
+    BATCH_QUERY_CONCURRENCY = int(os.getenv('BATCH_QUERY_CONCURRENCY', 8))  # answers generated in parallel
+
+    ANSWER_CACHE_ENABLED = os.getenv('ANSWER_CACHE_ENABLED', 'True').lower() == 'true'
+    ANSWER_CACHE_MAX_ENTRIES = int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', 1000))
+    ANSWER_CACHE_MAX_MB = int(os.getenv('ANSWER_CACHE_MAX_MB', 64))
+    ANSWER_CACHE_TTL = int(os.getenv('ANSWER_CACHE_TTL', 3600))  # seconds, 0 disables expiry
+    ANSWER_CACHE_SIMILARITY = float(os.getenv('ANSWER_CACHE_SIMILARITY', 0.95))  # cosine threshold for the semantic tier
+
+    SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'sqlite').lower()  # 'sqlite' or 'json'
+    SESSIONS_DIR = os.getenv('SESSIONS_DIR', 'static/json')
+    SESSION_DB_PATH = os.getenv('SESSION_DB_PATH', os.path.join('src', 'sqldb', 'sqldb', 'sessions.db'))
+    SQLITE_POOL_SIZE = int(os.getenv('SQLITE_POOL_SIZE', 8))  # connections per SQLite database
 
     ADMIN_SERIAL_KEY = os.getenv('ADMIN_SERIAL_KEY', 'YOUR-SERIAL-KEY-HERE')
     JWT_SECRET = os.getenv('JWT_SECRET', '')
+    ADMIN_AUTH_CACHE_TTL = int(os.getenv('ADMIN_AUTH_CACHE_TTL', 300))  # seconds a verified login skips the password hash, 0 disables
@@ -0,0 +1,89 @@
+import threading
+from typing import Any, Callable, Dict
+from src.core.config import Config
+
+class ServiceContainer:
+    """Process-wide owner of the shared services, each built lazily on first use.
+
+    Every controller receives its vector store, embedding service and LLM client
+    from here, so the process holds one Chroma client and one document registry.
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._instances: Dict[str, Any] = {}
+
+    def _get(self, name: str, factory: Callable[[], Any]) -> Any:
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(name)
+                if instance is None:
+                    instance = factory()
+                    self._instances[name] = instance
+        return instance
+
+    @property
+    def vector_database(self):
+        def build():
+            from src.vectordb.sharded_vector_database import ShardedVectorDatabase
+            # A store that was sharded stays sharded until it has been rebalanced back onto one shard
+            if Config.VECTORDB_SHARDS > 1 or ShardedVectorDatabase.stored_shards() > 1:
+                return ShardedVectorDatabase.from_config()
+            if Config.VECTORDB_BACKEND == "numpy":
+                from src.vectordb.numpy_vector_database import NumpyVectorDatabase
+                return NumpyVectorDatabase()
+            from src.vectordb.vector_database import ChromaDBVectorDatabase
+            return ChromaDBVectorDatabase()
+        return self._get("vector_database", build)
+
+    @property
+    def lexical_index(self):
+        if not Config.HYBRID_SEARCH:
+            return None
+        from src.vectordb.bm25_index import BM25Index
+        return self._get("lexical_index", BM25Index)
+
+    @property
+    def reranker(self):
+        if not Config.RERANK_ENABLED:
+            return None
+        from src.core.reranker import build_rerank_stage
+        return self._get("reranker", build_rerank_stage)
+
+    @property
+    def embedding_service(self):
+        from src.llm.embedding_service import GeminiEmbeddingService
+        return self._get("embedding_service", GeminiEmbeddingService)
+
+    @property
+    def llm_service(self):
+        from src.llm.llm_service import GeminiLLMService
+        return self._get("llm_service", GeminiLLMService)
+
+    @property
+    def answer_cache(self):
+        if not Config.ANSWER_CACHE_ENABLED:
+            return None
+        from src.core.answer_cache import AnswerCache
+        return self._get("answer_cache", AnswerCache)
+
+    @property
+    def admin_auth(self):
+        from src.sqldb.admin_auth import AdminAuthManager
+        return self._get("admin_auth", AdminAuthManager)
+
+    @property
+    def system_controller(self):
+        from src.controller.system_controller import SystemController
+        return self._get("system_controller", lambda: SystemController(self))
+
+_container = None
+_container_lock = threading.Lock()
+
+def get_container() -> ServiceContainer:
+    global _container
+    if _container is None:
+        with _container_lock:
+            if _container is None:
+                _container = ServiceContainer()
+    return _container
@@ -0,0 +1,104 @@
+import re
+from src.core.config import Config
+from src.model.models import TextChunk
+from src.core.chunker import estimate_tokens
+from typing import List, Set, Tuple
+
+WORD_PATTERN = re.compile(r"\w+")
+
+class ContextBudgeter:
+    """Turns ranked retrieval hits into the context block of a prompt.
+
+    Chunks that repeat an earlier, better-ranked chunk are dropped; chunks
+    that are neighbours in the same document are merged with their shared
+    overlap written once; the resulting passages are kept in rank order until
+    the token budget is spent.
+    """
+    def __init__(self, token_budget: int = None, duplicate_threshold: float = None):
+        self.token_budget = token_budget or Config.CONTEXT_TOKEN_BUDGET
+        self.duplicate_threshold = duplicate_threshold or Config.CONTEXT_DUPLICATE_THRESHOLD
+
+    @staticmethod
+    def _shingles(text: str, size: int = 3) -> Set[Tuple[str, ...]]:
+        words = WORD_PATTERN.findall(text.lower())
+        if len(words) < size:
+            return {tuple(words)}
+        return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+    def drop_duplicates(self, chunks: List[TextChunk]) -> List[TextChunk]:
+        """Keep each chunk unless it is a near copy (word-shingle Jaccard) of one ranked above it"""
+        kept, kept_shingles = [], []
+        for chunk in chunks:
+            shingles = self._shingles(chunk.get_text())
+            if any(len(shingles & other) >= self.duplicate_threshold * len(shingles | other) for other in kept_shingles):
+                continue
+            kept.append(chunk)
+            kept_shingles.append(shingles)
+        return kept
+
+    @staticmethod
+    def _overlap(first: str, second: str) -> int:
+        """Length of the longest suffix of first that is also a prefix of second"""
+        probe = second[:32]
+        if not probe:
+            return 0
+        start = first.find(probe, max(0, len(first) - len(second)))
+        while start != -1:
+            if second.startswith(first[start:]):
+                return len(first) - start
+            start = first.find(probe, start + 1)
+        return 0
+
+    def merge_adjacent(self, chunks: List[TextChunk]) -> List[Tuple[TextChunk, List[TextChunk]]]:
+        """Group consecutive positions of the same document into one passage each.
+
+        Returns (passage, sources) pairs ordered by the best rank among each
+        passage's sources; a passage keeps the id of its best-ranked chunk.
+        """
+        rank = {id(chunk): i for i, chunk in enumerate(chunks)}
+        runs: List[List[TextChunk]] = []
+        for chunk in sorted(chunks, key=lambda c: (c.get_document_id(), c.position)):
+            previous = runs[-1][-1] if runs else None
+            if previous is not None and previous.get_document_id() == chunk.get_document_id() \
+                    and chunk.position - previous.position == 1:
+                runs[-1].append(chunk)
+            else:
+                runs.append([chunk])
+        passages = []
+        for run in runs:
+            text = run[0].get_text()
+            for chunk in run[1:]:
+                overlap = self._overlap(text, chunk.get_text())
+                text += chunk.get_text()[overlap:] if overlap else " " + chunk.get_text()
+            best = min(run, key=lambda c: rank[id(c)])
+            passage = TextChunk(text, run[0].get_document_id(), run[0].position, page=run[0].page)
+            passage.id = best.get_id()
+            passages.append((rank[id(best)], passage, run))
+        passages.sort(key=lambda item: item[0])
+        return [(passage, run) for _, passage, run in passages]
+
+    def _truncate(self, text: str, budget: int) -> str:
+        words, kept, tokens = text.split(), [], 0
+        for word in words:
+            tokens += estimate_tokens(word)
+            if tokens > budget:
+                break
+            kept.append(word)
+        return " ".join(kept)
+
+    def assemble(self, chunks: List[TextChunk]) -> Tuple[List[TextChunk], List[TextChunk]]:
+        """Return (passages for the prompt, the retrieved chunks they were built from)"""
+        passages, used, remaining = [], [], self.token_budget
+        for passage, sources in self.merge_adjacent(self.drop_duplicates(chunks)):
+            tokens = estimate_tokens(passage.get_text())
+            if tokens > remaining:
+                if passages:
+                    # A smaller passage further down may still fit
+                    continue
+                # The best passage alone is over budget; keep its opening instead of nothing
+                passage.text = self._truncate(passage.get_text(), remaining)
+                tokens = remaining
+            passages.append(passage)
+            used.extend(sources)
+            remaining -= tokens
+        return passages, used
@@ -1,52 +1,167 @@
-import PyPDF2
+import os, PyPDF2, threading
+import multiprocessing
 from io import BytesIO
-from typing import List
+from collections import deque
 from src.core.config import Config
+from src.core.chunker import Chunker, SlidingWindowChunker, StructuredChunker
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from src.model.models import Document, TextChunk
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Callable
+
+def _extract_page_range(source, start: int, end: int) -> List[str]:
+    """Worker: extract pages [start, end) from a PDF path or raw bytes"""
+    stream = open(source, 'rb') if isinstance(source, str) else BytesIO(source)
+    try:
+        pdf_reader = PyPDF2.PdfReader(stream)
+        return [(pdf_reader.pages[i].extract_text() or "") for i in range(start, end)]
+    finally:
+        stream.close()
 
 class DocumentProcessor:
     """Interface for document processing"""
-    def extract_text(self, document: Document) -> str:
+    def extract_text(self, document: Document, progress: Optional[Callable[[str, int], None]] = None) -> str:
         """Extract text from a document"""
         raise NotImplementedError("Subclass must implement abstract method")
 
+    def extract_pages(self, document: Document, progress: Optional[Callable[[str, int], None]] = None) -> List[Dict[str, Any]]:
+        """Extract text per page as [{"page": 1-based number, "text": str}]"""
+        raise NotImplementedError("Subclass must implement abstract method")
+
     def chunk_text(self, text: str, document_id: str) -> List[TextChunk]:
         """Split text into chunks"""
         raise NotImplementedError("Subclass must implement abstract method")
 
+    def chunk_pages(self, pages: List[Dict[str, Any]], document_id: str) -> List[TextChunk]:
+        """Split extracted pages into chunks that record their page number"""
+        raise NotImplementedError("Subclass must implement abstract method")
+
+    def iter_pages(self, document: Document, progress: Optional[Callable[[str, int], None]] = None) -> Iterator[Dict[str, Any]]:
+        """extract_pages one page at a time"""
+        yield from self.extract_pages(document, progress)
+
+    def iter_chunks(self, pages: Iterable[Dict[str, Any]], document_id: str) -> Iterator[TextChunk]:
+        """chunk_pages one chunk at a time"""
+        yield from self.chunk_pages(list(pages), document_id)
+
 class PDFDocumentProcessor(DocumentProcessor):
     """PDF document processor implementation"""
-    def extract_text(self, document: Document) -> str:
+    _pool = None
+    _pool_lock = threading.Lock()
+
+    def __init__(self, chunker: Optional[Chunker] = None):
+        if chunker is None:
+            chunker = SlidingWindowChunker() if Config.CHUNKER == "sliding" else StructuredChunker()
+        self.chunker = chunker
+
+    @classmethod
+    def get_pool(cls) -> ProcessPoolExecutor:
+        # Spawned (not forked) workers, since the web server process is multi-threaded
+        with cls._pool_lock:
+            if cls._pool is None:
+                cls._pool = ProcessPoolExecutor(
+                    max_workers=Config.PDF_EXTRACT_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return cls._pool
+
+    @classmethod
+    def shutdown_pool(cls) -> None:
+        with cls._pool_lock:
+            if cls._pool is not None:
+                cls._pool.shutdown(wait=False, cancel_futures=True)
+                cls._pool = None
+
+    def extract_text(self, document: Document, progress: Optional[Callable[[str, int], None]] = None) -> str:
         """Extract text from a PDF document"""
-        content = document.get_content()
-        text = ""
+        return "".join(page["text"] + "\n" for page in self.extract_pages(document, progress))
+
+    def extract_pages(self, document: Document, progress: Optional[Callable[[str, int], None]] = None) -> List[Dict[str, Any]]:
+        """Extract text page by page, splitting large PDFs across a process pool"""
         try:
-            # Create a PDF file reader
-            pdf_reader = PyPDF2.PdfReader(BytesIO(content))
+            return list(self.iter_pages(document, progress))
+        except Exception as e:
+            print(f"Error extracting text from PDF: {e}")
+            return []
 
-            # Extract text from each page
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                text += page.extract_text() + "\n"
+    @staticmethod
+    def _stream(content):
+        # A memory-mapped or open file is parsed in place; only raw bytes need wrapping
+        return content if hasattr(content, "read") else BytesIO(content)
 
-            return text
+    def iter_pages(self, document: Document, progress: Optional[Callable[[str, int], None]] = None) -> Iterator[Dict[str, Any]]:
+        """Yield {"page", "text"} in page order while later pages are still being extracted.
+
+        A PDF that cannot be opened yields nothing; a failure part way
+        through raises, since the pages already yielded are incomplete.
+        """
+        try:
+            pdf_reader = PyPDF2.PdfReader(self._stream(document.get_content()))
+            page_count = len(pdf_reader.pages)
         except Exception as e:
             print(f"Error extracting text from PDF: {e}")
-            return ""
+            return
+        if progress:
+            progress("pages_total", page_count)
 
-    def chunk_text(self, text: str, document_id: str) -> List[TextChunk]:
-        """Split text into chunks with overlap"""
-        chunk_size = Config.CHUNK_SIZE
-        chunk_overlap = Config.CHUNK_OVERLAP
+        done = 0
+        if Config.PDF_EXTRACT_WORKERS > 1 and page_count >= Config.PDF_PARALLEL_MIN_PAGES:
+            try:
+                for text in self._iter_parallel(document, page_count, progress):
+                    done += 1
+                    yield {"page": done, "text": text}
+            except BrokenProcessPool as e:
+                print(f"PDF extraction pool failed, extracting from page {done + 1} serially: {e}")
+                self.shutdown_pool()
+        for i in range(done, page_count):
+            text = pdf_reader.pages[i].extract_text() or ""
+            if progress:
+                progress("pages_extracted", 1)
+            yield {"page": i + 1, "text": text}
 
+    def _iter_parallel(self, document: Document, page_count: int,
+                       progress: Optional[Callable[[str, int], None]] = None) -> Iterator[str]:
+        # Workers reopen the uploaded file by path when possible, so the PDF bytes are not pickled per task
+        source_path = document.get_metadata().get("source")
+        source = source_path if source_path and os.path.exists(source_path) else bytes(document.get_content())
+        # A few ranges per worker keeps the pool busy when some pages are much heavier than others
+        range_size = max(1, -(-page_count // (Config.PDF_EXTRACT_WORKERS * 4)))
+        if not isinstance(source, str):
+            range_size = max(range_size, -(-page_count // Config.PDF_EXTRACT_WORKERS))
+        pool = self.get_pool()
+        starts = iter(range(0, page_count, range_size))
+        # Ranges are handed out in order and only two per worker are in flight, so finished
+        # ranges waiting on a slow earlier one stay bounded
+        in_flight = deque()
+
+        def submit() -> None:
+            start = next(starts, None)
+            if start is not None:
+                in_flight.append(pool.submit(_extract_page_range, source, start, min(start + range_size, page_count)))
+
+        for _ in range(Config.PDF_EXTRACT_WORKERS * 2):
+            submit()
+        try:
+            while in_flight:
+                page_texts = in_flight.popleft().result()
+                submit()
+                if progress:
+                    progress("pages_extracted", len(page_texts))
+                yield from page_texts
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    def chunk_text(self, text: str, document_id: str) -> List[TextChunk]:
+        """Split text into chunks"""
         if not text:
             return []
+        return self.chunker.chunk_pages([{"page": None, "text": text}], document_id)
 
-        chunks = []
-        for i in range(0, len(text), chunk_size - chunk_overlap):
-            chunk_text = text[i:i + chunk_size]
-            if chunk_text:  # Only add non-empty chunks
-                position = len(chunks)
-                chunks.append(TextChunk(chunk_text, document_id, position))
+    def chunk_pages(self, pages: List[Dict[str, Any]], document_id: str) -> List[TextChunk]:
+        """Split extracted pages into chunks tagged with the page each one starts on"""
+        return self.chunker.chunk_pages(pages, document_id)
 
-        return chunks
+    def iter_chunks(self, pages: Iterable[Dict[str, Any]], document_id: str) -> Iterator[TextChunk]:
+        """Chunks as the pages stream in"""
+        return self.chunker.iter_chunks(pages, document_id)
@@ -0,0 +1,106 @@
+import time, bisect, threading
+from contextlib import contextmanager
+from src.core.config import Config
+from typing import Dict, Iterator, List, Tuple
+
+# Seconds; spans the range from a warm embedding-cache hit to a slow generation
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus layout"""
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        slot = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[slot] += 1
+            self.sum += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self.lock:
+            return list(self.counts), self.sum
+
+class Metrics:
+    """Per-stage timing spans for the query pipeline, aggregated into histograms.
+
+    A span costs two perf_counter calls and one locked increment, so it is
+    cheap enough to leave on in production; METRICS_ENABLED turns it off.
+    Stages may nest (generate contains prompt), so they are not additive.
+    """
+    def __init__(self, enabled: bool = None):
+        self.enabled = Config.METRICS_ENABLED if enabled is None else enabled
+        self.stages: Dict[str, Histogram] = {}
+        self.counters: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            with self.lock:
+                histogram = self.stages.setdefault(stage, Histogram())
+        histogram.observe(seconds)
+
+    def increment(self, name: str, value: float = 1) -> None:
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Count and mean per stage, for logs and ad-hoc inspection"""
+        result = {}
+        for stage, histogram in sorted(self.stages.items()):
+            counts, total = histogram.snapshot()
+            count = sum(counts)
+            result[stage] = {"count": count, "mean_seconds": total / count if count else 0.0}
+        return result
+
+    def render(self, gauges: Dict[str, float] = None) -> str:
+        """Prometheus text exposition of every stage histogram and counter plus optional gauges"""
+        lines = [
+            "# HELP qa_stage_duration_seconds Time spent in each stage of the query pipeline",
+            "# TYPE qa_stage_duration_seconds histogram"
+        ]
+        for stage, histogram in sorted(self.stages.items()):
+            counts, total = histogram.snapshot()
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, counts):
+                cumulative += count
+                lines.append(f'qa_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'qa_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {cumulative}')
+            lines.append(f'qa_stage_duration_seconds_sum{{stage="{stage}"}} {total}')
+            lines.append(f'qa_stage_duration_seconds_count{{stage="{stage}"}} {cumulative}')
+        with self.lock:
+            counters = sorted(self.counters.items())
+        for name, value in counters:
+            lines.append(f"# TYPE qa_{name}_total counter")
+            lines.append(f"qa_{name}_total {float(value)}")
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self.lock:
+            self.stages = {}
+            self.counters = {}
+
+metrics = Metrics()
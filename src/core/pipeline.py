@@ -0,0 +1,93 @@
+import queue, threading
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+
+def batched(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Consecutive lists of up to size items"""
+    items = iter(items)
+    while True:
+        batch = list(islice(items, max(1, size)))
+        if not batch:
+            return
+        yield batch
+
+class MemoryBudget:
+    """Byte-counting semaphore: acquire blocks while the bytes in use would pass the limit.
+
+    A single item larger than the whole limit is still let through when
+    nothing else is held, so an oversized batch slows the pipeline down
+    instead of deadlocking it.
+    """
+    def __init__(self, limit_bytes: int):
+        self.limit = max(1, limit_bytes)
+        self.used = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def acquire(self, amount: int) -> bool:
+        """Wait for room; False if the budget was closed while waiting"""
+        with self.condition:
+            while not self.closed and self.used and self.used + amount > self.limit:
+                self.condition.wait()
+            if self.closed:
+                return False
+            self.used += amount
+            return True
+
+    def release(self, amount: int) -> None:
+        with self.condition:
+            self.used = max(0, self.used - amount)
+            self.condition.notify_all()
+
+    def close(self) -> None:
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+def prefetch(items: Iterable[T], weigh: Callable[[T], int], limit_bytes: int, name: str = "prefetch") -> Iterator[T]:
+    """Produce items on a helper thread, running ahead of the consumer by at most limit_bytes.
+
+    An item's weight is held from the moment it is produced until the
+    consumer asks for the next one, so the limit covers both the items
+    waiting in the queue and the one being worked on. Errors raised by the
+    producer are re-raised in the consumer; a consumer that stops early
+    stops the producer too.
+    """
+    budget = MemoryBudget(limit_bytes)
+    handoff: "queue.Queue" = queue.Queue()
+
+    def produce():
+        iterator = iter(items)
+        try:
+            for item in iterator:
+                weight = weigh(item)
+                if not budget.acquire(weight):
+                    break
+                handoff.put(("item", item, weight))
+            handoff.put(("done", None, 0))
+        except BaseException as e:
+            handoff.put(("error", e, 0))
+        finally:
+            # Close generators on the thread that ran them
+            close = getattr(iterator, "close", None)
+            if close:
+                close()
+
+    producer = threading.Thread(target=produce, name=name, daemon=True)
+    producer.start()
+    try:
+        while True:
+            kind, item, weight = handoff.get()
+            if kind == "done":
+                return
+            if kind == "error":
+                raise item
+            try:
+                yield item
+            finally:
+                budget.release(weight)
+    finally:
+        budget.close()
+        producer.join()
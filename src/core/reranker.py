@@ -0,0 +1,131 @@
+import time, threading
+import numpy as np
+from collections import Counter
+from src.core.config import Config
+from src.core.metrics import metrics
+from src.model.models import TextChunk
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from src.vectordb.bm25_index import BM25Index
+from typing import List, Optional
+
+class Reranker:
+    """Interface for rescoring retrieved chunks against the query text"""
+    def score(self, query_text: str, chunks: List[TextChunk]) -> np.ndarray:
+        """One relevance score per chunk, higher is better; chunks arrive in retrieval order"""
+        raise NotImplementedError("Subclass must implement abstract method")
+
+class FeatureReranker(Reranker):
+    """CPU-cheap scorer mixing BM25 over the candidate set, query-term coverage,
+    query bigrams found verbatim, and the retrieval rank as a prior.
+
+    Scoring 20 candidates of 250 tokens takes a few milliseconds, so it
+    doubles as the fallback when a model-based reranker is over budget.
+    """
+    WEIGHTS = {"bm25": 0.4, "coverage": 0.25, "bigrams": 0.1, "prior": 0.25}
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+    def score(self, query_text: str, chunks: List[TextChunk]) -> np.ndarray:
+        n = len(chunks)
+        prior = 1.0 / (1.0 + np.arange(n))
+        terms = list(dict.fromkeys(BM25Index.tokenize(query_text)))
+        if not terms or not n:
+            return prior
+        documents = [BM25Index.tokenize(chunk.get_text()) for chunk in chunks]
+        counts = [Counter(document) for document in documents]
+        tf = np.array([[count.get(term, 0) for count in counts] for term in terms], dtype=np.float32)
+        lengths = np.array([len(document) for document in documents], dtype=np.float32)
+        df = (tf > 0).sum(axis=1)
+        idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5))[:, None]
+        norm = self.k1 * (1.0 - self.b + self.b * lengths / max(float(lengths.mean()), 1.0))
+        bm25 = (idf * tf * (self.k1 + 1.0) / (tf + norm)).sum(axis=0)
+        coverage = (idf * (tf > 0)).sum(axis=0) / idf.sum()
+        bigrams = np.zeros(n, dtype=np.float32)
+        pairs = list(zip(terms, terms[1:]))
+        if pairs:
+            for i, document in enumerate(documents):
+                present = set(zip(document, document[1:]))
+                bigrams[i] = sum(pair in present for pair in pairs) / len(pairs)
+        top = bm25.max()
+        return (self.WEIGHTS["bm25"] * (bm25 / top if top > 0 else bm25)
+                + self.WEIGHTS["coverage"] * coverage
+                + self.WEIGHTS["bigrams"] * bigrams
+                + self.WEIGHTS["prior"] * prior)
+
+class CrossEncoderReranker(Reranker):
+    """Local cross-encoder (sentence-transformers) run on CPU over all pairs in batches"""
+    def __init__(self, model_name: str, batch_size: int = 32):
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.batch_size = batch_size
+
+    def score(self, query_text: str, chunks: List[TextChunk]) -> np.ndarray:
+        pairs = [(query_text, chunk.get_text()) for chunk in chunks]
+        return np.asarray(self.model.predict(pairs, batch_size=self.batch_size), dtype=np.float32)
+
+class RerankStage:
+    """Over-fetched candidates in, the RERANK_TOP_K best out, within RERANK_BUDGET_MS.
+
+    The primary reranker runs on a single worker thread. If it misses the
+    budget, fails, or is still busy with an earlier query that overran, the
+    fallback scorer ranks the candidates instead, so a slow model never adds
+    more than the budget to a query.
+    """
+    def __init__(self, primary: Reranker, fallback: Optional[Reranker] = None,
+                 top_k: int = None, budget_ms: float = None):
+        self.primary = primary
+        self.fallback = fallback
+        self.top_k = top_k or Config.RERANK_TOP_K
+        self.budget = (Config.RERANK_BUDGET_MS if budget_ms is None else budget_ms) / 1000.0
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank") if fallback else None
+        self.busy = threading.Semaphore(1)
+
+    def _score_primary(self, query_text: str, chunks: List[TextChunk]) -> Optional[np.ndarray]:
+        if self.executor is None:
+            return self.primary.score(query_text, chunks)
+        if not self.busy.acquire(blocking=False):
+            return None
+
+        def run():
+            try:
+                return self.primary.score(query_text, chunks)
+            finally:
+                self.busy.release()
+
+        future = self.executor.submit(run)
+        try:
+            return future.result(timeout=self.budget)
+        except TimeoutError:
+            print(f"Reranker exceeded its {self.budget * 1000:.0f} ms budget; using the fallback scorer")
+        except Exception as e:
+            print(f"Reranker failed ({e}); using the fallback scorer")
+        return None
+
+    def rerank(self, query_text: str, chunks: List[TextChunk]) -> List[TextChunk]:
+        if len(chunks) <= 1:
+            return chunks
+        with metrics.span("rerank"):
+            scores = self._score_primary(query_text, chunks)
+            if scores is None:
+                metrics.increment("rerank_fallbacks")
+                scores = self.fallback.score(query_text, chunks)
+        # Stable sort keeps retrieval order among equal scores
+        order = np.argsort(-np.asarray(scores), kind="stable")[:self.top_k]
+        return [chunks[i] for i in order]
+
+def build_rerank_stage() -> Optional[RerankStage]:
+    """RerankStage from Config: the cross-encoder in RERANK_MODEL when it loads, else the feature scorer"""
+    if not Config.RERANK_ENABLED:
+        return None
+    features = FeatureReranker()
+    if Config.RERANK_MODEL:
+        try:
+            start = time.perf_counter()
+            model = CrossEncoderReranker(Config.RERANK_MODEL)
+            print(f"Loaded reranker {Config.RERANK_MODEL} in {time.perf_counter() - start:.1f}s")
+            return RerankStage(model, fallback=features)
+        except Exception as e:
+            print(f"Could not load reranker {Config.RERANK_MODEL} ({e}); using the feature scorer")
+    return RerankStage(features)
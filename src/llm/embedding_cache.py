@@ -0,0 +1,94 @@
+import os, array, sqlite3, hashlib, threading
+import numpy as np
+from collections import OrderedDict
+from src.core.config import Config
+from typing import Dict, Optional, Sequence
+
+class EmbeddingCache:
+    """Bounded, thread-safe LRU cache of embeddings keyed on (model, task_type, text).
+
+    With a db_path the cache is backed by a SQLite file, so vectors survive a
+    restart and are promoted into memory on first use.
+    """
+    def __init__(self, max_entries: int = None, db_path: Optional[str] = None):
+        self.max_entries = max_entries or Config.EMBEDDING_CACHE_MAX_ENTRIES
+        # float32 arrays take a quarter of the memory of lists of boxed floats
+        self.entries: "OrderedDict[str, array.array]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {"hits_memory": 0, "hits_disk": 0, "misses": 0}
+        self.db = None
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+                self.db = sqlite3.connect(db_path, check_same_thread=False)
+                self.db.execute("PRAGMA journal_mode=WAL")
+                self.db.execute("PRAGMA synchronous=NORMAL")
+                self.db.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+                )
+                self.db.commit()
+            except sqlite3.Error as e:
+                print(f"Error opening embedding cache at {db_path}: {e}")
+                self.db = None
+
+    @staticmethod
+    def make_key(model: str, task_type: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\x00{task_type}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get(self, model: str, task_type: str, text: str) -> Optional[array.array]:
+        key = self.make_key(model, task_type, text)
+        with self.lock:
+            vector = self.entries.get(key)
+            if vector is not None:
+                self.entries.move_to_end(key)
+                self.counters["hits_memory"] += 1
+                return vector[:]
+            if self.db is not None:
+                row = self.db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if row:
+                    vector = array.array("f", row[0])
+                    self._remember(key, vector)
+                    self.counters["hits_disk"] += 1
+                    return vector[:]
+            self.counters["misses"] += 1
+            return None
+
+    def put(self, model: str, task_type: str, text: str, vector: Sequence[float]) -> None:
+        key = self.make_key(model, task_type, text)
+        packed = array.array("f")
+        packed.frombytes(np.asarray(vector, dtype=np.float32).tobytes())
+        with self.lock:
+            self._remember(key, packed)
+            if self.db is not None:
+                try:
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                        (key, packed.tobytes())
+                    )
+                    self.db.commit()
+                except sqlite3.Error as e:
+                    print(f"Error persisting embedding cache entry: {e}")
+
+    def stats(self) -> Dict[str, float]:
+        with self.lock:
+            stats = dict(self.counters)
+            hits = stats["hits_memory"] + stats["hits_disk"]
+            lookups = hits + stats["misses"]
+            stats["hits"] = hits
+            stats["hit_rate"] = hits / lookups if lookups else 0.0
+            stats["entries"] = len(self.entries)
+            stats["persistent"] = self.db is not None
+            return stats
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM embeddings")
+                self.db.commit()
+
+    def _remember(self, key: str, vector: array.array) -> None:
+        self.entries[key] = vector
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
@@ -1,51 +1,167 @@
-from typing import List
+import time, asyncio
+import numpy as np
+from typing import List, Optional, Callable
 from src.core.config import Config
 import google.generativeai as genai
+import google.ai.generativelanguage as glm
+from google.generativeai.client import get_default_generative_async_client
+from concurrent.futures import ThreadPoolExecutor
+from src.llm.embedding_cache import EmbeddingCache
 from src.model.models import VectorEmbedding, TextChunk
 
 class EmbeddingService:
     def generate_embedding(self, text: str) -> VectorEmbedding:
         raise NotImplementedError("Subclass must implement abstract method")
 
-    def generate_chunk_embeddings(self, text_chunks: List[TextChunk]) -> List[VectorEmbedding]:
+    def generate_chunk_embeddings(self, text_chunks: List[TextChunk],
+                                  progress: Optional[Callable[[str, int], None]] = None) -> List[VectorEmbedding]:
         raise NotImplementedError("Subclass must implement abstract method")
 
-class GeminiEmbeddingService(EmbeddingService):
+    def generate_query_embeddings(self, texts: List[str]) -> List[VectorEmbedding]:
+        return [self.generate_embedding(text) for text in texts]
+
+    async def generate_embedding_async(self, text: str) -> VectorEmbedding:
+        return await asyncio.to_thread(self.generate_embedding, text)
+
+    async def generate_query_embeddings_async(self, texts: List[str]) -> List[VectorEmbedding]:
+        return await asyncio.to_thread(self.generate_query_embeddings, texts)
+
+class BatchedEmbeddingService(EmbeddingService):
+    """Embeds chunks in batches with a bounded number of batches in flight"""
+    def __init__(self, batch_size: int = None, max_concurrency: int = None,
+                 max_retries: int = None, retry_backoff: float = None):
+        self.batch_size = max(1, batch_size or Config.EMBEDDING_BATCH_SIZE)
+        self.max_concurrency = max(1, max_concurrency or Config.EMBEDDING_MAX_CONCURRENCY)
+        self.max_retries = Config.EMBEDDING_MAX_RETRIES if max_retries is None else max_retries
+        self.retry_backoff = Config.EMBEDDING_RETRY_BACKOFF if retry_backoff is None else retry_backoff
+        self.dimension = Config.EMBEDDING_DIMENSION
+
+    def embed_batch(self, texts: List[str], task_type: str) -> List[List[float]]:
+        """Embed a list of texts in a single call, returning vectors in input order"""
+        raise NotImplementedError("Subclass must implement abstract method")
+
+    def _embed_batch_with_retry(self, texts: List[str], task_type: str) -> List[List[float]]:
+        attempt = 0
+        while True:
+            try:
+                vectors = self.embed_batch(texts, task_type)
+                if len(vectors) != len(texts):
+                    raise ValueError(f"Expected {len(texts)} embeddings, got {len(vectors)}")
+                return vectors
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    print(f"Error generating embeddings for batch of {len(texts)} chunks: {e}")
+                    return [[0.0] * self.dimension for _ in texts]
+                delay = self.retry_backoff * (2 ** attempt)
+                print(f"Embedding batch failed ({e}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+                attempt += 1
+
+    def _map_batches(self, batches: List[list], embed: Callable[[list], np.ndarray]) -> List[np.ndarray]:
+        if len(batches) == 1 or self.max_concurrency == 1:
+            return [embed(batch) for batch in batches]
+        # executor.map keeps results in batch order regardless of completion order
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+            return list(executor.map(embed, batches))
+
+    def generate_chunk_embeddings(self, text_chunks: List[TextChunk],
+                                  progress: Optional[Callable[[str, int], None]] = None) -> List[VectorEmbedding]:
+        if not text_chunks:
+            return []
+        batches = [text_chunks[i:i + self.batch_size] for i in range(0, len(text_chunks), self.batch_size)]
+
+        def embed(batch: List[TextChunk]) -> np.ndarray:
+            # Packed as soon as each call returns, so finished batches are not held as lists of boxed floats
+            vectors = np.asarray(self._embed_batch_with_retry([chunk.get_text() for chunk in batch], "retrieval_document"),
+                                 dtype=np.float32)
+            if progress:
+                progress("chunks_embedded", len(batch))
+            return vectors
+
+        results = self._map_batches(batches, embed)
+        embeddings = []
+        for batch, vectors in zip(batches, results):
+            for chunk, vector in zip(batch, vectors):
+                embeddings.append(VectorEmbedding(chunk_id=chunk.get_id(), vector=vector))
+        return embeddings
+
+    def generate_query_embeddings(self, texts: List[str]) -> List[VectorEmbedding]:
+        """Embed many queries with one call per batch instead of one call per query"""
+        if not texts:
+            return []
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results = self._map_batches(
+            batches, lambda batch: np.asarray(self._embed_batch_with_retry(batch, "retrieval_query"), dtype=np.float32)
+        )
+        return [VectorEmbedding(chunk_id="query", vector=vector) for vectors in results for vector in vectors]
+
+class GeminiEmbeddingService(BatchedEmbeddingService):
     def __init__(self):
+        super().__init__()
         genai.configure(api_key=Config.GEMINI_API_KEY)
         self.model = Config.EMBEDDING_MODEL
+        self.cache = None
+        if Config.EMBEDDING_CACHE_ENABLED:
+            self.cache = EmbeddingCache(db_path=Config.EMBEDDING_CACHE_PATH or None)
 
     def generate_embedding(self, text: str) -> VectorEmbedding:
+        if self.cache:
+            vector = self.cache.get(self.model, "retrieval_query", text)
+            if vector is not None:
+                return VectorEmbedding(chunk_id="query", vector=vector)
         try:
             result = genai.embed_content(
                 model=self.model,
                 content=text,
                 task_type="retrieval_query"
             )
+            if self.cache:
+                self.cache.put(self.model, "retrieval_query", text, result["embedding"])
             return VectorEmbedding(chunk_id="query", vector=result["embedding"])
         except Exception as e:
             print(f"Error generating embedding: {e}")
-            return VectorEmbedding(chunk_id="query", vector=[0.0] * 768)
+            return VectorEmbedding(chunk_id="query", vector=[0.0] * self.dimension)
 
-    def generate_chunk_embeddings(self, text_chunks: List[TextChunk]) -> List[VectorEmbedding]:
-        embeddings = []
-        for chunk in text_chunks:
-            try:
-                result = genai.embed_content(
+    async def generate_embedding_async(self, text: str) -> VectorEmbedding:
+        if self.cache:
+            vector = self.cache.get(self.model, "retrieval_query", text)
+            if vector is not None:
+                return VectorEmbedding(chunk_id="query", vector=vector)
+        try:
+            # genai.embed_content has no async variant in this SDK version; call the async client directly
+            response = await get_default_generative_async_client().embed_content(
+                glm.EmbedContentRequest(
                     model=self.model,
-                    content=chunk.get_text(),
-                    task_type="retrieval_document"
-                )
-                embedding = VectorEmbedding(
-                    chunk_id=chunk.get_id(),
-                    vector=result["embedding"]
-                )
-                embeddings.append(embedding)
-            except Exception as e:
-                print(f"Error generating embedding for chunk {chunk.get_id()}: {e}")
-                embedding = VectorEmbedding(
-                    chunk_id=chunk.get_id(),
-                    vector=[0.0] * 768
+                    content=glm.Content(parts=[glm.Part(text=text)]),
+                    task_type=glm.TaskType.RETRIEVAL_QUERY
                 )
-                embeddings.append(embedding)
-        return embeddings
+            )
+            vector = list(response.embedding.values)
+            if self.cache:
+                self.cache.put(self.model, "retrieval_query", text, vector)
+            return VectorEmbedding(chunk_id="query", vector=vector)
+        except Exception as e:
+            print(f"Error generating embedding: {e}")
+            return VectorEmbedding(chunk_id="query", vector=[0.0] * self.dimension)
+
+    def generate_query_embeddings(self, texts: List[str]) -> List[VectorEmbedding]:
+        if not self.cache:
+            return super().generate_query_embeddings(texts)
+        vectors = [self.cache.get(self.model, "retrieval_query", text) for text in texts]
+        # Duplicate questions are embedded once
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            embedded = dict(zip(missing, super().generate_query_embeddings(missing)))
+            for text, embedding in embedded.items():
+                if np.any(embedding.get_vector()):
+                    self.cache.put(self.model, "retrieval_query", text, embedding.get_vector())
+            vectors = [embedded[text].get_vector() if vector is None else vector for text, vector in zip(texts, vectors)]
+        return [VectorEmbedding(chunk_id="query", vector=vector) for vector in vectors]
+
+    def embed_batch(self, texts: List[str], task_type: str) -> List[List[float]]:
+        result = genai.embed_content(
+            model=self.model,
+            content=texts,
+            task_type=task_type
+        )
+        return result["embedding"]
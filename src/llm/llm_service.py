@@ -1,28 +1,69 @@
-from typing import List
+import asyncio
+from typing import List, Dict, Iterator, AsyncIterator, Tuple, Optional
 from src.core.config import Config
+from src.core.metrics import metrics
+from src.core.chunker import estimate_tokens
+from src.core.context_budget import ContextBudgeter
 import google.generativeai as genai
 from src.model.models import Query, TextChunk, Response
 
+NO_INFO_MESSAGE = (
+    "I don't have enough information in my knowledge base to answer your question. "
+    "Please consider asking a different question or providing more context."
+)
+
+GENERATION_ERROR_MESSAGE = "I'm sorry, I encountered an error while generating a response."
+
 class LLMService:
     def generate_response(self, query: Query, relevant_chunks: List[TextChunk]) -> Response:
         raise NotImplementedError("Subclass must implement abstract method")
 
+    def build_prompt(self, query: Query, relevant_chunks: List[TextChunk]) -> Tuple[Optional[str], List[TextChunk], Dict[str, int]]:
+        """Return the prompt, the retrieved chunks that made it into its context, and token counts.
+
+        Services that don't assemble a prompt of their own use every chunk
+        and have no prompt to hand back.
+        """
+        return None, relevant_chunks, {}
+
+    def stream_response(self, query: Query, relevant_chunks: List[TextChunk], prompt: Optional[str] = None) -> Iterator[str]:
+        """Yield the answer text incrementally as the model produces it; prompt, when given, comes from build_prompt"""
+        raise NotImplementedError("Subclass must implement abstract method")
+
     def generate_no_info_response(self, query: Query) -> Response:
         raise NotImplementedError("Subclass must implement abstract method")
 
+    async def generate_response_async(self, query: Query, relevant_chunks: List[TextChunk]) -> Response:
+        # Services without a native async client block a worker thread instead of the event loop
+        return await asyncio.to_thread(self.generate_response, query, relevant_chunks)
+
+    async def stream_response_async(self, query: Query, relevant_chunks: List[TextChunk],
+                                    prompt: Optional[str] = None) -> AsyncIterator[str]:
+        response = await self.generate_response_async(query, relevant_chunks)
+        yield response.get_content()
+
 class GeminiLLMService(LLMService):
     def __init__(self):
         genai.configure(api_key=Config.GEMINI_API_KEY)
         self.model = genai.GenerativeModel(Config.GEMINI_MODEL)
+        self.generation_config = {
+            "max_output_tokens": Config.MAX_OUTPUT_TOKENS,
+            "temperature": 0.2,
+            "top_p": 0.95,
+            "top_k": 40
+        }
+        self.context_budgeter = ContextBudgeter()
 
-    def generate_response(self, query: Query, relevant_chunks: List[TextChunk]) -> Response:
-        print(f"Generating response for query: {query.get_text()}")
-        print(f"Using {len(relevant_chunks)} relevant chunks")
-        context = "\n\n".join([chunk.get_text() for chunk in relevant_chunks])
-        print(f"Context length: {len(context)} characters")
+    def build_prompt(self, query: Query, relevant_chunks: List[TextChunk]) -> Tuple[str, List[TextChunk], Dict[str, int]]:
+        """Return the prompt, the retrieved chunks that made it into its context, and token counts"""
+        with metrics.span("prompt"):
+            passages, used_chunks = self.context_budgeter.assemble(relevant_chunks)
+            context = "\n\n".join([passage.get_text() for passage in passages])
         if len(context.strip()) == 0:
             print("WARNING: Context is empty!")
-        else:
+        elif Config.VERBOSE_LOGGING:
+            print(f"Generating response for query: {query.get_text()}")
+            print(f"Using {len(used_chunks)} of {len(relevant_chunks)} relevant chunks in {len(passages)} passages")
             print(f"Context preview: {context[:200]}...")
         prompt = f"""
         You are an Enterprise Q&A system. Your task is to provide accurate answers to questions based on the context provided.
@@ -43,43 +84,109 @@ class GeminiLLMService(LLMService):
 
         ## Answer:
         """
+        usage = {
+            "retrieved_tokens": sum(estimate_tokens(chunk.get_text()) for chunk in relevant_chunks),
+            "context_tokens": estimate_tokens(context),
+            "input_tokens": estimate_tokens(prompt)
+        }
+        metrics.increment("retrieved_context_tokens", usage["retrieved_tokens"])
+        metrics.increment("prompt_input_tokens", usage["input_tokens"])
+        return prompt, used_chunks, usage
+
+    @staticmethod
+    def reported_usage(gemini_response, usage: Dict[str, int]) -> Dict[str, int]:
+        """Prefer the API's own prompt token count over the estimate when it reports one"""
+        reported = getattr(gemini_response, "usage_metadata", None)
+        if reported is not None and getattr(reported, "prompt_token_count", None):
+            return dict(usage, input_tokens=reported.prompt_token_count)
+        return usage
+
+    def generate_response(self, query: Query, relevant_chunks: List[TextChunk]) -> Response:
+        prompt, used_chunks, usage = self.build_prompt(query, relevant_chunks)
         try:
-            generation_config = {
-                "max_output_tokens": Config.MAX_OUTPUT_TOKENS,
-                "temperature": 0.2,
-                "top_p": 0.95,
-                "top_k": 40
-            }
-            print("Sending request to Gemini...")
             gemini_response = self.model.generate_content(
                 prompt,
-                generation_config=generation_config
+                generation_config=self.generation_config
             )
-            print(f"Gemini response received: {gemini_response.text[:100]}...")
+            if Config.VERBOSE_LOGGING:
+                print(f"Gemini response received: {gemini_response.text[:100]}...")
             confidence = 0.8
             return Response(
                 query_id=query.get_id(),
                 content=gemini_response.text,
-                relevant_chunks=relevant_chunks,
-                confidence=confidence
+                relevant_chunks=used_chunks,
+                confidence=confidence,
+                usage=self.reported_usage(gemini_response, usage)
+            )
+        except Exception as e:
+            print(f"Error generating response with Gemini: {e}")
+            return Response(
+                query_id=query.get_id(),
+                content=GENERATION_ERROR_MESSAGE,
+                relevant_chunks=[],
+                confidence=0.0
+            )
+
+    def stream_response(self, query: Query, relevant_chunks: List[TextChunk], prompt: Optional[str] = None) -> Iterator[str]:
+        prompt = prompt or self.build_prompt(query, relevant_chunks)[0]
+        try:
+            gemini_response = self.model.generate_content(
+                prompt,
+                generation_config=self.generation_config,
+                stream=True
+            )
+            for part in gemini_response:
+                text = part.text
+                if text:
+                    yield text
+        except Exception as e:
+            print(f"Error streaming response with Gemini: {e}")
+            yield GENERATION_ERROR_MESSAGE
+
+    async def generate_response_async(self, query: Query, relevant_chunks: List[TextChunk]) -> Response:
+        prompt, used_chunks, usage = self.build_prompt(query, relevant_chunks)
+        try:
+            gemini_response = await self.model.generate_content_async(
+                prompt,
+                generation_config=self.generation_config
+            )
+            return Response(
+                query_id=query.get_id(),
+                content=gemini_response.text,
+                relevant_chunks=used_chunks,
+                confidence=0.8,
+                usage=self.reported_usage(gemini_response, usage)
             )
         except Exception as e:
             print(f"Error generating response with Gemini: {e}")
             return Response(
                 query_id=query.get_id(),
-                content="I'm sorry, I encountered an error while generating a response.",
+                content=GENERATION_ERROR_MESSAGE,
                 relevant_chunks=[],
                 confidence=0.0
             )
 
+    async def stream_response_async(self, query: Query, relevant_chunks: List[TextChunk],
+                                    prompt: Optional[str] = None) -> AsyncIterator[str]:
+        prompt = prompt or self.build_prompt(query, relevant_chunks)[0]
+        try:
+            gemini_response = await self.model.generate_content_async(
+                prompt,
+                generation_config=self.generation_config,
+                stream=True
+            )
+            async for part in gemini_response:
+                text = part.text
+                if text:
+                    yield text
+        except Exception as e:
+            print(f"Error streaming response with Gemini: {e}")
+            yield GENERATION_ERROR_MESSAGE
+
     def generate_no_info_response(self, query: Query) -> Response:
-        content = (
-            "I don't have enough information in my knowledge base to answer your question. "
-            "Please consider asking a different question or providing more context."
-        )
         return Response(
             query_id=query.get_id(),
-            content=content,
+            content=NO_INFO_MESSAGE,
             relevant_chunks=[],
             confidence=0.0
         )
@@ -1,7 +1,11 @@
-import uuid
+import uuid, hashlib
 import numpy as np
+from array import array
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional, Sequence, Union
+
+# Anything np.asarray turns into a 1-D float vector: lists from the API, array('f') from the cache, ndarrays
+VectorLike = Union[Sequence[float], np.ndarray]
 
 
 class Document:
@@ -32,11 +36,14 @@ class Document:
 
 class TextChunk:
     """Portion of a document"""
-    def __init__(self, text: str, document_id: str, position: int):
+    __slots__ = ("id", "text", "document_id", "position", "page")
+
+    def __init__(self, text: str, document_id: str, position: int, page: Optional[int] = None):
         self.id = str(uuid.uuid4())
         self.text = text
         self.document_id = document_id
         self.position = position
+        self.page = page
 
     def get_id(self) -> str:
         return self.id
@@ -47,20 +54,46 @@ class TextChunk:
     def get_document_id(self) -> str:
         return self.document_id
 
+    def content_hash(self) -> str:
+        return self.hash_text(self.text)
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
     def to_dict(self) -> Dict:
         return {
             'id': self.id,
             'text': self.text,
             'document_id': self.document_id,
-            'position': self.position
+            'position': self.position,
+            'page': self.page
         }
 
 class VectorEmbedding:
-    """Vector representation of a text chunk"""
-    def __init__(self, chunk_id: str, vector: List[float]):
-        self.id = str(uuid.uuid4())
+    """Vector representation of a text chunk.
+
+    The vector is held as a contiguous float32 array (3 KB at 768 dimensions
+    instead of about 25 KB as a list of floats), and the id is only generated
+    when first asked for, since query embeddings never need one.
+    """
+    __slots__ = ("_id", "chunk_id", "vector", "_norm")
+
+    def __init__(self, chunk_id: str, vector: VectorLike):
+        self._id = None
         self.chunk_id = chunk_id
-        self.vector = vector
+        self.vector = np.asarray(vector, dtype=np.float32)
+        self._norm = None
+
+    @property
+    def id(self) -> str:
+        if self._id is None:
+            self._id = str(uuid.uuid4())
+        return self._id
+
+    @id.setter
+    def id(self, value: str) -> None:
+        self._id = value
 
     def get_id(self) -> str:
         return self.id
@@ -68,21 +101,92 @@ class VectorEmbedding:
     def get_chunk_id(self) -> str:
         return self.chunk_id
 
-    def get_vector(self) -> List[float]:
+    def get_vector(self) -> np.ndarray:
         return self.vector
 
+    def norm(self) -> float:
+        if self._norm is None:
+            self._norm = float(np.linalg.norm(self.vector))
+        return self._norm
+
     def similarity(self, other: 'VectorEmbedding') -> float:
-        vec1 = np.array(self.vector)
-        vec2 = np.array(other.vector)
-        dot_product = np.dot(vec1, vec2)
-        norm_a = np.linalg.norm(vec1)
-        norm_b = np.linalg.norm(vec2)
+        norm_a, norm_b = self.norm(), other.norm()
         if norm_a == 0 or norm_b == 0:
             return 0
-        return dot_product / (norm_a * norm_b)
+        return float(np.dot(self.vector, other.vector)) / (norm_a * norm_b)
+
+class ChunkBatch:
+    """Columnar chunks of one bulk operation, with their vectors as one float32 matrix.
+
+    Holds the same fields as a list of TextChunk and VectorEmbedding pairs
+    without a Python object per chunk or per float; pages are stored as -1
+    when unknown. Vector stores that understand it take it whole through
+    VectorDatabase.store_batch.
+    """
+    __slots__ = ("ids", "texts", "document_ids", "positions", "pages", "vectors")
+
+    def __init__(self, ids: List[str], texts: List[str], document_ids: List[str], positions: array, pages: array,
+                 vectors: Optional[np.ndarray] = None):
+        if not len(ids) == len(texts) == len(document_ids) == len(positions) == len(pages):
+            raise ValueError("ChunkBatch columns must have the same length")
+        if vectors is not None and len(vectors) != len(ids):
+            raise ValueError(f"Got {len(vectors)} vectors for {len(ids)} chunks")
+        self.ids = ids
+        self.texts = texts
+        self.document_ids = document_ids
+        self.positions = positions
+        self.pages = pages
+        self.vectors = None if vectors is None else np.ascontiguousarray(vectors, dtype=np.float32)
+
+    @classmethod
+    def from_chunks(cls, chunks: List[TextChunk], vectors: Optional[np.ndarray] = None) -> 'ChunkBatch':
+        return cls(
+            [chunk.get_id() for chunk in chunks],
+            [chunk.get_text() for chunk in chunks],
+            [chunk.get_document_id() for chunk in chunks],
+            array("i", (int(chunk.position) for chunk in chunks)),
+            array("i", (-1 if chunk.page is None else int(chunk.page) for chunk in chunks)),
+            vectors
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, index: slice) -> 'ChunkBatch':
+        return ChunkBatch(
+            self.ids[index], self.texts[index], self.document_ids[index], self.positions[index], self.pages[index],
+            None if self.vectors is None else self.vectors[index]
+        )
+
+    def take(self, indices: List[int]) -> 'ChunkBatch':
+        """Rows at the given indices, in that order"""
+        return ChunkBatch(
+            [self.ids[i] for i in indices], [self.texts[i] for i in indices], [self.document_ids[i] for i in indices],
+            array("i", (self.positions[i] for i in indices)), array("i", (self.pages[i] for i in indices)),
+            None if self.vectors is None else self.vectors[indices]
+        )
+
+    def page(self, i: int) -> Optional[int]:
+        return None if self.pages[i] < 0 else self.pages[i]
+
+    def chunk(self, i: int) -> TextChunk:
+        chunk = TextChunk(self.texts[i], self.document_ids[i], self.positions[i], page=self.page(i))
+        chunk.id = self.ids[i]
+        return chunk
+
+    def chunks(self) -> Iterator[TextChunk]:
+        return (self.chunk(i) for i in range(len(self)))
+
+    def embeddings(self) -> List[VectorEmbedding]:
+        """One VectorEmbedding per chunk, each a view into the vector matrix"""
+        if self.vectors is None:
+            raise ValueError("ChunkBatch has no vectors")
+        return [VectorEmbedding(chunk_id, vector) for chunk_id, vector in zip(self.ids, self.vectors)]
 
 class Query:
     """User's question"""
+    __slots__ = ("id", "text", "embedding", "timestamp")
+
     def __init__(self, text: str, embedding: Optional[VectorEmbedding] = None):
         self.id = str(uuid.uuid4())
         self.text = text
@@ -110,12 +214,16 @@ class Query:
 
 class Response:
     """System's answer to a query"""
-    def __init__(self, query_id: str, content: str, relevant_chunks: List[TextChunk] = None, confidence: float = 0.0):
+    __slots__ = ("id", "query_id", "content", "relevant_chunks", "confidence", "usage", "timestamp")
+
+    def __init__(self, query_id: str, content: str, relevant_chunks: List[TextChunk] = None, confidence: float = 0.0,
+                 usage: Optional[Dict[str, int]] = None):
         self.id = str(uuid.uuid4())
         self.query_id = query_id
         self.content = content
         self.relevant_chunks = relevant_chunks or []
         self.confidence = confidence
+        self.usage = usage
         self.timestamp = datetime.now()
 
     def get_id(self) -> str:
@@ -134,5 +242,6 @@ class Response:
             'content': self.content,
             'confidence': self.confidence,
             'timestamp': self.timestamp.isoformat(),
-            'sources': [chunk.to_dict() for chunk in self.relevant_chunks]
+            'sources': [chunk.to_dict() for chunk in self.relevant_chunks],
+            **({'usage': self.usage} if self.usage else {})
         }
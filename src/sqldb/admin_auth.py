@@ -1,6 +1,8 @@
-import os, sqlite3
+import os, hmac, time, sqlite3, hashlib, threading
 from cryptography.fernet import Fernet
 from werkzeug.security import generate_password_hash, check_password_hash
+from src.core.config import Config
+from src.sqldb.connection_pool import ConnectionPool
 
 DB_DIR = os.path.join(os.path.dirname(__file__), 'sqldb')
 DB_PATH = os.path.join(DB_DIR, 'admin_users.db')
@@ -19,22 +21,32 @@ def get_fernet():
     return Fernet(key)
 
 class AdminAuthManager:
-    def __init__(self):
+    def __init__(self, db_path: str = DB_PATH):
         self.fernet = get_fernet()
+        self.pool = ConnectionPool(db_path)
+        # username -> (keyed digest of the last verified password, expiry); never persisted
+        self.verified = {}
+        self.verified_lock = threading.Lock()
+        self.digest_key = os.urandom(32)
         self._init_db()
 
     def _init_db(self):
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS admins (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL
-            )
-        ''')
-        conn.commit()
-        conn.close()
+        with self.pool.connection() as conn:
+            with conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS admins (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        username TEXT UNIQUE NOT NULL,
+                        password_hash TEXT NOT NULL
+                    )
+                ''')
+
+    def _digest(self, username, password):
+        return hmac.new(self.digest_key, f"{username}\x00{password}".encode(), hashlib.sha256).digest()
+
+    def _forget(self, username):
+        with self.verified_lock:
+            self.verified.pop(username, None)
 
     def register_admin(self, username, password):
         if not username or not password:
@@ -42,11 +54,10 @@ class AdminAuthManager:
         try:
             password_hash = generate_password_hash(password)
             encrypted_hash = self.fernet.encrypt(password_hash.encode()).decode()
-            conn = sqlite3.connect(DB_PATH)
-            c = conn.cursor()
-            c.execute('INSERT INTO admins (username, password_hash) VALUES (?, ?)', (username, encrypted_hash))
-            conn.commit()
-            conn.close()
+            with self.pool.connection() as conn:
+                with conn:
+                    conn.execute('INSERT INTO admins (username, password_hash) VALUES (?, ?)', (username, encrypted_hash))
+            self._forget(username)
             return True, "Admin registered."
         except sqlite3.IntegrityError:
             return False, "Username already exists."
@@ -54,36 +65,37 @@ class AdminAuthManager:
             return False, str(e)
 
     def verify_admin(self, username, password):
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute('SELECT password_hash FROM admins WHERE username = ?', (username,))
-        row = c.fetchone()
-        conn.close()
+        # A recent successful check of the same password skips the Fernet decrypt and the slow hash
+        digest = self._digest(username, password)
+        with self.verified_lock:
+            cached = self.verified.get(username)
+        if cached and cached[1] > time.monotonic() and hmac.compare_digest(cached[0], digest):
+            return True
+        with self.pool.connection() as conn:
+            row = conn.execute('SELECT password_hash FROM admins WHERE username = ?', (username,)).fetchone()
         if not row:
             return False
         encrypted_hash = row[0]
         try:
             password_hash = self.fernet.decrypt(encrypted_hash.encode()).decode()
-            return check_password_hash(password_hash, password)
+            verified = check_password_hash(password_hash, password)
         except Exception:
             return False
+        if verified and Config.ADMIN_AUTH_CACHE_TTL > 0:
+            with self.verified_lock:
+                self.verified[username] = (digest, time.monotonic() + Config.ADMIN_AUTH_CACHE_TTL)
+        return verified
 
     def get_all_admins(self):
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute('SELECT username FROM admins ORDER BY username')
-        admins = [row[0] for row in c.fetchall()]
-        conn.close()
-        return admins
+        with self.pool.connection() as conn:
+            return [row[0] for row in conn.execute('SELECT username FROM admins ORDER BY username')]
 
     def delete_admin(self, username):
         try:
-            conn = sqlite3.connect(DB_PATH)
-            c = conn.cursor()
-            c.execute('DELETE FROM admins WHERE username = ?', (username,))
-            conn.commit()
-            deleted = c.rowcount > 0
-            conn.close()
+            with self.pool.connection() as conn:
+                with conn:
+                    deleted = conn.execute('DELETE FROM admins WHERE username = ?', (username,)).rowcount > 0
+            self._forget(username)
             if deleted:
                 return True, "Deleted"
             else:
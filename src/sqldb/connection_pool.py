@@ -0,0 +1,57 @@
+import os, queue, sqlite3, threading
+from contextlib import contextmanager
+from src.core.config import Config
+from typing import Iterator, List
+
+class ConnectionPool:
+    """Fixed-size pool of WAL-mode SQLite connections shared across threads.
+
+    Connections are opened lazily up to `size` and handed out one caller at a
+    time, so thread-pool and asyncio.to_thread workers reuse a handful of
+    connections instead of opening one per call (or per short-lived thread).
+    Each connection keeps sqlite3's prepared-statement cache warm for the
+    fixed SQL strings its callers execute.
+    """
+    def __init__(self, db_path: str, size: int = None, statement_cache: int = 128):
+        self.db_path = db_path
+        self.size = max(1, size or Config.SQLITE_POOL_SIZE)
+        self.statement_cache = statement_cache
+        self.idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self.opened: List[sqlite3.Connection] = []
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False,
+                               cached_statements=self.statement_cache)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection; wrap writes in `with conn:` to commit them as one transaction"""
+        try:
+            conn = self.idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self.lock:
+                if len(self.opened) < self.size:
+                    conn = self._open()
+                    self.opened.append(conn)
+            if conn is None:
+                conn = self.idle.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self.idle.put(conn)
+
+    def close(self) -> None:
+        with self.lock:
+            for conn in self.opened:
+                conn.close()
+            self.opened = []
+            self.idle = queue.LifoQueue()
@@ -0,0 +1,274 @@
+import os, json, sqlite3
+from src.sqldb.connection_pool import ConnectionPool
+from typing import Dict, List, Optional, Any
+
+class SessionStore:
+    """Interface for chat session persistence"""
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError("Subclass must implement abstract method")
+
+    def save(self, session_data: Dict[str, Any]) -> bool:
+        raise NotImplementedError("Subclass must implement abstract method")
+
+    def append_message(self, session_id: str, message: Dict[str, Any]) -> Optional[Dict[str, int]]:
+        """Append a message; returns {"message_count", "user_message_count"} or None if the session is missing"""
+        raise NotImplementedError("Subclass must implement abstract method")
+
+    def rename(self, session_id: str, name: str) -> bool:
+        raise NotImplementedError("Subclass must implement abstract method")
+
+    def list_sessions(self, user_id: str) -> List[Dict[str, Any]]:
+        """Session summaries for a user, newest first"""
+        raise NotImplementedError("Subclass must implement abstract method")
+
+    def delete(self, session_id: str) -> bool:
+        raise NotImplementedError("Subclass must implement abstract method")
+
+class JSONSessionStore(SessionStore):
+    """One pretty-printed JSON file per session (the original storage format)"""
+    def __init__(self, sessions_dir: str):
+        self.sessions_dir = sessions_dir
+        os.makedirs(self.sessions_dir, exist_ok=True)
+
+    def get_session_file_path(self, session_id: str) -> str:
+        return os.path.join(self.sessions_dir, f"{session_id}.json")
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        file_path = self.get_session_file_path(session_id)
+        if not os.path.exists(file_path):
+            return None
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                if isinstance(data, list) and len(data) == 1 and isinstance(data[0], dict):
+                    data = data[0]
+                if not isinstance(data, dict):
+                    return None
+                return data
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Error loading session {session_id}: {e}")
+            return None
+
+    def save(self, session_data: Dict[str, Any]) -> bool:
+        session_id = session_data.get("id")
+        if not session_id:
+            return False
+        file_path = self.get_session_file_path(session_id)
+        try:
+            with open(file_path, 'w', encoding='utf-8') as f:
+                json.dump(session_data, f, indent=2, ensure_ascii=False)
+            return True
+        except IOError as e:
+            print(f"Error saving session {session_id}: {e}")
+            return False
+
+    def append_message(self, session_id: str, message: Dict[str, Any]) -> Optional[Dict[str, int]]:
+        session_data = self.load(session_id)
+        if not session_data:
+            return None
+        session_data["messages"].append(message)
+        if not self.save(session_data):
+            return None
+        return {
+            "message_count": len(session_data["messages"]),
+            "user_message_count": len([m for m in session_data["messages"] if m["role"] == "user"])
+        }
+
+    def rename(self, session_id: str, name: str) -> bool:
+        session_data = self.load(session_id)
+        if not session_data:
+            return False
+        session_data["name"] = name
+        return self.save(session_data)
+
+    def list_sessions(self, user_id: str) -> List[Dict[str, Any]]:
+        sessions = []
+        if not os.path.exists(self.sessions_dir):
+            return sessions
+        for filename in os.listdir(self.sessions_dir):
+            if filename.endswith('.json') and filename.startswith('sess-'):
+                session_data = self.load(filename[:-5])
+                if session_data and session_data.get("user_id") == user_id:
+                    sessions.append({
+                        "id": session_data["id"],
+                        "name": session_data["name"],
+                        "created_at": session_data["created_at"],
+                        "message_count": len(session_data.get("messages", []))
+                    })
+        sessions.sort(key=lambda x: x["created_at"], reverse=True)
+        return sessions
+
+    def delete(self, session_id: str) -> bool:
+        file_path = self.get_session_file_path(session_id)
+        try:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+                return True
+            return False
+        except OSError as e:
+            print(f"Error deleting session {session_id}: {e}")
+            return False
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite (WAL) store: sessions indexed by user and creation time, messages appended as rows"""
+    SCHEMA = (
+        '''CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            message_count INTEGER NOT NULL DEFAULT 0,
+            user_message_count INTEGER NOT NULL DEFAULT 0
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_sessions_user_created ON sessions (user_id, created_at DESC)',
+        '''CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            time TEXT NOT NULL,
+            sources TEXT NOT NULL DEFAULT '[]'
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id)',
+        'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)'
+    )
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.pool = ConnectionPool(db_path)
+        with self.pool.connection() as conn:
+            with conn:
+                for statement in self.SCHEMA:
+                    conn.execute(statement)
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                'SELECT id, user_id, name, created_at FROM sessions WHERE id = ?', (session_id,)
+            ).fetchone()
+            if not row:
+                return None
+            messages = [
+                {"role": role, "content": content, "time": time, "sources": json.loads(sources)}
+                for role, content, time, sources in conn.execute(
+                    'SELECT role, content, time, sources FROM messages WHERE session_id = ? ORDER BY id', (session_id,)
+                )
+            ]
+        return {"id": row[0], "name": row[2], "user_id": row[1], "messages": messages, "created_at": row[3]}
+
+    def save(self, session_data: Dict[str, Any]) -> bool:
+        session_id = session_data.get("id")
+        if not session_id:
+            return False
+        messages = session_data.get("messages", [])
+        try:
+            with self.pool.connection() as conn, conn:
+                conn.execute(
+                    '''INSERT INTO sessions (id, user_id, name, created_at, message_count, user_message_count)
+                       VALUES (?, ?, ?, ?, ?, ?)
+                       ON CONFLICT (id) DO UPDATE SET
+                           user_id = excluded.user_id, name = excluded.name, created_at = excluded.created_at,
+                           message_count = excluded.message_count, user_message_count = excluded.user_message_count''',
+                    (session_id, session_data.get("user_id", "anonymous"), session_data.get("name", "New Chat"),
+                     session_data.get("created_at", ""), len(messages),
+                     len([m for m in messages if m.get("role") == "user"]))
+                )
+                conn.execute('DELETE FROM messages WHERE session_id = ?', (session_id,))
+                conn.executemany(
+                    'INSERT INTO messages (session_id, role, content, time, sources) VALUES (?, ?, ?, ?, ?)',
+                    [self._message_row(session_id, m) for m in messages]
+                )
+            return True
+        except sqlite3.Error as e:
+            print(f"Error saving session {session_id}: {e}")
+            return False
+
+    def append_message(self, session_id: str, message: Dict[str, Any]) -> Optional[Dict[str, int]]:
+        try:
+            with self.pool.connection() as conn, conn:
+                updated = conn.execute(
+                    '''UPDATE sessions SET message_count = message_count + 1,
+                           user_message_count = user_message_count + ?
+                       WHERE id = ?''',
+                    (1 if message.get("role") == "user" else 0, session_id)
+                ).rowcount
+                if not updated:
+                    return None
+                conn.execute(
+                    'INSERT INTO messages (session_id, role, content, time, sources) VALUES (?, ?, ?, ?, ?)',
+                    self._message_row(session_id, message)
+                )
+                row = conn.execute(
+                    'SELECT message_count, user_message_count FROM sessions WHERE id = ?', (session_id,)
+                ).fetchone()
+            return {"message_count": row[0], "user_message_count": row[1]}
+        except sqlite3.Error as e:
+            print(f"Error appending message to session {session_id}: {e}")
+            return None
+
+    def rename(self, session_id: str, name: str) -> bool:
+        try:
+            with self.pool.connection() as conn, conn:
+                return conn.execute('UPDATE sessions SET name = ? WHERE id = ?', (name, session_id)).rowcount > 0
+        except sqlite3.Error as e:
+            print(f"Error renaming session {session_id}: {e}")
+            return False
+
+    def list_sessions(self, user_id: str) -> List[Dict[str, Any]]:
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                '''SELECT id, name, created_at, message_count FROM sessions
+                   WHERE user_id = ? ORDER BY created_at DESC''',
+                (user_id,)
+            )
+            return [
+                {"id": row[0], "name": row[1], "created_at": row[2], "message_count": row[3]}
+                for row in rows
+            ]
+
+    def delete(self, session_id: str) -> bool:
+        try:
+            with self.pool.connection() as conn, conn:
+                conn.execute('DELETE FROM messages WHERE session_id = ?', (session_id,))
+                return conn.execute('DELETE FROM sessions WHERE id = ?', (session_id,)).rowcount > 0
+        except sqlite3.Error as e:
+            print(f"Error deleting session {session_id}: {e}")
+            return False
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self.pool.connection() as conn:
+            row = conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self.pool.connection() as conn, conn:
+            conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    @staticmethod
+    def _message_row(session_id: str, message: Dict[str, Any]) -> tuple:
+        return (
+            session_id,
+            message.get("role", ""),
+            message.get("content", ""),
+            message.get("time", ""),
+            json.dumps(message.get("sources") or [], ensure_ascii=False)
+        )
+
+def migrate_json_sessions(sessions_dir: str, store: SessionStore) -> int:
+    """Copy every sess-*.json file in sessions_dir into store; returns the number migrated"""
+    source = JSONSessionStore(sessions_dir)
+    migrated = 0
+    for filename in sorted(os.listdir(sessions_dir)):
+        if not (filename.endswith('.json') and filename.startswith('sess-')):
+            continue
+        session_data = source.load(filename[:-5])
+        if session_data and session_data.get("id") and store.save(session_data):
+            migrated += 1
+    return migrated
+
+if __name__ == "__main__":
+    import sys
+    from src.core.config import Config
+    json_dir = sys.argv[1] if len(sys.argv) > 1 else Config.SESSIONS_DIR
+    count = migrate_json_sessions(json_dir, SQLiteSessionStore(Config.SESSION_DB_PATH))
+    print(f"Migrated {count} session(s) from {json_dir} to {Config.SESSION_DB_PATH}")
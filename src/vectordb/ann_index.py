@@ -0,0 +1,132 @@
+import os
+import numpy as np
+from typing import List, Optional
+
+class IVFIndex:
+    """Inverted-file (IVF-flat) index over the rows of a unit-length vector matrix.
+
+    Rows are bucketed by their nearest k-means centroid. A query scores only the
+    rows in its nprobe closest buckets, trading recall for latency. The index
+    stores row numbers, not vectors; scoring reads the owner's matrix.
+    """
+    ASSIGN_BLOCK = 65536  # rows scored against the centroids at a time
+
+    def __init__(self, centroids: np.ndarray, assignments: np.ndarray = None, trained_size: int = 0):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.assignments = np.empty(0, dtype=np.int32) if assignments is None else assignments.astype(np.int32)
+        self.trained_size = trained_size
+        self._rebuild_lists()
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def size(self) -> int:
+        """Number of rows covered, including removed ones (assignment -1)"""
+        return len(self.assignments)
+
+    @staticmethod
+    def default_nlist(count: int) -> int:
+        return int(min(4096, max(16, 4 * np.sqrt(count))))
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, rows: np.ndarray, size: int, nlist: int = None,
+              iterations: int = 8, sample_per_list: int = 40, seed: int = 0) -> "IVFIndex":
+        """Spherical k-means on a sample of vectors[rows], then assign every row.
+
+        size is the row count of the owning matrix; rows outside `rows` are
+        recorded as unassigned.
+        """
+        rng = np.random.default_rng(seed)
+        nlist = min(nlist or cls.default_nlist(len(rows)), len(rows))
+        sample_rows = rows if len(rows) <= nlist * sample_per_list else np.sort(
+            rng.choice(rows, nlist * sample_per_list, replace=False))
+        sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = cls._nearest(centroids, sample)
+            order = np.argsort(labels, kind="stable")
+            counts = np.bincount(labels, minlength=nlist)
+            sums = np.zeros_like(centroids)
+            used = counts > 0
+            sums[used] = np.add.reduceat(sample[order], np.concatenate([[0], np.cumsum(counts)[:-1]])[used])
+            empty = counts == 0
+            # Reseed empty buckets from random sample points so every centroid stays in use
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = sums / norms
+        index = cls(centroids, np.full(size, -1, dtype=np.int32), trained_size=len(rows))
+        index.add(vectors, rows)
+        return index
+
+    @classmethod
+    def _nearest(cls, centroids: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+        labels = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), cls.ASSIGN_BLOCK):
+            block = np.asarray(vectors[start:start + cls.ASSIGN_BLOCK], dtype=np.float32)
+            labels[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        return labels
+
+    def _rebuild_lists(self) -> None:
+        order = np.argsort(self.assignments, kind="stable").astype(np.int64)
+        bounds = np.searchsorted(self.assignments[order], np.arange(self.nlist + 1))
+        self.lists: List[np.ndarray] = [order[bounds[i]:bounds[i + 1]] for i in range(self.nlist)]
+
+    def add(self, vectors: np.ndarray, rows: np.ndarray) -> None:
+        """Assign rows (already present in vectors) to their nearest buckets"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return
+        if rows.max() >= len(self.assignments):
+            grown = np.full(int(rows.max()) + 1, -1, dtype=np.int32)
+            grown[:len(self.assignments)] = self.assignments
+            self.assignments = grown
+        labels = self._nearest(self.centroids, vectors[rows])
+        self.assignments[rows] = labels
+        for label in np.unique(labels):
+            self.lists[label] = np.concatenate([self.lists[label], rows[labels == label]])
+
+    def remove(self, rows: List[int]) -> None:
+        rows = np.asarray([row for row in rows if row < len(self.assignments)], dtype=np.int64)
+        if not len(rows):
+            return
+        labels = self.assignments[rows]
+        self.assignments[rows] = -1
+        for label in np.unique(labels[labels >= 0]):
+            bucket = self.lists[label]
+            self.lists[label] = bucket[self.assignments[bucket] == label]
+
+    def remap(self, old_rows: np.ndarray) -> None:
+        """Renumber after compaction: old_rows[i] is the old row now stored at row i"""
+        self.assignments = self.assignments[old_rows]
+        self._rebuild_lists()
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        scores = self.centroids @ query
+        nprobe = min(nprobe, self.nlist)
+        probe = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        lists = self.lists
+        return np.concatenate([lists[label] for label in probe])
+
+    def needs_retrain(self, live: int, growth: float) -> bool:
+        """Centroids drift from the data once the corpus grows well past the training set"""
+        return live > self.trained_size * growth
+
+    def save(self, path: str) -> None:
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, centroids=self.centroids, assignments=self.assignments,
+                 trained_size=np.int64(self.trained_size))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["IVFIndex"]:
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                return cls(data["centroids"], data["assignments"], int(data["trained_size"]))
+        except Exception as e:
+            print(f"Error loading ANN index from {path}: {e}")
+            return None
@@ -0,0 +1,359 @@
+import os, re, glob, math, threading
+import numpy as np
+from array import array
+from itertools import chain
+from collections import Counter
+from src.core.config import Config
+from typing import List, Dict, Any, Tuple, Optional, Collection
+from src.model.models import TextChunk
+
+TERM_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+TERM_SEPARATORS = re.compile(r"[-_./]")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it its of on or that the this to was "
+    "what when where which who why will with can do does my our we you your".split()
+)
+
+class BM25Index:
+    """In-process BM25 inverted index over chunk text.
+
+    Postings are per-term array('I') slot lists with array('H') term counts and
+    array('B') quantized impacts, the tf and length-normalised part of the BM25
+    weight, so a search only multiplies impacts by idf. Impacts use the average
+    chunk length at the time they were added and are refreshed by compact().
+
+    Every add() is persisted as one small segment file and deletes are logged,
+    so ingestion never rewrites the whole index; compact() folds the segments
+    and tombstones into a single segment.
+    """
+    def __init__(self, path: str = None, k1: float = None, b: float = None):
+        self.path = path or Config.BM25_INDEX_PATH
+        self.k1 = Config.BM25_K1 if k1 is None else k1
+        self.b = Config.BM25_B if b is None else b
+        self.deleted_file = os.path.join(self.path, "deleted.log")
+        self.lock = threading.RLock()
+        os.makedirs(self.path, exist_ok=True)
+        self._reset()
+        self._load()
+
+    def _reset(self) -> None:
+        self.vocab: Dict[str, int] = {}
+        self.slots: List[array] = []
+        self.tfs: List[array] = []
+        self.impacts: List[array] = []
+        self.chunk_ids: List[str] = []
+        self.document_ids: List[str] = []
+        self.document_slots: Dict[str, List[int]] = {}
+        self.lengths = np.zeros(0, dtype=np.uint32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.size = 0
+        self.live = 0
+        self.total_length = 0
+        self.next_segment = 0
+        self.segments = 0
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        """Lowercased terms; codes like "HR-204" or "v2.1" are kept whole and also split into parts"""
+        terms = []
+        for term in TERM_PATTERN.findall(text.lower()):
+            if term in STOPWORDS:
+                continue
+            terms.append(term)
+            if not term.isalnum():
+                terms.extend(part for part in TERM_SEPARATORS.split(term) if part and part not in STOPWORDS)
+        return terms
+
+    def _grow(self, needed: int) -> None:
+        if needed <= len(self.lengths):
+            return
+        capacity = max(needed, len(self.lengths) * 2, 1024)
+        lengths = np.zeros(capacity, dtype=np.uint32)
+        lengths[:self.size] = self.lengths[:self.size]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self.size] = self.alive[:self.size]
+        # Swapped in whole, so a search holding the old arrays still sees a consistent prefix
+        self.lengths, self.alive = lengths, alive
+
+    def _append(self, chunk_ids: List[str], document_ids: List[str], lengths: np.ndarray,
+                terms: List[str], offsets: np.ndarray, slots: np.ndarray, tfs: np.ndarray) -> None:
+        """Apply one segment; slots are relative to the current size"""
+        base = self.size
+        self._grow(base + len(chunk_ids))
+        self.lengths[base:base + len(chunk_ids)] = lengths
+        self.alive[base:base + len(chunk_ids)] = True
+        self.total_length += int(np.asarray(lengths, dtype=np.int64).sum())
+        impacts = self._impacts(tfs, np.asarray(lengths)[slots], self.total_length / max(self.live + len(chunk_ids), 1))
+        for i, term in enumerate(terms):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                term_id = self.vocab[term] = len(self.slots)
+                self.slots.append(array('I'))
+                self.tfs.append(array('H'))
+                self.impacts.append(array('B'))
+            self.slots[term_id].frombytes((slots[offsets[i]:offsets[i + 1]] + np.uint32(base)).astype(np.uint32).tobytes())
+            self.tfs[term_id].frombytes(tfs[offsets[i]:offsets[i + 1]].astype(np.uint16).tobytes())
+            self.impacts[term_id].frombytes(impacts[offsets[i]:offsets[i + 1]].tobytes())
+        self.chunk_ids.extend(chunk_ids)
+        self.document_ids.extend(document_ids)
+        for offset, document_id in enumerate(document_ids):
+            self.document_slots.setdefault(document_id, []).append(base + offset)
+        self.size += len(chunk_ids)
+        self.live += len(chunk_ids)
+
+    def _impacts(self, tfs: np.ndarray, lengths: np.ndarray, average_length: float) -> np.ndarray:
+        """BM25 tf saturation per posting, quantized to 0..255 over its range [0, k1 + 1)"""
+        tfs = tfs.astype(np.float32)
+        norm = self.k1 * (1.0 - self.b + self.b * lengths / max(average_length, 1.0))
+        weights = tfs * (self.k1 + 1.0) / (tfs + norm)
+        return np.clip(np.rint(weights * (255.0 / (self.k1 + 1.0))), 1, 255).astype(np.uint8)
+
+    @staticmethod
+    def _invert(texts: List[str]) -> Tuple[np.ndarray, List[str], np.ndarray, np.ndarray, np.ndarray]:
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        lengths = np.zeros(len(texts), dtype=np.uint32)
+        for slot, text in enumerate(texts):
+            counts = Counter(BM25Index.tokenize(text))
+            lengths[slot] = sum(counts.values())
+            for term, count in counts.items():
+                entry = postings.setdefault(term, ([], []))
+                entry[0].append(slot)
+                entry[1].append(min(count, 65535))
+        terms = list(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[term][0]) for term in terms])
+        slots = np.fromiter((s for term in terms for s in postings[term][0]), dtype=np.uint32, count=int(offsets[-1]))
+        tfs = np.fromiter((t for term in terms for t in postings[term][1]), dtype=np.uint16, count=int(offsets[-1]))
+        return lengths, terms, offsets, slots, tfs
+
+    def _segment_file(self, number: int) -> str:
+        return os.path.join(self.path, f"segment-{number:08d}.npz")
+
+    def _write_segment(self, chunk_ids: List[str], document_ids: List[str], lengths: np.ndarray, terms: List[str],
+                       offsets: np.ndarray, slots: np.ndarray, tfs: np.ndarray, compacted: bool = False) -> None:
+        number = self.next_segment
+        tmp = self._segment_file(number) + ".tmp.npz"
+        np.savez(tmp, chunk_ids=np.array(chunk_ids, dtype=str), document_ids=np.array(document_ids, dtype=str),
+                 lengths=lengths, terms=np.array(terms, dtype=str), offsets=offsets, slots=slots, tfs=tfs,
+                 compacted=np.bool_(compacted))
+        os.replace(tmp, self._segment_file(number))
+        self.next_segment += 1
+        self.segments += 1
+
+    def _load(self) -> None:
+        numbered = sorted(
+            (int(os.path.basename(f)[8:16]), f) for f in glob.glob(os.path.join(self.path, "segment-*.npz"))
+            if not f.endswith(".tmp.npz")
+        )
+        segments = []
+        for number, file in numbered:
+            try:
+                with np.load(file) as data:
+                    segment = {key: data[key] for key in data.files}
+            except Exception as e:
+                print(f"Error loading BM25 segment {file}: {e}")
+                continue
+            if bool(segment["compacted"]):
+                # A compacted segment supersedes everything before it
+                segments = []
+            segments.append((number, segment))
+        first = segments[0][0] if segments else 0
+        deletions = []
+        if os.path.exists(self.deleted_file):
+            with open(self.deleted_file, 'r') as f:
+                for line in f:
+                    parts = line.rstrip("\n").split("\t")
+                    if len(parts) == 3 and int(parts[0]) >= first:
+                        deletions.append((int(parts[0]), int(parts[1]), parts[2]))
+        for number, segment in segments:
+            self._append(segment["chunk_ids"].tolist(), segment["document_ids"].tolist(), segment["lengths"],
+                         segment["terms"].tolist(), segment["offsets"], segment["slots"], segment["tfs"])
+            self.next_segment = number + 1
+        self.segments = len(segments)
+        for _, slot_limit, document_id in deletions:
+            self._tombstone(document_id, slot_limit)
+
+    def add(self, chunks: List[TextChunk]) -> None:
+        if not chunks:
+            return
+        lengths, terms, offsets, slots, tfs = self._invert([chunk.get_text() for chunk in chunks])
+        chunk_ids = [chunk.get_id() for chunk in chunks]
+        document_ids = [chunk.get_document_id() for chunk in chunks]
+        with self.lock:
+            self._write_segment(chunk_ids, document_ids, lengths, terms, offsets, slots, tfs)
+            self._append(chunk_ids, document_ids, lengths, terms, offsets, slots, tfs)
+            if self.segments > Config.BM25_MAX_SEGMENTS:
+                self.compact()
+
+    def _tombstone(self, document_id: str, slot_limit: int) -> int:
+        slots = [slot for slot in self.document_slots.pop(document_id, []) if slot < slot_limit]
+        slots = [slot for slot in slots if self.alive[slot]]
+        if slots:
+            self.alive[slots] = False
+            self.live -= len(slots)
+            self.total_length -= int(self.lengths[slots].astype(np.int64).sum())
+        return len(slots)
+
+    def remove_document(self, document_id: str) -> None:
+        with self.lock:
+            if not self._tombstone(document_id, self.size):
+                return
+            with open(self.deleted_file, 'a') as f:
+                f.write(f"{self.next_segment - 1}\t{self.size}\t{document_id}\n")
+            if self.size and (self.size - self.live) / self.size > Config.BM25_COMPACT_RATIO:
+                self.compact()
+
+    def compact(self) -> None:
+        """Rewrite all live postings as one segment and drop the older segments and delete log"""
+        with self.lock:
+            live = np.flatnonzero(self.alive[:self.size])
+            renumber = np.full(self.size, -1, dtype=np.int64)
+            renumber[live] = np.arange(len(live))
+            terms, offsets, slot_parts, tf_parts = [], [0], [], []
+            for term, term_id in self.vocab.items():
+                slots = np.array(self.slots[term_id], dtype=np.int64)
+                keep = renumber[slots] >= 0 if len(slots) else np.zeros(0, dtype=bool)
+                if not keep.any():
+                    continue
+                terms.append(term)
+                slot_parts.append(renumber[slots[keep]].astype(np.uint32))
+                tf_parts.append(np.array(self.tfs[term_id], dtype=np.uint16)[keep])
+                offsets.append(offsets[-1] + int(keep.sum()))
+            chunk_ids = [self.chunk_ids[slot] for slot in live]
+            document_ids = [self.document_ids[slot] for slot in live]
+            lengths = self.lengths[live].copy()
+            slots = np.concatenate(slot_parts) if slot_parts else np.zeros(0, dtype=np.uint32)
+            tfs = np.concatenate(tf_parts) if tf_parts else np.zeros(0, dtype=np.uint16)
+            offsets = np.asarray(offsets, dtype=np.int64)
+            old = glob.glob(os.path.join(self.path, "segment-*.npz"))
+            self._write_segment(chunk_ids, document_ids, lengths, terms, offsets, slots, tfs, compacted=True)
+            for file in old:
+                if os.path.exists(file):
+                    os.remove(file)
+            if os.path.exists(self.deleted_file):
+                os.remove(self.deleted_file)
+            next_segment = self.next_segment
+            self._reset()
+            self._append(chunk_ids, document_ids, lengths, terms, offsets, slots, tfs)
+            self.next_segment, self.segments = next_segment, 1
+
+    def clear(self) -> None:
+        with self.lock:
+            for file in glob.glob(os.path.join(self.path, "segment-*")) + [self.deleted_file]:
+                if os.path.exists(file):
+                    os.remove(file)
+            self._reset()
+
+    def search(self, query_text: str, limit: int = 20, document_ids: Optional[Collection[str]] = None,
+               exclude_document_ids: Optional[Collection[str]] = None) -> List[Tuple[str, float]]:
+        """Top chunk ids by BM25 score, best first.
+
+        document_ids restricts the search to those documents;
+        exclude_document_ids leaves a few out, dropping their postings after
+        scoring rather than scoping the search to everything else.
+        """
+        if document_ids is not None:
+            if exclude_document_ids:
+                document_ids = set(document_ids).difference(exclude_document_ids)
+            return self._search_scoped(query_text, limit, document_ids)
+        results, pruned = self._search_all(query_text, limit, exclude_document_ids)
+        if pruned and exclude_document_ids and len(results) < limit:
+            # The selective terms kept may occur mostly in the hidden documents
+            results, _ = self._search_all(query_text, limit, exclude_document_ids, prune=False)
+        return results
+
+    def _search_all(self, query_text: str, limit: int, exclude_document_ids: Optional[Collection[str]] = None,
+                    prune: bool = True) -> Tuple[List[Tuple[str, float]], bool]:
+        """Unscoped search; also returns whether common query terms were left out"""
+        query_terms = Counter(self.tokenize(query_text))
+        with self.lock:
+            hidden = self._document_slots(exclude_document_ids) if exclude_document_ids else None
+            term_ids = [(self.vocab[term], count) for term, count in query_terms.items() if term in self.vocab]
+            # Terms in most chunks barely move the ranking but dominate the cost; drop them
+            # unless nothing more selective was asked for
+            common = Config.BM25_MAX_DF_RATIO * max(self.live, 1)
+            selective = [(term_id, count) for term_id, count in term_ids if len(self.slots[term_id]) <= common] if prune else []
+            # Copy the few postings lists needed; appends must not race a numpy view of the arrays
+            postings = [
+                (count, np.array(self.slots[term_id], dtype=np.uint32), np.array(self.impacts[term_id], dtype=np.uint8))
+                for term_id, count in (selective or term_ids)
+            ]
+            size, live, alive, chunk_ids = self.size, self.live, self.alive, self.chunk_ids
+        pruned = 0 < len(selective) < len(term_ids)
+        if not postings or not live:
+            return [], pruned
+        scale = (self.k1 + 1.0) / 255.0
+        slot_parts, weight_parts = [], []
+        for count, slots, impacts in postings:
+            document_frequency = len(slots)
+            idf = math.log(1.0 + (live - document_frequency + 0.5) / (document_frequency + 0.5))
+            slot_parts.append(slots)
+            weight_parts.append(impacts * np.float32(count * idf * scale))
+        scores = np.bincount(np.concatenate(slot_parts), np.concatenate(weight_parts), minlength=size)
+        if hidden is not None:
+            scores[hidden[hidden < size]] = 0.0
+        # Scanning every slot for non-zero scores costs more than scoring itself. The limit-th
+        # best score among the rarest term's chunks is a floor for the true top hits, so only
+        # slots at or above it need to be ranked.
+        floor = 0.0
+        sample = min(slot_parts, key=len)
+        sample = sample[alive[sample]]
+        if len(sample) >= limit:
+            floor = np.partition(scores[sample], len(sample) - limit)[len(sample) - limit]
+        candidates = np.flatnonzero(scores >= floor) if floor > 0 else np.flatnonzero(scores)
+        candidates = candidates[alive[candidates]]
+        if not len(candidates):
+            return [], pruned
+        k = min(limit, len(candidates))
+        top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [(chunk_ids[slot], float(scores[slot])) for slot in top], pruned
+
+    def _search_scoped(self, query_text: str, limit: int, document_ids: Collection[str]) -> List[Tuple[str, float]]:
+        """BM25 over the slots of a few documents: each posting list is probed by binary search for those
+        slots instead of being scanned, so the cost follows the scope rather than the corpus"""
+        query_terms = Counter(self.tokenize(query_text))
+        with self.lock:
+            scope = self._document_slots(document_ids)
+            scope = np.sort(scope[self.alive[scope]]) if len(scope) else scope
+            live, chunk_ids = self.live, self.chunk_ids
+            if not len(scope) or not live:
+                return []
+            scores = np.zeros(len(scope), dtype=np.float32)
+            scale = (self.k1 + 1.0) / 255.0
+            for term, count in query_terms.items():
+                term_id = self.vocab.get(term)
+                if term_id is None or not len(self.slots[term_id]):
+                    continue
+                # Views rather than copies; released before the lock is, so appends never see them
+                slots = np.frombuffer(self.slots[term_id], dtype=np.uint32)
+                impacts = np.frombuffer(self.impacts[term_id], dtype=np.uint8)
+                # Posting lists are in ascending slot order
+                positions = np.minimum(np.searchsorted(slots, scope), len(slots) - 1)
+                hits = slots[positions] == scope
+                document_frequency = len(slots)
+                idf = math.log(1.0 + (live - document_frequency + 0.5) / (document_frequency + 0.5))
+                scores[hits] += impacts[positions[hits]] * np.float32(count * idf * scale)
+                del slots, impacts
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        k = min(limit, len(matched))
+        top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [(chunk_ids[scope[i]], float(scores[i])) for i in top]
+
+    def _document_slots(self, document_ids: Collection[str]) -> np.ndarray:
+        """Slots of the given documents, live or not (caller holds the lock)"""
+        return np.fromiter(
+            chain.from_iterable(self.document_slots.get(document_id, ()) for document_id in document_ids), dtype=np.int64
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "chunks": self.live,
+                "tombstoned": self.size - self.live,
+                "terms": len(self.vocab),
+                "segments": self.segments
+            }
@@ -0,0 +1,479 @@
+import os, json, uuid, sqlite3, threading
+import numpy as np
+from itertools import chain
+from src.core.config import Config
+from src.core.metrics import metrics
+from typing import List, Dict, Any, Optional, Collection
+from src.vectordb.ann_index import IVFIndex
+from src.vectordb.vector_database import VectorDatabase
+from src.model.models import VectorEmbedding, TextChunk, ChunkBatch
+
+class NumpyVectorDatabase(VectorDatabase):
+    """In-process search over one memory-mapped float32 matrix of unit-length rows.
+
+    Chunk text and metadata live in a SQLite side table keyed by vector id.
+    Deletes only tombstone rows; the matrix is compacted once the share of dead
+    rows passes NUMPY_COMPACT_RATIO. Search is exact until ANN_MIN_VECTORS rows
+    are live, after which an IVF index limits each query to the ANN_NPROBE
+    nearest buckets.
+    """
+    def __init__(self, path: str = None):
+        self.path = path or Config.NUMPY_INDEX_PATH
+        os.makedirs(self.path, exist_ok=True)
+        self.header_file = os.path.join(self.path, "index.json")
+        self.matrix_file = os.path.join(self.path, "vectors.f32")
+        self.compact_file = self.matrix_file + ".compact"
+        self.ann_file = os.path.join(self.path, "ivf.npz")
+        self.nprobe = Config.ANN_NPROBE
+        self.lock = threading.RLock()
+        self.local = threading.local()
+        with self._db() as db:
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS chunks (
+                    id TEXT PRIMARY KEY,
+                    row INTEGER NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    document_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    page INTEGER,
+                    text TEXT NOT NULL
+                )
+            ''')
+            db.execute('CREATE INDEX IF NOT EXISTS idx_chunks_document ON chunks (document_id)')
+            db.execute('CREATE INDEX IF NOT EXISTS idx_chunks_chunk ON chunks (chunk_id)')
+            db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self._finish_compaction()
+        self._load()
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.path, "chunks.db"), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def _load(self) -> None:
+        header = {"dim": 0, "count": 0, "capacity": 0}
+        if os.path.exists(self.header_file):
+            with open(self.header_file, 'r') as f:
+                header.update(json.load(f))
+        self.dim, self.count, self.capacity = header["dim"], header["count"], header["capacity"]
+        self.matrix = None
+        if self.capacity and os.path.exists(self.matrix_file):
+            self.matrix = np.memmap(self.matrix_file, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+        self.alive = np.zeros(self.capacity, dtype=bool)
+        self.row_ids: List[Optional[str]] = [None] * self.count
+        self.document_rows: Dict[str, List[int]] = {}
+        for vector_id, row, document_id in self._db().execute('SELECT id, row, document_id FROM chunks'):
+            if row < self.count:
+                self.alive[row] = True
+                self.row_ids[row] = vector_id
+                self.document_rows.setdefault(document_id, []).append(row)
+        self.ann = IVFIndex.load(self.ann_file) if Config.ANN_ENABLED else None
+        if self.ann is not None and (self.ann.size != self.count or self.ann.centroids.shape[1] != self.dim):
+            print("ANN index is out of date with the vector matrix; rebuilding")
+            self.ann = None
+        self.ann_dirty = False
+        self._maybe_train()
+
+    def _save_header(self) -> None:
+        self._write_header({"dim": self.dim, "count": self.count, "capacity": self.capacity})
+
+    def _write_header(self, header: Dict[str, int]) -> None:
+        tmp = self.header_file + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(header, f)
+        os.replace(tmp, self.header_file)
+
+    def _finish_compaction(self) -> None:
+        """Complete or discard a compaction that a crash interrupted.
+
+        compact() commits the renumbered rows together with a marker holding
+        the header of the compacted matrix. With the marker present, the
+        rows are already renumbered, so the swap is rolled forward. Without
+        it, the old matrix still matches the rows and the new file is dropped.
+        """
+        marker = self._db().execute("SELECT value FROM meta WHERE key = 'compaction'").fetchone()
+        if marker is None:
+            if os.path.exists(self.compact_file):
+                os.remove(self.compact_file)
+            return
+        print("Finishing an interrupted compaction of the NumPy index")
+        if os.path.exists(self.compact_file):
+            os.replace(self.compact_file, self.matrix_file)
+        self._write_header(json.loads(marker[0]))
+        with self._db() as db:
+            db.execute("DELETE FROM meta WHERE key = 'compaction'")
+
+    def _ensure_capacity(self, needed: int) -> None:
+        if needed <= self.capacity:
+            return
+        capacity = max(needed, self.capacity * 2, 1024)
+        tmp = self.matrix_file + ".tmp"
+        grown = np.memmap(tmp, dtype=np.float32, mode="w+", shape=(capacity, self.dim))
+        if self.matrix is not None and self.count:
+            grown[:self.count] = self.matrix[:self.count]
+        grown.flush()
+        os.replace(tmp, self.matrix_file)
+        self.matrix = grown
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self.capacity] = self.alive
+        self.alive = alive
+        self.capacity = capacity
+
+    def _live_rows(self) -> np.ndarray:
+        return np.flatnonzero(self.alive[:self.count])
+
+    def _maybe_train(self) -> None:
+        """(Re)train the IVF index when the corpus crosses the size threshold or outgrows it"""
+        if not Config.ANN_ENABLED or self.matrix is None:
+            return
+        live = int(self.alive[:self.count].sum())
+        if live < Config.ANN_MIN_VECTORS:
+            return
+        if self.ann is not None and not self.ann.needs_retrain(live, Config.ANN_RETRAIN_GROWTH):
+            return
+        self.train_ann()
+
+    def train_ann(self, nlist: int = None) -> None:
+        with self.lock:
+            self.ann = IVFIndex.train(self.matrix, self._live_rows(), self.count, nlist=nlist or Config.ANN_NLIST or None)
+            self.ann.save(self.ann_file)
+            self.ann_dirty = False
+            print(f"Trained IVF index with {self.ann.nlist} lists over {self.ann.trained_size} vectors")
+
+    def _drop_ann(self) -> None:
+        self.ann = None
+        if os.path.exists(self.ann_file):
+            os.remove(self.ann_file)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def store(self, embedding: VectorEmbedding, text_chunk: TextChunk) -> None:
+        self.store_many([embedding], [text_chunk])
+
+    def store_many(self, embeddings: List[VectorEmbedding], text_chunks: List[TextChunk], batch_size: int = None) -> None:
+        if len(embeddings) != len(text_chunks):
+            raise ValueError(f"Got {len(embeddings)} embeddings for {len(text_chunks)} chunks")
+        if not embeddings:
+            return
+        vectors = np.stack([e.get_vector() for e in embeddings])
+        self.store_batch(ChunkBatch.from_chunks(text_chunks, vectors), [e.get_id() for e in embeddings])
+
+    def store_batch(self, batch: ChunkBatch, vector_ids: Optional[List[str]] = None, batch_size: int = None) -> None:
+        if batch.vectors is None:
+            raise ValueError("ChunkBatch has no vectors")
+        if not len(batch):
+            return
+        vector_ids = vector_ids or [str(uuid.uuid4()) for _ in range(len(batch))]
+        vectors = self._normalize(batch.vectors)
+        with self.lock:
+            if not self.dim:
+                self.dim = vectors.shape[1]
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+            start = self.count
+            self._ensure_capacity(start + len(vectors))
+            self.matrix[start:start + len(vectors)] = vectors
+            self.matrix.flush()
+            rows = range(start, start + len(vectors))
+            replaced = self._rows_for_ids(vector_ids)
+            if replaced:
+                # Upserted ids move to new rows; the old rows must not match any more
+                self.alive[replaced] = False
+                if self.ann is not None:
+                    self.ann.remove(replaced)
+            with self._db() as db:
+                db.executemany(
+                    'INSERT OR REPLACE INTO chunks (id, row, chunk_id, document_id, position, page, text) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    [(vector_id, row, batch.ids[i], batch.document_ids[i], batch.positions[i], batch.page(i), batch.texts[i])
+                     for i, (vector_id, row) in enumerate(zip(vector_ids, rows))]
+                )
+            self.count = start + len(vectors)
+            self.alive[start:self.count] = True
+            self.row_ids.extend(vector_ids)
+            for document_id, row in zip(batch.document_ids, rows):
+                self.document_rows.setdefault(document_id, []).append(row)
+            self._save_header()
+            if self.ann is not None:
+                # Saved by flush() once the document is complete; rewriting the whole index per batch
+                # makes ingesting a large document quadratic. A crash in between only costs a retrain
+                # on the next start, since a saved index that no longer matches the matrix is rebuilt.
+                self.ann.add(self.matrix, np.arange(start, self.count))
+                self.ann_dirty = True
+            self._maybe_train()
+
+    def flush(self) -> None:
+        with self.lock:
+            if self.ann is not None and self.ann_dirty:
+                self.ann.save(self.ann_file)
+                self.ann_dirty = False
+
+    def close(self) -> None:
+        self.flush()
+
+    def _scope_rows(self, document_ids: Collection[str]) -> np.ndarray:
+        """Live rows of the given documents, from the in-memory document -> rows index (caller holds the lock)"""
+        rows = np.fromiter(
+            chain.from_iterable(self.document_rows.get(document_id, ()) for document_id in document_ids), dtype=np.int64
+        )
+        return rows[self.alive[rows]] if len(rows) else rows
+
+    @staticmethod
+    def _scores(matrix: np.ndarray, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Scores of the given rows; mostly-consecutive rows (a document's chunks) are scored in place, not gathered"""
+        breaks = np.flatnonzero(np.diff(rows) != 1) + 1
+        if len(breaks) * 64 > len(rows):
+            return matrix[rows] @ query
+        bounds = zip(np.concatenate(([0], breaks)), np.concatenate((breaks, [len(rows)])))
+        return np.concatenate([matrix[rows[start]:rows[end - 1] + 1] @ query for start, end in bounds])
+
+    @classmethod
+    def _rank(cls, matrix: np.ndarray, rows: np.ndarray, query: np.ndarray, limit: int):
+        """Best limit of the given rows by score, best first"""
+        scores = cls._scores(matrix, rows, query)
+        k = min(limit, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return rows[top], scores[top]
+
+    def _visible(self, document_ids: Optional[Collection[str]], exclude_document_ids: Optional[Collection[str]]):
+        """(scope rows or None, hidden rows or None) for a query (caller holds the lock)
+
+        Excluded documents are dropped from a scope before it is gathered;
+        an unscoped query instead masks their rows, so a few hidden
+        documents never turn it into a scan of everything else.
+        """
+        if document_ids is not None:
+            if exclude_document_ids:
+                document_ids = set(document_ids).difference(exclude_document_ids)
+            return self._scope_rows(document_ids), None
+        hidden = self._scope_rows(exclude_document_ids) if exclude_document_ids else None
+        return None, hidden if hidden is not None and len(hidden) else None
+
+    def _top_rows(self, query: np.ndarray, limit: int, nprobe: int = None, document_ids: Optional[Collection[str]] = None,
+                  exclude_document_ids: Optional[Collection[str]] = None):
+        """Top-k over live rows, or over the rows of document_ids; returns (rows, scores, row_ids) from one snapshot"""
+        with self.lock:
+            if not self.count or self.matrix is None:
+                return [], [], []
+            matrix, alive, row_ids, count = self.matrix, self.alive, self.row_ids, self.count
+            scope, hidden = self._visible(document_ids, exclude_document_ids)
+            # A scope below the ANN threshold is cheaper to scan exactly than to probe
+            use_ann = self.ann is not None and (scope is None or len(scope) >= Config.ANN_MIN_VECTORS)
+            candidates = self.ann.candidates(query, nprobe or self.nprobe) if use_ann else None
+        if candidates is not None:
+            candidates = candidates[alive[candidates]]
+            if scope is not None:
+                candidates = candidates[np.isin(candidates, scope)]
+            if hidden is not None:
+                candidates = candidates[~np.isin(candidates, hidden)]
+            # Too few live rows in the probed buckets; fall back to exact search
+            if len(candidates) >= limit:
+                return self._rank(matrix, candidates, query, limit) + (row_ids,)
+        if scope is not None:
+            if not len(scope):
+                return [], [], []
+            return self._rank(matrix, scope, query, limit) + (row_ids,)
+        scores = matrix[:count] @ query
+        scores[~alive[:count]] = -np.inf
+        k = min(limit, int(alive[:count].sum()))
+        if hidden is not None:
+            scores[hidden] = -np.inf
+            k = min(k, int(alive[:count].sum()) - len(hidden))
+        if k <= 0:
+            return [], [], []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top, scores[top], row_ids
+
+    def find_similar(self, embedding: VectorEmbedding, limit: int = 5, document_ids: Optional[Collection[str]] = None,
+                     exclude_document_ids: Optional[Collection[str]] = None, nprobe: int = None) -> List[Dict[str, Any]]:
+        query = self._normalize(np.asarray(embedding.get_vector(), dtype=np.float32))
+        if self.dim and query.shape[0] != self.dim:
+            print(f"Query has {query.shape[0]} dimensions, index has {self.dim}")
+            return []
+        with metrics.span("vector_query"):
+            rows, scores, row_ids = self._top_rows(query, limit, nprobe, document_ids, exclude_document_ids)
+        ids = [row_ids[row] for row in rows]
+        chunks = self._chunks_by_ids(ids)
+        return [
+            {"chunk": chunks[vector_id], "score": float(score)}
+            for vector_id, score in zip(ids, scores) if vector_id in chunks
+        ]
+
+    def find_similar_many(self, embeddings: List[VectorEmbedding], limit: int = 5, document_ids: Optional[Collection[str]] = None,
+                          exclude_document_ids: Optional[Collection[str]] = None, block: int = 64) -> List[List[Dict[str, Any]]]:
+        """Exact search scores blocks of queries with one matrix product each"""
+        if not embeddings:
+            return []
+        queries = self._normalize(np.asarray([e.get_vector() for e in embeddings], dtype=np.float32))
+        with self.lock:
+            if not self.count or self.matrix is None or queries.shape[1] != self.dim:
+                return [[] for _ in embeddings]
+            scope, hidden = self._visible(document_ids, exclude_document_ids)
+            exact = self.ann is None or (scope is not None and len(scope) < Config.ANN_MIN_VECTORS)
+            matrix, alive, row_ids, count = self.matrix, self.alive, self.row_ids, self.count
+        if not exact:
+            return [self.find_similar(embedding, limit, document_ids, exclude_document_ids) for embedding in embeddings]
+        if scope is None:
+            candidates, dead = matrix[:count], ~alive[:count]
+            if hidden is not None:
+                dead[hidden] = True
+            k = min(limit, count - int(dead.sum()))
+        else:
+            # Gathered once for the whole batch; scoring then costs the scope, not the corpus
+            candidates, dead = matrix[scope], None
+            k = min(limit, len(scope))
+        if k <= 0:
+            return [[] for _ in embeddings]
+        top_rows, top_scores = [], []
+        for start in range(0, len(queries), block):
+            scores = queries[start:start + block] @ candidates.T
+            if dead is not None:
+                scores[:, dead] = -np.inf
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_score = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_score, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_rows.extend(top if scope is None else scope[top])
+            top_scores.extend(np.take_along_axis(top_score, order, axis=1))
+        ids = [[row_ids[row] for row in rows] for rows in top_rows]
+        chunks = self._chunks_by_ids(list({vector_id for row in ids for vector_id in row}))
+        return [
+            [{"chunk": chunks[vector_id], "score": float(score)} for vector_id, score in zip(row, scores) if vector_id in chunks]
+            for row, scores in zip(ids, top_scores)
+        ]
+
+    def _rows_for_ids(self, ids: List[str], batch: int = 500) -> List[int]:
+        rows = []
+        for start in range(0, len(ids), batch):
+            part = ids[start:start + batch]
+            placeholders = ",".join("?" * len(part))
+            rows.extend(row for (row,) in self._db().execute(f'SELECT row FROM chunks WHERE id IN ({placeholders})', part))
+        return rows
+
+    def _chunks_by_ids(self, ids: List[str], batch: int = 500) -> Dict[str, TextChunk]:
+        chunks = {}
+        for start in range(0, len(ids), batch):
+            part = ids[start:start + batch]
+            placeholders = ",".join("?" * len(part))
+            rows = self._db().execute(
+                f'SELECT id, chunk_id, document_id, position, page, text FROM chunks WHERE id IN ({placeholders})', part
+            )
+            chunks.update((row[0], self._to_chunk(row[1:])) for row in rows)
+        return chunks
+
+    @staticmethod
+    def _to_chunk(row) -> TextChunk:
+        chunk_id, document_id, position, page, text = row
+        chunk = TextChunk(text=text, document_id=document_id, position=position, page=page)
+        chunk.id = chunk_id
+        return chunk
+
+    def get_chunk(self, chunk_id: str) -> Optional[TextChunk]:
+        row = self._db().execute(
+            'SELECT chunk_id, document_id, position, page, text FROM chunks WHERE chunk_id = ? OR id = ? LIMIT 1',
+            (chunk_id, chunk_id)
+        ).fetchone()
+        return self._to_chunk(row) if row else None
+
+    def get_chunks(self, chunk_ids: List[str], batch: int = 500) -> Dict[str, TextChunk]:
+        chunks = {}
+        for start in range(0, len(chunk_ids), batch):
+            part = chunk_ids[start:start + batch]
+            placeholders = ",".join("?" * len(part))
+            rows = self._db().execute(
+                f'SELECT chunk_id, document_id, position, page, text FROM chunks WHERE chunk_id IN ({placeholders})', part
+            )
+            chunks.update((row[0], self._to_chunk(row)) for row in rows)
+        return chunks
+
+    def get_document_embeddings(self, document_id: str) -> Dict[str, np.ndarray]:
+        with self.lock:
+            rows = self._db().execute('SELECT row, text FROM chunks WHERE document_id = ?', (document_id,)).fetchall()
+            if not rows or self.matrix is None:
+                return {}
+            vectors = np.array(self.matrix[[row for row, _ in rows]])
+        return {TextChunk.hash_text(text): vector for (_, text), vector in zip(rows, vectors)}
+
+    def document_ids(self) -> List[str]:
+        return [document_id for (document_id,) in self._db().execute('SELECT DISTINCT document_id FROM chunks')]
+
+    def get_document_batch(self, document_id: str) -> Optional[ChunkBatch]:
+        with self.lock:
+            rows = self._db().execute(
+                'SELECT row, chunk_id, document_id, position, page, text FROM chunks WHERE document_id = ? ORDER BY position',
+                (document_id,)
+            ).fetchall()
+            if not rows or self.matrix is None:
+                return None
+            vectors = np.array(self.matrix[[row[0] for row in rows]])
+        return ChunkBatch.from_chunks([self._to_chunk(row[1:]) for row in rows], vectors)
+
+    def clear(self) -> None:
+        with self.lock:
+            with self._db() as db:
+                db.execute('DELETE FROM chunks')
+            self.matrix = None
+            for path in (self.matrix_file, self.header_file, self.ann_file):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._load()
+
+    def delete_document_data(self, document_id: str) -> None:
+        with self.lock:
+            rows = self.document_rows.pop(document_id, [])
+            with self._db() as db:
+                db.execute('DELETE FROM chunks WHERE document_id = ?', (document_id,))
+            if rows:
+                self.alive[rows] = False
+                if self.ann is not None:
+                    self.ann.remove(rows)
+                    self.ann.save(self.ann_file)
+                    self.ann_dirty = False
+            dead = self.count - int(self.alive[:self.count].sum())
+            if self.count and dead / self.count > Config.NUMPY_COMPACT_RATIO:
+                self.compact()
+        print(f"Deleted data for document_id: {document_id} from the NumPy index.")
+
+    def compact(self) -> None:
+        """Rewrite the matrix without tombstoned rows and renumber the side table"""
+        with self.lock:
+            live = np.flatnonzero(self.alive[:self.count])
+            capacity = max(len(live) * 2, 1024)
+            compacted = np.memmap(self.compact_file, dtype=np.float32, mode="w+", shape=(capacity, self.dim or 1))
+            if len(live):
+                compacted[:len(live)] = self.matrix[live]
+            compacted.flush()
+            row_ids = [self.row_ids[row] for row in live]
+            header = {"dim": self.dim, "count": len(live), "capacity": capacity}
+            # The marker commits with the new row numbers, so a crash before the
+            # swap below is finished by _finish_compaction on the next start
+            with self._db() as db:
+                db.executemany('UPDATE chunks SET row = ? WHERE id = ?', list(enumerate(row_ids)))
+                db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('compaction', ?)", (json.dumps(header),))
+            os.replace(self.compact_file, self.matrix_file)
+            self.matrix, self.capacity, self.count = compacted, capacity, len(live)
+            self.alive = np.zeros(capacity, dtype=bool)
+            self.alive[:self.count] = True
+            self.row_ids = row_ids
+            self.document_rows = {}
+            for vector_id, row, document_id in self._db().execute('SELECT id, row, document_id FROM chunks'):
+                self.document_rows.setdefault(document_id, []).append(row)
+            self._save_header()
+            with self._db() as db:
+                db.execute("DELETE FROM meta WHERE key = 'compaction'")
+            if self.ann is not None:
+                if self.count < Config.ANN_MIN_VECTORS:
+                    self._drop_ann()
+                else:
+                    self.ann.remap(live)
+                    self.ann.save(self.ann_file)
+                    self.ann_dirty = False
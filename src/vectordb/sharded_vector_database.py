@@ -0,0 +1,420 @@
+import os, json, heapq, hashlib, threading, multiprocessing
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from src.core.config import Config
+from src.core.metrics import metrics
+from typing import List, Dict, Any, Optional, Callable, Collection
+from src.vectordb.vector_database import VectorDatabase
+from src.model.models import VectorEmbedding, TextChunk, ChunkBatch
+
+MANIFEST_FILE = "shards.json"
+
+def shard_owner(document_id: str, shards: int) -> int:
+    """Rendezvous hashing: the shard scoring highest for (shard, document id) owns the document.
+
+    Going from N to N + 1 shards only moves the documents the new shard wins,
+    about 1 / (N + 1) of them, where hash % N would move nearly all of them.
+    """
+    return max(
+        range(shards),
+        key=lambda shard: hashlib.blake2b(f"{shard}:{document_id}".encode("utf-8"), digest_size=8).digest()
+    )
+
+def shard_path(base: str, index: int) -> str:
+    # Shard 0 is the unsharded location, so an existing store becomes shard 0 and is rebalanced from there
+    return base if index == 0 else os.path.join(base, f"shard_{index}")
+
+def open_shard(backend: str, path: str) -> VectorDatabase:
+    if backend == "numpy":
+        from src.vectordb.numpy_vector_database import NumpyVectorDatabase
+        return NumpyVectorDatabase(path)
+    from src.vectordb.vector_database import ChromaDBVectorDatabase
+    return ChromaDBVectorDatabase(path)
+
+def _serve(connection, backend: str, path: str) -> None:
+    """Worker process: open the shard, then answer (method, args, kwargs) requests until None arrives"""
+    try:
+        shard = open_shard(backend, path)
+        connection.send(("ok", None))
+    except Exception as e:
+        connection.send(("error", RuntimeError(f"Could not open shard at {path}: {e}")))
+        return
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        method, args, kwargs = request
+        try:
+            reply = ("ok", getattr(shard, method)(*args, **kwargs))
+        except Exception as e:
+            reply = ("error", e)
+        try:
+            connection.send(reply)
+        except Exception as e:
+            # Unpicklable result or exception
+            connection.send(("error", RuntimeError(f"{method} failed: {e}")))
+    close = getattr(shard, "close", None)
+    if close:
+        close()
+    connection.close()
+
+class ProcessShard(VectorDatabase):
+    """A shard opened in its own worker process, so searching it runs on another core.
+
+    Calls are forwarded over a pipe one at a time; ShardedVectorDatabase gets
+    its parallelism from calling different shards at once.
+    """
+    def __init__(self, backend: str, path: str):
+        context = multiprocessing.get_context("spawn")
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child, backend, path), daemon=True,
+                                       name=f"vector-shard-{os.path.basename(path)}")
+        self.process.start()
+        child.close()
+        self.lock = threading.Lock()
+        self._reply(self.connection.recv())
+
+    @staticmethod
+    def _reply(reply):
+        status, value = reply
+        if status == "error":
+            raise value
+        return value
+
+    def _call(self, method: str, *args, **kwargs):
+        with self.lock:
+            try:
+                self.connection.send((method, args, kwargs))
+                reply = self.connection.recv()
+            except (EOFError, OSError) as e:
+                raise RuntimeError(f"Shard process {self.process.name} is gone") from e
+        return self._reply(reply)
+
+    def store(self, embedding: VectorEmbedding, text_chunk: TextChunk) -> None:
+        self._call("store", embedding, text_chunk)
+
+    def store_many(self, embeddings: List[VectorEmbedding], text_chunks: List[TextChunk], batch_size: int = None) -> None:
+        self._call("store_many", embeddings, text_chunks, batch_size)
+
+    def store_batch(self, batch: ChunkBatch, vector_ids: Optional[List[str]] = None, batch_size: int = None) -> None:
+        self._call("store_batch", batch, vector_ids, batch_size)
+
+    def find_similar(self, embedding: VectorEmbedding, limit: int = 5, document_ids: Optional[Collection[str]] = None,
+                     exclude_document_ids: Optional[Collection[str]] = None, **kwargs) -> List[Dict[str, Any]]:
+        return self._call("find_similar", embedding, limit, document_ids, exclude_document_ids, **kwargs)
+
+    def find_similar_many(self, embeddings: List[VectorEmbedding], limit: int = 5, document_ids: Optional[Collection[str]] = None,
+                          exclude_document_ids: Optional[Collection[str]] = None) -> List[List[Dict[str, Any]]]:
+        return self._call("find_similar_many", embeddings, limit, document_ids, exclude_document_ids)
+
+    def get_chunk(self, chunk_id: str) -> Optional[TextChunk]:
+        return self._call("get_chunk", chunk_id)
+
+    def get_chunks(self, chunk_ids: List[str]) -> Dict[str, TextChunk]:
+        return self._call("get_chunks", chunk_ids)
+
+    def get_document_embeddings(self, document_id: str) -> Dict[str, np.ndarray]:
+        return self._call("get_document_embeddings", document_id)
+
+    def document_ids(self) -> List[str]:
+        return self._call("document_ids")
+
+    def get_document_batch(self, document_id: str) -> Optional[ChunkBatch]:
+        return self._call("get_document_batch", document_id)
+
+    def clear(self) -> None:
+        self._call("clear")
+
+    def delete_document_data(self, document_id: str) -> None:
+        self._call("delete_document_data", document_id)
+
+    def flush(self) -> None:
+        self._call("flush")
+
+    def close(self) -> None:
+        with self.lock:
+            try:
+                self.connection.send(None)
+            except (EOFError, OSError):
+                pass
+            self.process.join(timeout=10)
+            if self.process.is_alive():
+                self.process.terminate()
+            self.connection.close()
+
+class ShardedVectorDatabase(VectorDatabase):
+    """Chunks partitioned by document id across several vector stores and searched scatter-gather.
+
+    A document lives whole on the shard picked by rendezvous hashing, so
+    stores, revision reuse and deletes touch one shard, while a search asks
+    every shard for its top-k in parallel and merges them by score. The
+    shard count is recorded in shards.json next to shard 0; changing it
+    moves documents to their new owners on a background thread, during
+    which searches still see every document exactly once.
+    """
+    def __init__(self, factory: Callable[[int], VectorDatabase], shards: int, manifest_path: Optional[str] = None):
+        self.factory = factory
+        self.manifest_path = manifest_path
+        self.lock = threading.RLock()
+        self.move_lock = threading.Lock()
+        self.rebalance_thread: Optional[threading.Thread] = None
+        self.stopping = threading.Event()
+        layout = self._read_manifest()
+        self.layout = layout["shards"]
+        self.target: Optional[int] = layout.get("target")
+        self.shards: List[VectorDatabase] = []
+        self.executor: Optional[ThreadPoolExecutor] = None
+        shards = max(1, shards)
+        # An interrupted rebalance may have left documents on any shard up to the old target
+        self._open(max(self.layout, self.target or 0, shards))
+        if self.target is not None or shards != self.layout:
+            self.rebalance(shards, background=True)
+
+    @classmethod
+    def base_path(cls) -> str:
+        return Config.NUMPY_INDEX_PATH if Config.VECTORDB_BACKEND == "numpy" else Config.VECTORDB_PATH
+
+    @classmethod
+    def stored_shards(cls) -> int:
+        """Shards the configured store is spread over on disk, 1 when it was never sharded"""
+        path = os.path.join(cls.base_path(), MANIFEST_FILE)
+        if not os.path.exists(path):
+            return 1
+        with open(path, 'r') as f:
+            layout = json.load(f)
+        return max(layout["shards"], layout.get("target") or 0)
+
+    @classmethod
+    def from_config(cls) -> 'ShardedVectorDatabase':
+        backend, base = Config.VECTORDB_BACKEND, cls.base_path()
+        opener = ProcessShard if Config.VECTORDB_SHARD_PROCESSES else open_shard
+        return cls(lambda index: opener(backend, shard_path(base, index)), Config.VECTORDB_SHARDS,
+                   os.path.join(base, MANIFEST_FILE))
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        if self.manifest_path and os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r') as f:
+                return json.load(f)
+        # No manifest: a fresh or previously unsharded store, all of it in shard 0
+        return {"shards": 1}
+
+    def _write_manifest(self) -> None:
+        if not self.manifest_path:
+            return
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump({"shards": self.layout, "target": self.target}, f)
+        os.replace(tmp, self.manifest_path)
+
+    def _open(self, count: int) -> None:
+        """Open shards up to count and size the fan-out pool for them"""
+        with self.lock:
+            shards = self.shards + [self.factory(index) for index in range(len(self.shards), count)]
+            previous = self.executor
+            self.executor = ThreadPoolExecutor(max_workers=2 * len(shards), thread_name_prefix="vector-shard")
+            self.shards = shards
+        if previous:
+            previous.shutdown(wait=False)
+
+    def _owners(self, document_id: str) -> List[int]:
+        """Shards that may hold a document: its owner, plus its new owner while a rebalance runs"""
+        with self.lock:
+            if self.target is None:
+                return [shard_owner(document_id, self.layout)]
+            return list(range(len(self.shards)))
+
+    def _scope(self, document_ids: Optional[Collection[str]]) -> Optional[List[int]]:
+        """Shards a search restricted to document_ids has to ask; None for all of them"""
+        if document_ids is None:
+            return None
+        return sorted({index for document_id in document_ids for index in self._owners(document_id)})
+
+    def _write_owner(self, document_id: str) -> int:
+        with self.lock:
+            return shard_owner(document_id, self.target or self.layout)
+
+    def _scatter(self, call: Callable[[VectorDatabase], Any], indices: Optional[List[int]] = None) -> List[Any]:
+        """Run call on each shard in parallel; a shard that fails is logged and left out of the results"""
+        with self.lock:
+            shards, executor = self.shards, self.executor
+        targets = [shards[i] for i in indices] if indices is not None else shards
+        if len(targets) == 1:
+            return [call(targets[0])]
+        futures = [executor.submit(call, shard) for shard in targets]
+        results = []
+        for index, future in zip(indices if indices is not None else range(len(targets)), futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"Error in vector shard {index}: {e}")
+        return results
+
+    @staticmethod
+    def _merge(results: List[List[Dict[str, Any]]], limit: int) -> List[Dict[str, Any]]:
+        """Top limit hits across shards; each list is already sorted by descending score"""
+        merged, seen = [], set()
+        for hit in heapq.merge(*results, key=lambda hit: -hit["score"]):
+            # Mid-rebalance a document can briefly be on two shards
+            if hit["chunk"].get_id() in seen:
+                continue
+            seen.add(hit["chunk"].get_id())
+            merged.append(hit)
+            if len(merged) == limit:
+                break
+        return merged
+
+    def store(self, embedding: VectorEmbedding, text_chunk: TextChunk) -> None:
+        self.store_many([embedding], [text_chunk])
+
+    def store_many(self, embeddings: List[VectorEmbedding], text_chunks: List[TextChunk], batch_size: int = None) -> None:
+        if len(embeddings) != len(text_chunks):
+            raise ValueError(f"Got {len(embeddings)} embeddings for {len(text_chunks)} chunks")
+        if not embeddings:
+            return
+        vectors = np.stack([embedding.get_vector() for embedding in embeddings])
+        self.store_batch(ChunkBatch.from_chunks(text_chunks, vectors), [e.get_id() for e in embeddings], batch_size)
+
+    def store_batch(self, batch: ChunkBatch, vector_ids: Optional[List[str]] = None, batch_size: int = None) -> None:
+        groups: Dict[int, List[int]] = {}
+        owners: Dict[str, int] = {}
+        for i, document_id in enumerate(batch.document_ids):
+            if document_id not in owners:
+                owners[document_id] = self._write_owner(document_id)
+            groups.setdefault(owners[document_id], []).append(i)
+        shards = self.shards
+        if len(groups) == 1:
+            # Ingestion batches come from a single document
+            (owner, _), = groups.items()
+            shards[owner].store_batch(batch, vector_ids, batch_size)
+            return
+        for owner, indices in groups.items():
+            shards[owner].store_batch(batch.take(indices), [vector_ids[i] for i in indices] if vector_ids else None, batch_size)
+
+    def find_similar(self, embedding: VectorEmbedding, limit: int = 5, document_ids: Optional[Collection[str]] = None,
+                     exclude_document_ids: Optional[Collection[str]] = None, **kwargs) -> List[Dict[str, Any]]:
+        # A scoped search only asks the shards owning the documents in scope
+        indices = self._scope(document_ids)
+        if indices == []:
+            return []
+        with metrics.span("vector_scatter"):
+            results = self._scatter(
+                lambda shard: shard.find_similar(embedding, limit, document_ids, exclude_document_ids, **kwargs), indices
+            )
+        return self._merge(results, limit)
+
+    def find_similar_many(self, embeddings: List[VectorEmbedding], limit: int = 5, document_ids: Optional[Collection[str]] = None,
+                          exclude_document_ids: Optional[Collection[str]] = None) -> List[List[Dict[str, Any]]]:
+        indices = self._scope(document_ids)
+        if not embeddings or indices == []:
+            return [[] for _ in embeddings]
+        with metrics.span("vector_scatter_batch"):
+            results = self._scatter(
+                lambda shard: shard.find_similar_many(embeddings, limit, document_ids, exclude_document_ids), indices
+            )
+        return [self._merge([shard[q] for shard in results], limit) for q in range(len(embeddings))]
+
+    def get_chunk(self, chunk_id: str) -> Optional[TextChunk]:
+        return next((chunk for chunk in self._scatter(lambda shard: shard.get_chunk(chunk_id)) if chunk), None)
+
+    def get_chunks(self, chunk_ids: List[str]) -> Dict[str, TextChunk]:
+        if not chunk_ids:
+            return {}
+        chunks = {}
+        for found in self._scatter(lambda shard: shard.get_chunks(chunk_ids)):
+            chunks.update(found)
+        return chunks
+
+    def get_document_embeddings(self, document_id: str) -> Dict[str, np.ndarray]:
+        embeddings = {}
+        for found in self._scatter(lambda shard: shard.get_document_embeddings(document_id), self._owners(document_id)):
+            embeddings.update(found)
+        return embeddings
+
+    def document_ids(self) -> List[str]:
+        return sorted({document_id for found in self._scatter(lambda shard: shard.document_ids()) for document_id in found})
+
+    def get_document_batch(self, document_id: str) -> Optional[ChunkBatch]:
+        found = self._scatter(lambda shard: shard.get_document_batch(document_id), self._owners(document_id))
+        return next((batch for batch in found if batch is not None), None)
+
+    def clear(self) -> None:
+        for shard in self.shards:
+            shard.clear()
+
+    def delete_document_data(self, document_id: str) -> None:
+        # Serialized with rebalance moves, so a document deleted mid-move is not copied back
+        with self.move_lock:
+            for index in self._owners(document_id):
+                self.shards[index].delete_document_data(document_id)
+
+    def flush(self) -> None:
+        self._scatter(lambda shard: shard.flush())
+
+    def rebalance(self, shards: int, background: bool = False) -> None:
+        """Move every document to its owner among `shards` shards, then make that the layout.
+
+        Writes go to the new owners as soon as this starts; deletes and
+        revision lookups check every shard until it finishes.
+        """
+        shards = max(1, shards)
+        if self.rebalance_thread is not None and self.rebalance_thread.is_alive():
+            raise RuntimeError("A rebalance is already running")
+        with self.lock:
+            self.target = shards
+            self._write_manifest()
+        self._open(max(len(self.shards), shards))
+        if background:
+            self.rebalance_thread = threading.Thread(target=self._rebalance, name="vector-rebalance", daemon=True)
+            self.rebalance_thread.start()
+        else:
+            self._rebalance()
+
+    def _rebalance(self) -> None:
+        target, moved = self.target, 0
+        try:
+            for index, shard in enumerate(list(self.shards)):
+                for document_id in shard.document_ids():
+                    if self.stopping.is_set():
+                        # The target stays in the manifest; the next start picks the move up again
+                        print(f"Vector store rebalance paused after moving {moved} documents")
+                        return
+                    owner = shard_owner(document_id, target)
+                    if owner != index and self._move(document_id, shard, self.shards[owner]):
+                        moved += 1
+        except Exception as e:
+            print(f"Vector store rebalance stopped after moving {moved} documents: {e}")
+            raise
+        with self.lock:
+            retired = self.shards[target:]
+            self.layout, self.target = target, None
+            self._write_manifest()
+        # Retired shards are empty now; they stay on disk but are no longer searched
+        for shard in retired:
+            close = getattr(shard, "close", None)
+            if close:
+                close()
+        with self.lock:
+            self.shards = self.shards[:target]
+        print(f"Vector store rebalanced onto {target} shards, {moved} documents moved")
+
+    def _move(self, document_id: str, source: VectorDatabase, destination: VectorDatabase) -> bool:
+        with self.move_lock:
+            batch = source.get_document_batch(document_id)
+            if batch is None or not len(batch):
+                return False
+            destination.store_batch(batch)
+            destination.flush()
+            source.delete_document_data(document_id)
+            return True
+
+    def close(self) -> None:
+        self.stopping.set()
+        if self.rebalance_thread is not None:
+            self.rebalance_thread.join()
+        for shard in self.shards:
+            close = getattr(shard, "close", None)
+            if close:
+                close()
+        if self.executor:
+            self.executor.shutdown(wait=False)
@@ -1,92 +1,234 @@
-import os, chromadb
+import os, uuid, chromadb
+import numpy as np
 from src.core.config import Config
+from src.core.metrics import metrics
 from chromadb.config import Settings
 from chromadb.errors import NotFoundError
-from typing import List, Dict, Any, Optional
-from src.model.models import VectorEmbedding, TextChunk
+from typing import List, Dict, Any, Optional, Collection
+from src.model.models import VectorEmbedding, TextChunk, ChunkBatch
+
+# Ids per "$in" filter; Chroma binds each as an SQLite variable and SQLite caps those per statement
+WHERE_IN_BATCH = 5000
 
 class VectorDatabase:
     """Interface for vector database operations"""
     def store(self, embedding: VectorEmbedding, text_chunk: TextChunk) -> None:
         raise NotImplementedError("Subclass must implement abstract method")
 
-    def find_similar(self, embedding: VectorEmbedding, limit: int = 5) -> List[Dict[str, Any]]:
+    def store_many(self, embeddings: List[VectorEmbedding], text_chunks: List[TextChunk], batch_size: int = None) -> None:
+        for embedding, text_chunk in zip(embeddings, text_chunks):
+            self.store(embedding, text_chunk)
+
+    def store_batch(self, batch: ChunkBatch, vector_ids: Optional[List[str]] = None, batch_size: int = None) -> None:
+        """Store a ChunkBatch with vectors; vector_ids default to fresh ids, one per chunk"""
+        embeddings = batch.embeddings()
+        for embedding, vector_id in zip(embeddings, vector_ids or []):
+            embedding.id = vector_id
+        self.store_many(embeddings, list(batch.chunks()), batch_size)
+
+    def find_similar(self, embedding: VectorEmbedding, limit: int = 5, document_ids: Optional[Collection[str]] = None,
+                     exclude_document_ids: Optional[Collection[str]] = None) -> List[Dict[str, Any]]:
+        """Nearest chunks; document_ids, when given, narrows the search to those documents before scoring,
+        and none of exclude_document_ids (a handful, such as uploads still being stored) are returned"""
         raise NotImplementedError("Subclass must implement abstract method")
 
+    def find_similar_many(self, embeddings: List[VectorEmbedding], limit: int = 5, document_ids: Optional[Collection[str]] = None,
+                          exclude_document_ids: Optional[Collection[str]] = None) -> List[List[Dict[str, Any]]]:
+        return [self.find_similar(embedding, limit, document_ids, exclude_document_ids) for embedding in embeddings]
+
     def get_chunk(self, chunk_id: str) -> Optional[TextChunk]:
         raise NotImplementedError("Subclass must implement abstract method")
 
+    def get_chunks(self, chunk_ids: List[str]) -> Dict[str, TextChunk]:
+        """Chunks keyed by their TextChunk id; missing ids are left out"""
+        chunks = {}
+        for chunk_id in chunk_ids:
+            chunk = self.get_chunk(chunk_id)
+            if chunk:
+                chunks[chunk_id] = chunk
+        return chunks
+
+    def get_document_embeddings(self, document_id: str) -> Dict[str, np.ndarray]:
+        """Stored vectors of a document keyed by chunk content hash, for reuse on re-ingestion"""
+        return {}
+
+    def document_ids(self) -> List[str]:
+        """Ids of every document with stored chunks"""
+        raise NotImplementedError("Subclass must implement abstract method")
+
+    def get_document_batch(self, document_id: str) -> Optional[ChunkBatch]:
+        """All stored chunks of a document with their vectors, for copying it into another store"""
+        raise NotImplementedError("Subclass must implement abstract method")
+
     def clear(self) -> None:
         raise NotImplementedError("Subclass must implement abstract method")
 
     def delete_document_data(self, document_id: str) -> None:
         raise NotImplementedError("Subclass must implement abstract method")
 
+    def flush(self) -> None:
+        """Persist state held back between store_batch calls; called once a whole document is stored"""
+        pass
+
 class ChromaDBVectorDatabase(VectorDatabase):
     """ChromaDB implementation of the vector database"""
-    def __init__(self):
-        os.makedirs(Config.VECTORDB_PATH, exist_ok=True)
+    def __init__(self, path: str = None, collection_name: str = "documents"):
+        path = path or Config.VECTORDB_PATH
+        os.makedirs(path, exist_ok=True)
         self.client = chromadb.PersistentClient(
-            path=Config.VECTORDB_PATH,
+            path=path,
             settings=Settings(allow_reset=True)
         )
-        collection_name = "documents"
         try:
             self.collection = self.client.get_collection(name=collection_name)
             print(f"Connected to collection '{collection_name}'")
         except NotFoundError:
-            self.collection = self.client.create_collection(name=collection_name)
+            self.collection = self._create_collection(collection_name)
             print(f"Collection '{collection_name}' created")
 
+    def _create_collection(self, name: str):
+        # Chroma's default search_ef of 10 loses recall on large collections; it is fixed at creation
+        return self.client.create_collection(name=name, metadata={"hnsw:search_ef": Config.CHROMA_SEARCH_EF})
+
     def store(self, embedding: VectorEmbedding, text_chunk: TextChunk) -> None:
-        self.collection.add(
-            ids=[embedding.get_id()],
-            embeddings=[embedding.get_vector()],
-            metadatas=[{
-                "chunk_id": text_chunk.get_id(),
-                "document_id": text_chunk.get_document_id(),
-                "position": int(text_chunk.position)
-            }],
-            documents=[text_chunk.get_text()]
-        )
+        self.store_many([embedding], [text_chunk])
+
+    def store_many(self, embeddings: List[VectorEmbedding], text_chunks: List[TextChunk], batch_size: int = None) -> None:
+        if len(embeddings) != len(text_chunks):
+            raise ValueError(f"Got {len(embeddings)} embeddings for {len(text_chunks)} chunks")
+        if not embeddings:
+            return
+        vectors = np.stack([embedding.get_vector() for embedding in embeddings])
+        self.store_batch(ChunkBatch.from_chunks(text_chunks, vectors), [e.get_id() for e in embeddings], batch_size)
+
+    def store_batch(self, batch: ChunkBatch, vector_ids: Optional[List[str]] = None, batch_size: int = None) -> None:
+        if batch.vectors is None:
+            raise ValueError("ChunkBatch has no vectors")
+        vector_ids = vector_ids or [str(uuid.uuid4()) for _ in range(len(batch))]
+        batch_size = batch_size or Config.VECTORDB_BATCH_SIZE
+        # Chroma rejects batches above the client's max_batch_size
+        max_batch_size = getattr(self.client, "max_batch_size", None)
+        if max_batch_size:
+            batch_size = min(batch_size, max_batch_size)
+        for start in range(0, len(batch), batch_size):
+            part = batch[start:start + batch_size]
+            self.collection.add(
+                ids=vector_ids[start:start + batch_size],
+                embeddings=part.vectors,
+                metadatas=[self._chunk_metadata(part, i) for i in range(len(part))],
+                documents=part.texts
+            )
 
-    def find_similar(self, embedding: VectorEmbedding, limit: int = 5) -> List[Dict[str, Any]]:
-        print(f"Searching for similar embeddings with limit: {limit}")
+    @staticmethod
+    def _chunk_metadata(batch: ChunkBatch, i: int) -> Dict[str, Any]:
+        metadata = {
+            "chunk_id": batch.ids[i],
+            "document_id": batch.document_ids[i],
+            "position": batch.positions[i]
+        }
+        # Chroma metadata values cannot be None
+        page = batch.page(i)
+        if page is not None:
+            metadata["page"] = page
+        return metadata
+
+    @staticmethod
+    def _where(document_ids: Optional[Collection[str]], exclude_document_ids: Optional[Collection[str]] = None) -> Optional[Dict[str, Any]]:
+        # Chroma resolves metadata filters through its metadata index before the HNSW search
+        if document_ids is None:
+            return {"document_id": {"$nin": list(exclude_document_ids)}} if exclude_document_ids else None
+        document_ids = list(document_ids)
+        return {"document_id": document_ids[0]} if len(document_ids) == 1 else {"document_id": {"$in": document_ids}}
+
+    def find_similar(self, embedding: VectorEmbedding, limit: int = 5, document_ids: Optional[Collection[str]] = None,
+                     exclude_document_ids: Optional[Collection[str]] = None) -> List[Dict[str, Any]]:
+        if document_ids is not None and exclude_document_ids:
+            document_ids = set(document_ids).difference(exclude_document_ids)
+        if document_ids is not None and not document_ids:
+            return []
+        collection_count = None
         try:
-            collection_count = self.collection.count()
-            print(f"Collection contains {collection_count} documents")
+            with metrics.span("vector_count"):
+                collection_count = self.collection.count()
             if collection_count == 0:
                 print("WARNING: Vector database is empty!")
                 return []
         except Exception as e:
             print(f"Error checking collection count: {e}")
-        results = self.collection.query(
-            query_embeddings=[embedding.get_vector()],
-            n_results=limit
-        )
-        print(f"Raw ChromaDB results: {results}")
+        try:
+            with metrics.span("vector_query"):
+                formatted_results = self._query([embedding.get_vector()], limit, document_ids, exclude_document_ids)[0]
+        except Exception as e:
+            print(f"Error querying the vector database: {e}")
+            return []
+        if Config.VERBOSE_LOGGING:
+            print(f"Found {len(formatted_results)} of {limit} requested chunks in {collection_count} stored")
+        return formatted_results
+
+    def find_similar_many(self, embeddings: List[VectorEmbedding], limit: int = 5, document_ids: Optional[Collection[str]] = None,
+                          exclude_document_ids: Optional[Collection[str]] = None) -> List[List[Dict[str, Any]]]:
+        """Answer every query with a single collection.query call"""
+        if not embeddings:
+            return []
+        if document_ids is not None and exclude_document_ids:
+            document_ids = set(document_ids).difference(exclude_document_ids)
+        if document_ids is not None and not document_ids:
+            return [[] for _ in embeddings]
+        try:
+            with metrics.span("vector_count"):
+                collection_count = self.collection.count()
+            if collection_count == 0:
+                return [[] for _ in embeddings]
+            with metrics.span("vector_query_batch"):
+                return self._query([embedding.get_vector() for embedding in embeddings], limit, document_ids, exclude_document_ids)
+        except Exception as e:
+            print(f"Error querying {len(embeddings)} embeddings: {e}")
+            return [[] for _ in embeddings]
+
+    def _query(self, vectors: List[Any], limit: int, document_ids: Optional[Collection[str]],
+               exclude_document_ids: Optional[Collection[str]] = None) -> List[List[Dict[str, Any]]]:
+        """collection.query, one call per WHERE_IN_BATCH scoped documents, merged best first per query"""
+        if document_ids is None:
+            parts = [None]
+        else:
+            document_ids = list(document_ids)
+            parts = [document_ids[start:start + WHERE_IN_BATCH] for start in range(0, len(document_ids), WHERE_IN_BATCH)]
+        found = [[] for _ in vectors]
+        for part in parts:
+            results = self.collection.query(
+                query_embeddings=vectors, n_results=limit, where=self._where(part, exclude_document_ids)
+            )
+            for q in range(len(vectors)):
+                found[q].extend(self._format_results(results, q))
+        if len(parts) > 1:
+            found = [sorted(results, key=lambda result: result["score"], reverse=True)[:limit] for results in found]
+        return found
+
+    @staticmethod
+    def _format_results(results: Dict[str, Any], q: int) -> List[Dict[str, Any]]:
+        """Turn the q-th query of a collection.query result into chunk/score dicts"""
         formatted_results = []
-        if results and "documents" in results and len(results["documents"]) > 0:
-            for i, document in enumerate(results["documents"][0]):
-                if document and i < len(results["metadatas"][0]):
-                    metadata = results["metadatas"][0][i]
+        if results and "documents" in results and len(results["documents"]) > q:
+            for i, document in enumerate(results["documents"][q]):
+                if document and i < len(results["metadatas"][q]):
+                    metadata = results["metadatas"][q][i]
                     document_id = str(metadata.get("document_id", ""))
                     position = int(metadata.get("position", 0))
                     chunk = TextChunk(
                         text=document,
                         document_id=document_id,
-                        position=position
+                        position=position,
+                        page=metadata.get("page")
                     )
+                    chunk.id = metadata.get("chunk_id", chunk.id)
                     score = 0.0
-                    if "distances" in results and len(results["distances"]) > 0 and i < len(results["distances"][0]):
-                        distance = results["distances"][0][i]
+                    if "distances" in results and len(results["distances"]) > q and i < len(results["distances"][q]):
+                        distance = results["distances"][q][i]
                         score = 1.0 - distance
-                        print(f"Document {i}: distance={distance}, similarity_score={score}")
                     formatted_results.append({
                         "chunk": chunk,
                         "score": score
                     })
-        print(f"Formatted results count: {len(formatted_results)}")
         return formatted_results
 
     def get_chunk(self, chunk_id: str) -> Optional[TextChunk]:
@@ -104,17 +246,84 @@ class ChromaDBVectorDatabase(VectorDatabase):
                     return TextChunk(
                         text=document,
                         document_id=document_id,
-                        position=position
+                        position=position,
+                        page=metadata.get("page")
                     )
             return None
         except Exception as e:
             print(f"Error fetching chunk {chunk_id}: {e}")
             return None
 
+    def get_chunks(self, chunk_ids: List[str]) -> Dict[str, TextChunk]:
+        if not chunk_ids:
+            return {}
+        try:
+            results = self.collection.get(
+                where={"chunk_id": {"$in": list(chunk_ids)}},
+                include=["documents", "metadatas"]
+            )
+        except Exception as e:
+            print(f"Error fetching {len(chunk_ids)} chunks: {e}")
+            return {}
+        chunks = {}
+        for document, metadata in zip(results.get("documents") or [], results.get("metadatas") or []):
+            if document and metadata:
+                chunk = TextChunk(
+                    text=document,
+                    document_id=str(metadata.get("document_id", "")),
+                    position=int(metadata.get("position", 0)),
+                    page=metadata.get("page")
+                )
+                chunk.id = metadata["chunk_id"]
+                chunks[chunk.id] = chunk
+        return chunks
+
+    def get_document_embeddings(self, document_id: str) -> Dict[str, np.ndarray]:
+        try:
+            results = self.collection.get(where={"document_id": document_id}, include=["documents", "embeddings"])
+        except Exception as e:
+            print(f"Error fetching embeddings for document {document_id}: {e}")
+            return {}
+        embeddings = {}
+        documents = results.get("documents")
+        vectors = results.get("embeddings")
+        for document, vector in zip(documents if documents is not None else [], vectors if vectors is not None else []):
+            if document:
+                embeddings[TextChunk.hash_text(document)] = np.asarray(vector, dtype=np.float32)
+        return embeddings
+
+    def document_ids(self, page_size: int = 10000) -> List[str]:
+        document_ids = set()
+        offset = 0
+        while True:
+            results = self.collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            metadatas = results.get("metadatas") or []
+            document_ids.update(str(metadata.get("document_id", "")) for metadata in metadatas if metadata)
+            if len(metadatas) < page_size:
+                return sorted(document_ids)
+            offset += page_size
+
+    def get_document_batch(self, document_id: str) -> Optional[ChunkBatch]:
+        results = self.collection.get(where={"document_id": document_id}, include=["documents", "metadatas", "embeddings"])
+        documents = results.get("documents")
+        if documents is None or not len(documents):
+            return None
+        chunks = []
+        for document, metadata in zip(documents, results["metadatas"]):
+            chunk = TextChunk(
+                text=document or "",
+                document_id=document_id,
+                position=int(metadata.get("position", 0)),
+                page=metadata.get("page")
+            )
+            chunk.id = metadata.get("chunk_id", chunk.id)
+            chunks.append(chunk)
+        return ChunkBatch.from_chunks(chunks, np.asarray(results["embeddings"], dtype=np.float32))
+
     def clear(self) -> None:
         try:
             self.client.delete_collection(self.collection.name)
-            self.collection = self.client.create_collection(name=self.collection.name)
+            self.collection = self._create_collection(self.collection.name)
         except Exception as e:
             print(f"Error clearing collection: {e}")
 
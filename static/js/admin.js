@@ -3,6 +3,7 @@ import { adminPageData } from './utils.js';
 export function initAdminPage() {
     const dropzone = $('#dropzone');
     const fileInput = $('#fileInput');
+    const replaceFileInput = $('#replaceFileInput');
     const uploadForm = $('#uploadForm');
     const uploadProgress = $('#uploadProgress');
     const progressBar = uploadProgress.find('.progress-bar');
@@ -54,6 +55,20 @@ export function initAdminPage() {
     fileInput.on('change', function() {
         updateFileInfo();
     });
+
+    replaceFileInput.on('change', function() {
+        const files = this.files;
+        const replaces = replaceFileInput.data('replaces');
+        if (files.length !== 1 || !replaces) {
+            return;
+        }
+        if (!files[0].name.toLowerCase().endsWith('.pdf')) {
+            showAlert('danger', 'Only PDF files are supported.');
+        } else {
+            uploadFile(files, replaces);
+        }
+        replaceFileInput.val('');
+    });
     
     uploadForm.on('submit', function(e) {
         e.preventDefault();
@@ -126,11 +141,18 @@ export function initAdminPage() {
         return parseFloat((bytes / Math.pow(k, i)).toFixed(2)) + ' ' + sizes[i];
     }
     
-    function uploadFile(files) {
+    function uploadFile(files, replaces) {
         const formData = new FormData();
         for (let i = 0; i < files.length; i++) {
             formData.append('document', files[i]);
         }
+        if (replaces) {
+            formData.append('replaces', replaces);
+        }
+        const category = $('#categoryInput').val().trim();
+        if (category) {
+            formData.append('category', category);
+        }
         uploadProgress.removeClass('d-none');
         progressBar.css('width', '0%');
         $.ajax({
@@ -150,10 +172,15 @@ export function initAdminPage() {
                 return xhr;
             },
             success: function(response) {
-                setTimeout(() => uploadProgress.addClass('d-none'), 500);
-                showAlert('success', response.message || 'Document(s) uploaded successfully.');
+                showAlert('info', response.message || 'Document(s) queued for processing.');
                 resetFileInput();
-                loadDocuments();
+                if (response.job_id) {
+                    progressBar.css('width', '0%');
+                    pollIngestionJob(response.job_id);
+                } else {
+                    setTimeout(() => uploadProgress.addClass('d-none'), 500);
+                    loadDocuments();
+                }
             },
             error: function(error) {
                 uploadProgress.addClass('d-none');
@@ -167,6 +194,46 @@ export function initAdminPage() {
         });
     }
     
+    function jobPercent(job) {
+        const files = job.files || [];
+        if (files.length === 0) return 100;
+        let total = 0;
+        files.forEach(function(f) {
+            if (f.status === 'completed' || f.status === 'failed') {
+                total += 1;
+            } else if (f.pages_total > 0) {
+                // extraction is the first third of the work, embedding and storing the rest; pages stream
+                // through all three, so chunks_total only covers the pages extracted so far
+                const pages = f.pages_extracted / f.pages_total;
+                const chunks = f.chunks_total > 0 ? (f.chunks_embedded + f.chunks_stored) / (2 * f.chunks_total) : 0;
+                total += (1 / 3) * pages + (2 / 3) * pages * chunks;
+            }
+        });
+        return Math.round((total / files.length) * 100);
+    }
+
+    function pollIngestionJob(jobId) {
+        $.get(`/api/jobs/${jobId}`, function(job) {
+            progressBar.css('width', jobPercent(job) + '%');
+            if (job.status === 'queued' || job.status === 'running') {
+                setTimeout(() => pollIngestionJob(jobId), 1000);
+                return;
+            }
+            setTimeout(() => uploadProgress.addClass('d-none'), 500);
+            const failed = (job.files || []).filter(f => f.status === 'failed');
+            if (failed.length === 0) {
+                showAlert('success', `${job.files.length} document(s) processed successfully.`);
+            } else {
+                showAlert('danger', failed.map(f => `${f.filename}: ${f.error || 'Failed'}`).join('<br>'));
+            }
+            loadDocuments();
+        }).fail(function() {
+            uploadProgress.addClass('d-none');
+            showAlert('danger', 'Lost track of the upload job. Refresh the document list to check its status.');
+            loadDocuments();
+        });
+    }
+
     function updateDeleteSelectedBtn() {
         const checked = $('.doc-select-checkbox:checked').length;
         deleteSelectedBtn.prop('disabled', checked === 0);
@@ -241,6 +308,7 @@ export function initAdminPage() {
                                     <div class="flex-grow-1 ms-2">
                                         <h5 class="card-title mb-1"><i class="fas fa-file-pdf text-danger document-icon"></i> ${displayFilename}</h5>
                                         <p class="card-text text-muted mb-2"><small>Uploaded on ${date}</small></p>
+                                        <button class="btn btn-sm btn-outline-secondary replace-document-btn" data-id="${docId}"><i class="fas fa-sync-alt me-1"></i> Replace</button>
                                         <button class="btn btn-sm btn-outline-danger delete-document-btn" data-id="${docId}"><i class="fas fa-trash-alt me-1"></i> Delete</button>
                                     </div>
                                 </div>
@@ -254,6 +322,10 @@ export function initAdminPage() {
                         deleteDocument(documentId);
                     }
                 });
+                $('.replace-document-btn').on('click', function() {
+                    replaceFileInput.data('replaces', $(this).data('id'));
+                    replaceFileInput.click();
+                });
                 attachCheckboxEvents();
                 selectAllCheckbox.prop('checked', false);
                 updateDeleteSelectedBtn();
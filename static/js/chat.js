@@ -175,31 +175,99 @@ export function initChatPage() {
         $('#thinkingIndicator').remove();
     }
     
+    function renderSources(sources) {
+        if (!sources || sources.length === 0) return '';
+        return `
+            <div class="sources">
+                <p class="mb-1"><small>Sources:</small></p>
+                ${sources.map((source, index) => `
+                    <span class="source-item" title="${source.text}">
+                        Document ${index + 1}
+                    </span>
+                `).join('')}
+            </div>
+        `;
+    }
+
     function addBotMessage(message, sources = [], time = null, scrollToBottomFlag = true) {
         const timeStr = time ? formatDate(new Date(time)) : formatDate(new Date());
-        let sourcesHtml = '';
-        if (sources && sources.length > 0) {
-            sourcesHtml = `
-                <div class="sources">
-                    <p class="mb-1"><small>Sources:</small></p>
-                    ${sources.map((source, index) => `
-                        <span class="source-item" title="${source.text}">
-                            Document ${index + 1}
-                        </span>
-                    `).join('')}
-                </div>
-            `;
-        }
-
         chatMessages.append(`
             <div class="message bot-message">
                 <div class="message-content">${message}</div>
-                ${sourcesHtml}
+                ${renderSources(sources)}
                 <div class="message-time">${timeStr}</div>
             </div>
         `);
         if (scrollToBottomFlag) scrollToBottom();
     }
+
+    function addStreamingBotMessage() {
+        const messageEl = $(`
+            <div class="message bot-message">
+                <div class="message-content"></div>
+                <div class="message-sources"></div>
+                <div class="message-time">${formatDate(new Date())}</div>
+            </div>
+        `);
+        chatMessages.append(messageEl);
+        let content = '';
+        return {
+            setSources(sources) {
+                messageEl.find('.message-sources').html(renderSources(sources));
+            },
+            appendToken(token) {
+                content += token;
+                messageEl.find('.message-content').html(content);
+                scrollToBottom();
+            },
+            setContent(text) {
+                content = text;
+                messageEl.find('.message-content').html(content);
+            },
+            hasContent() {
+                return content.length > 0;
+            }
+        };
+    }
+
+    function parseSseFrame(frame) {
+        let event = 'message';
+        const dataLines = [];
+        frame.split('\n').forEach(function(line) {
+            if (line.startsWith('event:')) event = line.slice(6).trim();
+            else if (line.startsWith('data:')) dataLines.push(line.slice(5).trimStart());
+        });
+        if (dataLines.length === 0) return null;
+        return { event: event, data: JSON.parse(dataLines.join('\n')) };
+    }
+
+    async function streamQuery(message, onEvent) {
+        const response = await fetch('/api/query/stream', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
+            body: JSON.stringify({ query: message, session_id: currentSessionId })
+        });
+        if (!response.ok || !response.body) {
+            // Rejected before the turn was recorded, so the caller may safely retry elsewhere
+            const error = new Error(`Streaming request failed with status ${response.status}`);
+            error.beforeStream = true;
+            throw error;
+        }
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const parsed = parseSseFrame(buffer.slice(0, boundary));
+                buffer = buffer.slice(boundary + 2);
+                if (parsed) onEvent(parsed.event, parsed.data);
+            }
+        }
+    }
     
     function scrollToBottom() {
         chatMessages.scrollTop(chatMessages[0].scrollHeight);
@@ -221,28 +289,66 @@ export function initChatPage() {
         
         addUserMessage(message);
         addThinkingIndicator();
-        
-        $.ajax({
-            url: '/api/query',
-            type: 'POST',
-            contentType: 'application/json',
-            data: JSON.stringify({ query: message, session_id: currentSessionId }),
-            success: function(response) {
+
+        let botMessage = null;
+        function ensureBotMessage() {
+            if (!botMessage) {
                 removeThinkingIndicator();
-                let formattedContent = response.content;
-                addBotMessage(formattedContent, response.sources);
-                loadSessions();
-            },
-            error: function(err) {
+                botMessage = addStreamingBotMessage();
+            }
+            return botMessage;
+        }
+
+        function finishSending() {
+            userInput.prop('disabled', false);
+            sendButton.prop('disabled', false);
+            userInput.focus();
+        }
+
+        streamQuery(message, function(event, data) {
+            if (event === 'session') {
+                currentSessionId = data.session_id;
+            } else if (event === 'sources') {
+                ensureBotMessage().setSources(data);
+            } else if (event === 'token') {
+                ensureBotMessage().appendToken(data);
+            } else if (event === 'done') {
+                ensureBotMessage().setContent(data.content);
+            }
+        }).then(function() {
+            removeThinkingIndicator();
+            loadSessions();
+            finishSending();
+        }).catch(function(err) {
+            if (!err.beforeStream) {
+                // The server already saved the question, so resending it would record it twice
                 removeThinkingIndicator();
-                addBotMessage('Sorry, I encountered an error. Please try again.');
-                handleError(err, 'Error sending message.');
-            },
-            complete: function () {
-                userInput.prop('disabled', false);
-                sendButton.prop('disabled', false);
-                userInput.focus();
+                if (!botMessage || !botMessage.hasContent()) {
+                    ensureBotMessage().setContent('Sorry, I encountered an error. Please try again.');
+                }
+                handleError(err, 'The response was interrupted.');
+                loadSessions();
+                finishSending();
+                return;
             }
+            // Streaming unavailable (proxy or server refused it); fall back to the blocking endpoint
+            $.ajax({
+                url: '/api/query',
+                type: 'POST',
+                contentType: 'application/json',
+                data: JSON.stringify({ query: message, session_id: currentSessionId }),
+                success: function(response) {
+                    removeThinkingIndicator();
+                    addBotMessage(response.content, response.sources);
+                    loadSessions();
+                },
+                error: function(xhr) {
+                    removeThinkingIndicator();
+                    addBotMessage('Sorry, I encountered an error. Please try again.');
+                    handleError(xhr, 'Error sending message.');
+                },
+                complete: finishSending
+            });
         });
     }
     